@@ -0,0 +1,127 @@
+"""Concurrency benchmark: blocking store calls vs. the executor-backed AsyncStore.
+
+Simulates a slow disk by sleeping inside every store operation, then drives
+the real app in-process with a burst of uploads/downloads while probing
+``/ping``. With calls made inline (the old behaviour of ``create_document``)
+every disk wait stalls the event loop, so ``/ping`` latency tracks the slowest
+upload; with ``AsyncStore`` on its own thread pool it stays flat.
+
+    python -m bench.async_store --requests 200 --concurrency 32 --delay-ms 20
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import httpx
+
+from server.app import create_app
+from server.routes import documents
+from server.storage import AsyncStore, MemoryStore
+
+
+class SlowStore(MemoryStore):
+    """MemoryStore that sleeps like a slow disk on reads and writes."""
+
+    def __init__(self, delay: float) -> None:
+        super().__init__()
+        self.delay = delay
+
+    def find_id(self, id_):
+        time.sleep(self.delay)
+        return super().find_id(id_)
+
+    def create(self, data):
+        time.sleep(self.delay)
+        return super().create(data)
+
+
+def _pct(values, p):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(p / 100 * (len(values) - 1))))]
+
+
+async def _run(mode: str, args) -> dict:
+    backend = SlowStore(args.delay_ms / 1000)
+    executor = ThreadPoolExecutor(max_workers=args.threads) if mode == "executor" else None
+    documents.store = AsyncStore(backend, executor)
+    app = create_app()
+    transport = httpx.ASGITransport(app=app)
+    body = b"x" * args.size
+    ping_lat: list[float] = []
+    req_lat: list[float] = []
+    stop = asyncio.Event()
+
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        seed = (await client.post("/api/v2/post", content=body)).json()["id"]
+
+        async def prober():
+            while not stop.is_set():
+                t0 = time.perf_counter()
+                await client.get("/ping")
+                ping_lat.append(time.perf_counter() - t0)
+                await asyncio.sleep(0.005)
+
+        sem = asyncio.Semaphore(args.concurrency)
+
+        async def one(i: int):
+            async with sem:
+                t0 = time.perf_counter()
+                if i % 2:
+                    await client.post("/api/v2/post", content=body)
+                else:
+                    await client.get(f"/api/v2/{seed}")
+                req_lat.append(time.perf_counter() - t0)
+
+        probe = asyncio.create_task(prober())
+        t0 = time.perf_counter()
+        await asyncio.gather(*(one(i) for i in range(args.requests)))
+        elapsed = time.perf_counter() - t0
+        stop.set()
+        await probe
+
+    if executor is not None:
+        executor.shutdown()
+    return {
+        "mode": mode,
+        "requests": args.requests,
+        "concurrency": args.concurrency,
+        "delay_ms": args.delay_ms,
+        "throughput_rps": round(args.requests / elapsed, 1),
+        "request_p50_ms": round(statistics.median(req_lat) * 1000, 2),
+        "request_p99_ms": round(_pct(req_lat, 99) * 1000, 2),
+        "ping_p50_ms": round(statistics.median(ping_lat) * 1000, 2) if ping_lat else None,
+        "ping_p99_ms": round(_pct(ping_lat, 99) * 1000, 2),
+        "ping_samples": len(ping_lat),
+    }
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--requests", type=int, default=200)
+    ap.add_argument("--concurrency", type=int, default=32)
+    ap.add_argument("--delay-ms", type=float, default=20.0, help="simulated disk latency per store call")
+    ap.add_argument("--size", type=int, default=64 * 1024, help="body size in bytes")
+    ap.add_argument("--threads", type=int, default=16, help="executor threads for AsyncStore")
+    ap.add_argument("--json", action="store_true", help="print JSON lines instead of a table")
+    args = ap.parse_args()
+
+    results = [asyncio.run(_run(mode, args)) for mode in ("inline", "executor")]
+    if args.json:
+        for r in results:
+            print(json.dumps(r))
+        return
+    cols = ["mode", "throughput_rps", "request_p50_ms", "request_p99_ms", "ping_p50_ms", "ping_p99_ms"]
+    print("  ".join(f"{c:>15}" for c in cols))
+    for r in results:
+        print("  ".join(f"{str(r[c]):>15}" for c in cols))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,288 @@
+"""Load generator for the collaboration room server (``/socket.io/``).
+
+Opens ``rooms × clients`` WebSocket connections speaking the Socket.IO
+protocol the Excalidraw client uses, joins them to their rooms, then has every
+client send volatile pointer updates (``--rate`` per second) and reliable
+scene updates (``--scene-rate``) for ``--duration`` seconds. Receivers time
+each delivery. Steps through increasing room counts until reliable delivery
+is incomplete or its p99 latency exceeds ``--max-p99-ms``, which shows how many
+rooms and clients one worker sustains.
+
+    python -m bench.collab                              # local uvicorn, default steps
+    python -m bench.collab --rooms 50,100,200 --clients 4 --json
+    python -m bench.collab --url http://127.0.0.1:8888  # an already running server
+
+The load generator itself is one Python process; beyond a few thousand
+clients it may saturate before the server does (watch ``client_lag_ms``).
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import re
+import secrets
+import statistics
+import struct
+import sys
+import time
+from typing import Dict, List, Optional
+
+import httpx
+import websockets
+
+from .http_suite import _ints, _pct, local_uvicorn
+
+# First bytes of every payload: send time and kind (0 volatile, 1 reliable)
+STAMP = struct.Struct(">dB")
+VOLATILE, RELIABLE = 0, 1
+COUNTERS = ("volatile_coalesced", "volatile_dropped", "slow_disconnects", "messages_sent")
+
+
+class Stats:
+    def __init__(self) -> None:
+        self.sent = [0, 0]
+        self.received = [0, 0]
+        self.latency: List[List[float]] = [[], []]
+        self.errors = 0
+
+
+def _header(event: str, room: str) -> str:
+    return "452-" + json.dumps(
+        [event, room, {"_placeholder": True, "num": 0}, {"_placeholder": True, "num": 1}], separators=(",", ":")
+    )
+
+
+async def _handshake(ws) -> str:
+    opened = await ws.recv()
+    if not opened.startswith("0"):
+        raise RuntimeError(f"unexpected open packet {opened[:40]!r}")
+    await ws.send("40")
+    while True:
+        msg = await ws.recv()
+        if isinstance(msg, str) and msg.startswith("40"):
+            return json.loads(msg[2:])["sid"]
+
+
+async def client(url: str, room: str, args, stats: Stats, start: asyncio.Event, stop: asyncio.Event, ready) -> None:
+    async with websockets.connect(url, max_size=None, compression=None, open_timeout=30) as ws:
+        await _handshake(ws)
+        await ws.send("42" + json.dumps(["join-room", room], separators=(",", ":")))
+        ready()
+
+        async def receive() -> None:
+            attachments = 0
+            first = False
+            async for msg in ws:
+                if isinstance(msg, str):
+                    if msg == "2":
+                        await ws.send("3")
+                    elif msg.startswith("45") and "client-broadcast" in msg[:40]:
+                        attachments = int(msg[2:msg.index("-")])
+                        first = True
+                    continue
+                if attachments:
+                    attachments -= 1
+                    if first:
+                        sent_at, kind = STAMP.unpack_from(msg)
+                        stats.received[kind] += 1
+                        stats.latency[kind].append(time.perf_counter() - sent_at)
+                        first = False
+
+        async def send() -> None:
+            await start.wait()
+            volatile_header = _header("server-volatile-broadcast", room)
+            reliable_header = _header("server-broadcast", room)
+            iv = secrets.token_bytes(12)
+            pointer = bytes(args.pointer_bytes)
+            scene = bytes(args.scene_bytes)
+            period = 1 / args.rate if args.rate > 0 else None
+            scene_every = max(1, round(args.rate / args.scene_rate)) if args.scene_rate > 0 and period else 0
+            # Spread clients over the period instead of sending in lockstep
+            await asyncio.sleep(secrets.randbelow(1000) / 1000 * (period or 0))
+            n = 0
+            while not stop.is_set():
+                n += 1
+                reliable = scene_every and n % scene_every == 0
+                kind = RELIABLE if reliable else VOLATILE
+                body = scene if reliable else pointer
+                await ws.send(reliable_header if reliable else volatile_header)
+                await ws.send(STAMP.pack(time.perf_counter(), kind) + body[STAMP.size:])
+                await ws.send(iv)
+                stats.sent[kind] += 1
+                if period is None:
+                    break
+                await asyncio.sleep(period)
+
+        reader = asyncio.ensure_future(receive())
+        try:
+            await send()
+            await stop.wait()
+            # let in-flight deliveries land
+            await asyncio.sleep(args.settle)
+        finally:
+            reader.cancel()
+            with contextlib.suppress(asyncio.CancelledError, websockets.ConnectionClosed):
+                await reader
+
+
+async def _server_counters(base: str) -> Dict[str, float]:
+    async with httpx.AsyncClient(base_url=base, timeout=10) as http:
+        try:
+            text = (await http.get("/metrics")).text
+        except httpx.HTTPError:
+            return {}
+    out = {}
+    for name in COUNTERS:
+        m = re.search(rf"^excalidraw_collab_{name}_total (\S+)$", text, re.M)
+        if m:
+            out[name] = float(m.group(1))
+    return out
+
+
+async def _lag_probe(stop: asyncio.Event, lags: List[float]) -> None:
+    """Measures how late this process's own event loop wakes up (load generator saturation)."""
+    while not stop.is_set():
+        t0 = time.perf_counter()
+        await asyncio.sleep(0.05)
+        lags.append(time.perf_counter() - t0 - 0.05)
+
+
+async def step(base: str, rooms: int, args) -> dict:
+    url = base.replace("http", "ws", 1) + "/socket.io/?EIO=4&transport=websocket"
+    stats = Stats()
+    start, stop = asyncio.Event(), asyncio.Event()
+    joined = 0
+
+    def ready() -> None:
+        nonlocal joined
+        joined += 1
+
+    before = await _server_counters(base)
+    prefix = secrets.token_hex(4)
+    t0 = time.perf_counter()
+    tasks = []
+    for r in range(rooms):
+        for _ in range(args.clients):
+            tasks.append(asyncio.ensure_future(client(url, f"{prefix}-{r}", args, stats, start, stop, ready)))
+            if len(tasks) % args.connect_batch == 0:
+                await asyncio.sleep(0.01)
+    while joined < len(tasks) and not all(t.done() for t in tasks):
+        await asyncio.sleep(0.05)
+    connect_seconds = time.perf_counter() - t0
+    lags: List[float] = []
+    probe = asyncio.ensure_future(_lag_probe(stop, lags))
+    start.set()
+    await asyncio.sleep(args.duration)
+    stop.set()
+    results = await asyncio.gather(*tasks, return_exceptions=True)
+    await probe
+    failed = [r for r in results if isinstance(r, BaseException)]
+    after = await _server_counters(base)
+
+    fanout = args.clients - 1
+    row = {
+        "rooms": rooms,
+        "clients": rooms * args.clients,
+        "connected": joined,
+        "failed_clients": len(failed),
+        "connect_seconds": round(connect_seconds, 2),
+        "client_lag_ms": round(max(lags, default=0.0) * 1000, 1),
+    }
+    for kind, name in ((VOLATILE, "volatile"), (RELIABLE, "reliable")):
+        expected = stats.sent[kind] * fanout
+        lat = stats.latency[kind]
+        row.update({
+            f"{name}_sent_per_s": round(stats.sent[kind] / args.duration, 1),
+            f"{name}_delivered_per_s": round(stats.received[kind] / args.duration, 1),
+            f"{name}_delivery_ratio": round(stats.received[kind] / expected, 4) if expected else None,
+            f"{name}_p50_ms": round(statistics.median(lat) * 1000, 2) if lat else None,
+            f"{name}_p99_ms": round(_pct(lat, 99) * 1000, 2) if lat else None,
+        })
+    for name in COUNTERS:
+        if name in after:
+            row[f"server_{name}"] = int(after[name] - before.get(name, 0))
+    row["ok"] = bool(
+        not failed
+        and (row["reliable_delivery_ratio"] in (None, 1.0))
+        and (row["reliable_p99_ms"] is None or row["reliable_p99_ms"] <= args.max_p99_ms)
+    )
+    if failed and args.verbose:
+        print(f"  {len(failed)} client(s) failed, e.g. {failed[0]!r}", file=sys.stderr)
+    return row
+
+
+COLUMNS = [
+    ("rooms", 6), ("clients", 7), ("volatile_delivered_per_s", 12), ("volatile_delivery_ratio", 9),
+    ("volatile_p99_ms", 10), ("reliable_delivered_per_s", 12), ("reliable_delivery_ratio", 9),
+    ("reliable_p99_ms", 10), ("client_lag_ms", 8), ("ok", 5),
+]
+
+
+async def run(args) -> List[dict]:
+    rows: List[dict] = []
+
+    async def steps(base: str) -> None:
+        for rooms in args.rooms:
+            row = await step(base, rooms, args)
+            rows.append(row)
+            if not args.json:
+                print("  ".join(f"{str(row.get(c)):>{w}}" for c, w in COLUMNS), flush=True)
+            if not row["ok"] and not args.keep_going:
+                break
+
+    if args.url:
+        await steps(args.url.rstrip("/"))
+    else:
+        async with local_uvicorn({"COLLAB_ENABLED": "true", "FIREBASE_STORAGE_TYPE": "memory"}) as base:
+            await steps(base)
+    return rows
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--url", help="server to load (default: start a local uvicorn)")
+    ap.add_argument("--rooms", type=_ints, default=[10, 50, 100, 200, 400], help="room counts to step through")
+    ap.add_argument("--clients", type=int, default=5, help="clients per room")
+    ap.add_argument("--duration", type=float, default=10.0, help="seconds of traffic per step")
+    ap.add_argument("--rate", type=float, default=20.0, help="pointer updates per client per second (volatile)")
+    ap.add_argument("--scene-rate", type=float, default=1.0, help="scene updates per client per second (reliable)")
+    ap.add_argument("--pointer-bytes", type=int, default=128)
+    ap.add_argument("--scene-bytes", type=int, default=8192)
+    ap.add_argument("--max-p99-ms", type=float, default=250.0, help="reliable p99 above this fails a step")
+    ap.add_argument("--settle", type=float, default=1.0, help="seconds to wait for late deliveries after a step")
+    ap.add_argument("--connect-batch", type=int, default=50, help="connections opened between short pauses")
+    ap.add_argument("--keep-going", action="store_true", help="run every step even after one fails")
+    ap.add_argument("--json", action="store_true", help="print a JSON report instead of a table")
+    ap.add_argument("--out", help="also write the JSON report to this file")
+    ap.add_argument("-v", "--verbose", action="store_true")
+    args = ap.parse_args(argv)
+    if args.clients < 2:
+        ap.error("--clients must be at least 2 (someone has to receive)")
+    args.pointer_bytes = max(args.pointer_bytes, STAMP.size)
+    args.scene_bytes = max(args.scene_bytes, STAMP.size)
+
+    if not args.json:
+        print("  ".join(f"{c[:w] if len(c) > w else c:>{w}}" for c, w in COLUMNS), flush=True)
+    rows = asyncio.run(run(args))
+    report = {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            "cpus": os.cpu_count(),
+            "args": {k: v for k, v in vars(args).items() if k not in ("json", "out", "verbose")},
+        },
+        "results": rows,
+        "max_ok": max((r["clients"] for r in rows if r["ok"]), default=0),
+    }
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(report, f, indent=2)
+    if args.json:
+        print(json.dumps(report, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
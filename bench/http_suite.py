@@ -0,0 +1,380 @@
+"""HTTP benchmark suite: uploads, downloads, admin listing and SPA page loads.
+
+Drives the real app either in-process through ``httpx.ASGITransport`` or over
+TCP against a local ``uvicorn`` child process, once per storage backend, and
+reports throughput and latency percentiles for every scenario:
+
+- ``post``: ``POST /api/v2/post`` per body size and concurrency level
+- ``get``: ``GET /api/v2/{id}`` of a document of each size
+- ``list``: the first admin page (by date, by name, and a name search) with
+  1k/10k/100k keyed documents in the store
+- ``spa``: ``/`` and a client-side route through ``spa_fallback``, plus a
+  static asset, gzip accepted
+
+Every backend/transport pair starts from an empty temporary directory and a
+synthetic frontend build, so runs are reproducible.
+
+    python -m bench.http_suite                           # table on stdout
+    python -m bench.http_suite --quick --out base.json   # JSON results too
+    python -m bench.http_suite --baseline base.json      # exit 1 on regressions
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import platform
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Awaitable, Callable, Dict, List, Optional
+
+import httpx
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Admin batch-meta requests used while seeding; below the default ADMIN_BATCH_MAX
+SEED_BATCH = 500
+
+
+def _pct(values, p):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(p / 100 * (len(values) - 1))))]
+
+
+def _size_label(n: int) -> str:
+    if n >= 1 << 20 and n % (1 << 20) == 0:
+        return f"{n >> 20}MiB"
+    if n >= 1 << 10 and n % (1 << 10) == 0:
+        return f"{n >> 10}KiB"
+    return f"{n}B"
+
+
+def _ints(s: str) -> List[int]:
+    return [int(x) for x in s.split(",") if x.strip()]
+
+
+def _words(s: str) -> List[str]:
+    return [x.strip() for x in s.split(",") if x.strip()]
+
+
+def make_frontend(path: str) -> str:
+    """Write a small stand-in for the Excalidraw build: ``index.html`` plus one JS asset."""
+    os.makedirs(os.path.join(path, "assets"), exist_ok=True)
+    scripts = "\n".join(f'<link rel="modulepreload" href="/assets/chunk-{i}.js">' for i in range(40))
+    with open(os.path.join(path, "index.html"), "w") as f:
+        f.write(
+            "<!doctype html><html><head><meta charset=\"utf-8\"><title>Excalidraw</title>\n"
+            f"{scripts}\n<script type=\"module\" src=\"/assets/index.js\"></script></head>"
+            "<body><div id=\"root\"></div></body></html>\n"
+        )
+    with open(os.path.join(path, "assets", "index.js"), "w") as f:
+        for i in range(4000):
+            f.write(f"export function f{i}(a,b){{return a*{i}+b-{i % 7};}}\n")
+    return path
+
+
+async def drive(
+    send: Callable[[int], Awaitable[httpx.Response]], requests: int, concurrency: int, warmup: int = 0
+) -> dict:
+    """Issue ``requests`` calls of ``send(n)`` from ``concurrency`` workers; latency stats in ms."""
+    for n in range(warmup):
+        await send(-1 - n)
+    latencies: List[float] = []
+    errors = 0
+    todo = iter(range(requests))
+
+    async def worker() -> None:
+        nonlocal errors
+        # One shared iterator: each worker pulls the next request number
+        for n in todo:
+            t0 = time.perf_counter()
+            try:
+                ok = (await send(n)).status_code < 400
+            except httpx.HTTPError:
+                ok = False
+            latencies.append(time.perf_counter() - t0)
+            errors += not ok
+
+    t0 = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(min(concurrency, requests))))
+    elapsed = time.perf_counter() - t0
+    return {
+        "concurrency": concurrency,
+        "requests": requests,
+        "errors": errors,
+        "seconds": round(elapsed, 3),
+        "throughput_rps": round(requests / elapsed, 1) if elapsed else 0.0,
+        "p50_ms": round(statistics.median(latencies) * 1000, 3) if latencies else 0.0,
+        "p90_ms": round(_pct(latencies, 90) * 1000, 3),
+        "p99_ms": round(_pct(latencies, 99) * 1000, 3),
+        "max_ms": round(max(latencies, default=0.0) * 1000, 3),
+    }
+
+
+@contextlib.asynccontextmanager
+async def asgi_client(backend: str, data_dir: str, frontend: str, args):
+    """The app in this process, with a fresh store for ``backend`` under ``data_dir``."""
+    from server.app import create_app
+    from server.config import settings
+    from server.routes import documents
+    from server.storage import get_async_store
+
+    previous = documents.store, settings.FRONTEND_DIR
+    store = get_async_store(backend, data_dir, settings.STORAGE_THREADS, instrument=settings.METRICS_ENABLED)
+    documents.store = store
+    settings.FRONTEND_DIR = frontend
+    try:
+        app = create_app()
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=args.timeout) as client:
+            yield client
+    finally:
+        documents.store, settings.FRONTEND_DIR = previous
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+@contextlib.asynccontextmanager
+async def local_uvicorn(env: Dict[str, str], timeout: float = 30.0):
+    """Run ``server.app:app`` in a ``uvicorn`` child process on a free port; yields its base URL."""
+    port = _free_port()
+    cmd = [
+        sys.executable, "-m", "uvicorn", "server.app:app",
+        "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning", "--no-access-log",
+    ]
+    proc = subprocess.Popen(cmd, cwd=ROOT, env=dict(os.environ, WEB_CONCURRENCY="1", **env))
+    base = f"http://127.0.0.1:{port}"
+    try:
+        async with httpx.AsyncClient(base_url=base) as probe:
+            deadline = time.monotonic() + timeout
+            while True:
+                if proc.poll() is not None:
+                    raise RuntimeError(f"uvicorn exited with status {proc.returncode}")
+                try:
+                    if (await probe.get("/ping")).status_code == 200:
+                        break
+                except httpx.TransportError:
+                    pass
+                if time.monotonic() > deadline:
+                    raise RuntimeError(f"uvicorn did not start within {timeout:g}s")
+                await asyncio.sleep(0.1)
+        yield base
+    finally:
+        proc.terminate()
+        try:
+            proc.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+            proc.wait()
+
+
+@contextlib.asynccontextmanager
+async def uvicorn_client(backend: str, data_dir: str, frontend: str, args):
+    """A client for a local ``uvicorn`` serving a fresh store for ``backend``."""
+    env = dict(STORAGE_TYPE=backend, LOCAL_STORAGE_PATH=data_dir, FIREBASE_STORAGE_TYPE="memory", FRONTEND_DIR=frontend)
+    n = max(args.concurrency) + 8
+    limits = httpx.Limits(max_connections=n, max_keepalive_connections=n)
+    async with local_uvicorn(env) as base:
+        async with httpx.AsyncClient(base_url=base, timeout=args.timeout, limits=limits) as client:
+            yield client
+
+
+TRANSPORTS = {"asgi": asgi_client, "uvicorn": uvicorn_client}
+
+
+async def bench_post_get(client: httpx.AsyncClient, args) -> List[dict]:
+    rows = []
+    for size in args.sizes:
+        # The first 8 bytes vary per request so a deduplicating store can't cheat
+        body = os.urandom(min(size, 4096)) * (size // 4096 + 1)
+        body = body[:size]
+        requests = max(1, min(args.requests, args.max_bytes_per_case // max(size, 1)))
+
+        def post(n: int, body=body) -> Awaitable[httpx.Response]:
+            return client.post("/api/v2/post", content=n.to_bytes(8, "big", signed=True) + body[8:])
+
+        for c in args.concurrency:
+            rows.append({"scenario": "post", "case": _size_label(size), "bytes": size, **await drive(post, requests, c, args.warmup)})
+
+        seed = await client.post("/api/v2/post", content=body)
+        seed.raise_for_status()
+        url = f"/api/v2/{seed.json()['id']}"
+
+        def get(n: int, url=url) -> Awaitable[httpx.Response]:
+            return client.get(url)
+
+        for c in args.concurrency:
+            rows.append({"scenario": "get", "case": _size_label(size), "bytes": size, **await drive(get, requests, c, args.warmup)})
+    return rows
+
+
+async def seed_keyed(client: httpx.AsyncClient, start: int, stop: int, concurrency: int = 64) -> None:
+    """Create documents ``start..stop-1`` and give each a name and share key, through the API."""
+    ids: Dict[int, str] = {}
+    todo = iter(range(start, stop))
+
+    async def worker() -> None:
+        for i in todo:
+            r = await client.post("/api/v2/post", content=b'{"type":"excalidraw","elements":[],"n":%d}' % i)
+            r.raise_for_status()
+            ids[i] = r.json()["id"]
+
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    order = sorted(ids)
+    for k in range(0, len(order), SEED_BATCH):
+        items = [{"id": ids[i], "name": f"drawing {i:07d}", "key": f"k{i}"} for i in order[k:k + SEED_BATCH]]
+        r = await client.post("/api/v2/admin/documents/batch-meta", json={"items": items})
+        r.raise_for_status()
+
+
+async def bench_list(client: httpx.AsyncClient, args) -> List[dict]:
+    rows = []
+    have = 0
+    for target in sorted(args.list_docs):
+        t0 = time.perf_counter()
+        await seed_keyed(client, have, target)
+        seeded = time.perf_counter() - t0
+        have = target
+        cases = {
+            "by date": {"limit": 50},
+            "by name": {"limit": 50, "sort": "name", "order": "asc"},
+            "search": {"limit": 50, "q": "drawing 00001"},
+        }
+        for label, params in cases.items():
+
+            def list_page(n: int, params=params) -> Awaitable[httpx.Response]:
+                return client.get("/api/v2/admin/documents", params=params)
+
+            for c in args.list_concurrency:
+                stats = await drive(list_page, args.list_requests, c, args.warmup)
+                rows.append({"scenario": "list", "case": f"{target} docs {label}", "docs": target, "seed_seconds": round(seeded, 2), **stats})
+    return rows
+
+
+async def bench_spa(client: httpx.AsyncClient, args) -> List[dict]:
+    rows = []
+    headers = {"accept-encoding": "gzip", "accept": "text/html"}
+    for label, path in (("index", "/"), ("client route", "/drawings/abc"), ("asset", "/assets/index.js")):
+
+        def load(n: int, path=path) -> Awaitable[httpx.Response]:
+            return client.get(path, headers=headers)
+
+        for c in args.concurrency:
+            rows.append({"scenario": "spa", "case": label, **await drive(load, args.requests, c, args.warmup)})
+    return rows
+
+
+SCENARIOS = {"post_get": bench_post_get, "spa": bench_spa, "list": bench_list}
+
+
+async def run(args) -> List[dict]:
+    results: List[dict] = []
+    with tempfile.TemporaryDirectory(prefix="excalidraw-bench-") as tmp:
+        frontend = make_frontend(os.path.join(tmp, "frontend"))
+        for transport in args.transports:
+            for backend in args.backends:
+                data_dir = tempfile.mkdtemp(prefix=f"{backend}-{transport}-", dir=tmp)
+                async with TRANSPORTS[transport](backend, data_dir, frontend, args) as client:
+                    for name in args.scenarios:
+                        for row in await SCENARIOS[name](client, args):
+                            row = {"backend": backend, "transport": transport, **row}
+                            results.append(row)
+                            if not args.json:
+                                print(_format_row(row), flush=True)
+    return results
+
+
+COLUMNS = [
+    ("transport", 8), ("backend", 11), ("scenario", 8), ("case", 24), ("concurrency", 5),
+    ("throughput_rps", 10), ("p50_ms", 9), ("p90_ms", 9), ("p99_ms", 9), ("errors", 6),
+]
+
+
+def _format_row(row: dict) -> str:
+    return "  ".join(f"{str(row.get(c, '')):>{w}}" for c, w in COLUMNS)
+
+
+def _key(row: dict) -> tuple:
+    return row["transport"], row["backend"], row["scenario"], row["case"], row["concurrency"]
+
+
+def compare(results: List[dict], baseline: List[dict], tolerance: float) -> List[dict]:
+    """Rows whose throughput dropped by more than ``tolerance`` against a previous run."""
+    before = {_key(r): r for r in baseline}
+    worse = []
+    for r in results:
+        old = before.get(_key(r))
+        if old and old["throughput_rps"] and r["throughput_rps"] < old["throughput_rps"] * (1 - tolerance):
+            worse.append({**r, "baseline_rps": old["throughput_rps"], "change": round(r["throughput_rps"] / old["throughput_rps"] - 1, 3)})
+    return worse
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--backends", type=_words, default=["memory", "filesystem"], help="comma-separated STORAGE_TYPE values")
+    ap.add_argument("--transports", type=_words, default=["asgi", "uvicorn"], help="asgi (in-process) and/or uvicorn (local TCP)")
+    ap.add_argument("--scenarios", type=_words, default=list(SCENARIOS), help=f"subset of {','.join(SCENARIOS)}")
+    ap.add_argument("--sizes", type=_ints, default=[1024, 64 * 1024, 1024 * 1024], help="body sizes in bytes")
+    ap.add_argument("--concurrency", type=_ints, default=[1, 16, 64])
+    ap.add_argument("--requests", type=int, default=500, help="requests per post/get/spa case")
+    ap.add_argument("--max-bytes-per-case", type=int, default=256 * 1024 * 1024, help="caps requests for large bodies")
+    ap.add_argument("--list-docs", type=_ints, default=[1000, 10000, 100000], help="store sizes for the listing scenario")
+    ap.add_argument("--list-requests", type=int, default=200)
+    ap.add_argument("--list-concurrency", type=_ints, default=[1, 16])
+    ap.add_argument("--warmup", type=int, default=5, help="untimed requests before each case")
+    ap.add_argument("--timeout", type=float, default=60.0)
+    ap.add_argument("--quick", action="store_true", help="small run for a smoke check (overrides sizes and counts)")
+    ap.add_argument("--json", action="store_true", help="print the JSON report instead of a table")
+    ap.add_argument("--out", help="also write the JSON report to this file")
+    ap.add_argument("--baseline", help="JSON report of an earlier run to compare throughput against")
+    ap.add_argument("--tolerance", type=float, default=0.2, help="allowed throughput drop vs. --baseline")
+    args = ap.parse_args(argv)
+    if args.quick:
+        args.sizes, args.concurrency, args.requests = [1024, 256 * 1024], [1, 16], 100
+        args.list_docs, args.list_requests, args.list_concurrency = [1000], 50, [1]
+    unknown = set(args.transports) - set(TRANSPORTS) or set(args.scenarios) - set(SCENARIOS)
+    if unknown:
+        ap.error(f"unknown: {', '.join(sorted(unknown))}")
+
+    if not args.json:
+        print("  ".join(f"{c:>{w}}" for c, w in COLUMNS), flush=True)
+    results = asyncio.run(run(args))
+    report = {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "args": {k: v for k, v in vars(args).items() if k not in ("json", "out", "baseline")},
+        },
+        "results": results,
+    }
+    status = 0
+    if args.baseline:
+        with open(args.baseline) as f:
+            worse = compare(results, json.load(f)["results"], args.tolerance)
+        report["regressions"] = worse
+        for r in worse:
+            print(f"regression: {' / '.join(map(str, _key(r)))}: {r['baseline_rps']} -> {r['throughput_rps']} rps ({r['change']:+.0%})", file=sys.stderr)
+        status = 1 if worse else 0
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(report, f, indent=2)
+    if args.json:
+        print(json.dumps(report, indent=2))
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,81 @@
+"""Memory per document and listing cost of ``MemoryStore``.
+
+Fills a store with ``--docs`` documents that share one body object, so the
+traced allocation is the store's own bookkeeping (ids, timestamps, names,
+keys, indexes) rather than the bodies. A quarter of the documents get a name
+and share key, as if saved from the admin UI. Then it times the first admin
+page (keyed, newest first), the page after it, a page from the middle of the
+store, and a name-sorted page.
+
+    python -m bench.memory_store --docs 100000
+    python -m bench.memory_store --docs 1000000 --json
+"""
+from __future__ import annotations
+
+import argparse
+import gc
+import json
+import statistics
+import time
+import tracemalloc
+
+from server.storage import MemoryStore, cursor_of
+
+
+def _time(fn, repeat: int) -> float:
+    samples = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - t0)
+    return round(statistics.median(samples) * 1000, 3)
+
+
+def run(docs: int, body_size: int, repeat: int) -> dict:
+    body = b"x" * body_size
+    gc.collect()
+    tracemalloc.start()
+    base = tracemalloc.get_traced_memory()[0]
+    store = MemoryStore()
+    # No id list kept here (one id marks the middle): whatever is still allocated is held by the store
+    for i in range(docs):
+        id_ = store.create(body)
+        if i % 4 == 0:
+            store.update_meta(id_, name=f"drawing {i:07d}", key=f"k{i:020d}")
+        if i == docs // 2:
+            middle = id_
+    del id_
+    used = tracemalloc.get_traced_memory()[0] - base
+    tracemalloc.stop()
+
+    first = store.list(limit=50, keyed=True)
+    next_after = cursor_of(first[-1], "created_at")
+    deep_after = cursor_of(store.list(prefix=middle, limit=1)[0], "created_at")
+    return {
+        "docs": docs,
+        "bytes_per_doc": round(used / docs, 1),
+        "list_first_page_ms": _time(lambda: store.list(limit=50, keyed=True), repeat),
+        "list_next_page_ms": _time(lambda: store.list(limit=50, keyed=True, after=next_after), repeat),
+        "list_deep_page_ms": _time(lambda: store.list(limit=50, keyed=True, after=deep_after), repeat),
+        "list_by_name_ms": _time(lambda: store.list(limit=50, keyed=True, sort="name", descending=False), repeat),
+        "usage_ms": _time(store.usage, repeat),
+    }
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--docs", type=int, default=100_000)
+    ap.add_argument("--body-size", type=int, default=1024, help="size of the (shared) body")
+    ap.add_argument("--repeat", type=int, default=5, help="timed runs per listing, median reported")
+    ap.add_argument("--json", action="store_true", help="print JSON instead of a table")
+    args = ap.parse_args()
+    result = run(args.docs, args.body_size, args.repeat)
+    if args.json:
+        print(json.dumps(result))
+        return
+    for k, v in result.items():
+        print(f"{k:>20}  {v}")
+
+
+if __name__ == "__main__":
+    main()
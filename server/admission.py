@@ -0,0 +1,172 @@
+"""Admission control for the upload and read endpoints (pure ASGI).
+
+Requests are sorted into classes by method and path (no routing needed):
+
+- ``upload``: ``POST /api/v2/post`` and Firebase ``documents:commit``
+- ``read``: ``GET``/``HEAD /api/v2/{id}`` and Firebase ``documents:batchGet``
+
+Everything else (admin, static files, metrics, websockets) passes untouched.
+Each class has an optional per-client token bucket (``rate`` requests per
+second, ``burst`` deep; an empty bucket answers ``429``) and an optional
+concurrency limit held until the response is sent (all slots busy answers
+``503``). Both answers carry ``Retry-After`` and go out without reading the
+request body, so a rejected request costs a few dict operations instead of a
+storage thread.
+
+Clients are identified by ``scope["client"]``. Behind a reverse proxy, let
+uvicorn rewrite it from ``X-Forwarded-For`` (``FORWARDED_ALLOW_IPS``), or
+every user shares the proxy's bucket.
+"""
+from __future__ import annotations
+
+import json
+import math
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional, Tuple
+
+
+@dataclass
+class Limit:
+    # Requests in flight at once; 0 is unlimited
+    concurrency: int = 0
+    # Requests per second per client; 0 disables the bucket
+    rate: float = 0.0
+    # Bucket depth; 0 means max(1, rate)
+    burst: int = 0
+
+
+def route_class(method: str, path: str) -> Optional[str]:
+    if path.startswith("/api/v2/"):
+        rest = path[8:].rstrip("/")
+        if method == "POST":
+            return "upload" if rest == "post" else None
+        if method in ("GET", "HEAD") and rest and "/" not in rest and rest != "admin":
+            return "read"
+        return None
+    if method == "POST" and path.startswith("/v1/projects/"):
+        if path.endswith("documents:commit"):
+            return "upload"
+        if path.endswith("documents:batchGet"):
+            return "read"
+    return None
+
+
+class TokenBuckets:
+    """Per-client token buckets, remembering at most ``max_clients`` (least recently seen go first)."""
+
+    def __init__(self, rate: float, burst: int, max_clients: int, clock: Callable[[], float] = time.monotonic) -> None:
+        self.rate = rate
+        self.burst = float(burst or max(1.0, rate))
+        self.max_clients = max_clients
+        self.clock = clock
+        # client -> [tokens, last refill]
+        self._buckets: "OrderedDict[str, List[float]]" = OrderedDict()
+
+    def take(self, client: str) -> float:
+        """Spend a token; returns 0 when admitted, else the seconds until one is available."""
+        now = self.clock()
+        b = self._buckets.get(client)
+        if b is None:
+            b = self._buckets[client] = [self.burst, now]
+            if len(self._buckets) > self.max_clients:
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(client)
+            b[0] = min(self.burst, b[0] + (now - b[1]) * self.rate)
+            b[1] = now
+        if b[0] >= 1.0:
+            b[0] -= 1.0
+            return 0.0
+        return (1.0 - b[0]) / self.rate
+
+    def __len__(self) -> int:
+        return len(self._buckets)
+
+
+class Admission:
+    """Limits and counters shared by the middleware and ``/metrics``."""
+
+    def __init__(
+        self,
+        limits: Dict[str, Limit],
+        max_clients: int = 10000,
+        busy_retry_after: int = 1,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.limits = {cls: lim for cls, lim in limits.items() if lim.concurrency > 0 or lim.rate > 0}
+        self.buckets = {
+            cls: TokenBuckets(lim.rate, lim.burst, max_clients, clock)
+            for cls, lim in self.limits.items()
+            if lim.rate > 0
+        }
+        self.busy_retry_after = busy_retry_after
+        self.active: Dict[str, int] = {cls: 0 for cls in self.limits}
+        # (class, reason) -> rejected requests; reason is "rate" (429) or "busy" (503)
+        self.rejected: Dict[Tuple[str, str], int] = {}
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.limits)
+
+    def admit(self, cls: str, client: str) -> Optional[Tuple[int, int]]:
+        """None when the request may proceed (and holds a slot), else ``(status, retry_after)``."""
+        buckets = self.buckets.get(cls)
+        if buckets is not None:
+            wait = buckets.take(client)
+            if wait:
+                self.rejected[cls, "rate"] = self.rejected.get((cls, "rate"), 0) + 1
+                return 429, max(1, math.ceil(wait))
+        limit = self.limits[cls].concurrency
+        if limit and self.active[cls] >= limit:
+            self.rejected[cls, "busy"] = self.rejected.get((cls, "busy"), 0) + 1
+            return 503, self.busy_retry_after
+        self.active[cls] += 1
+        return None
+
+    def release(self, cls: str) -> None:
+        self.active[cls] -= 1
+
+
+_DETAIL = {429: "too many requests", 503: "server busy"}
+
+
+class AdmissionMiddleware:
+    """Pure ASGI middleware applying an ``Admission`` before the request reaches the app."""
+
+    def __init__(self, app, admission: Admission) -> None:
+        self.app = app
+        self.admission = admission
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        cls = route_class(scope["method"], scope["path"])
+        if cls is None or cls not in self.admission.limits:
+            await self.app(scope, receive, send)
+            return
+        client = scope.get("client")
+        verdict = self.admission.admit(cls, client[0] if client else "unknown")
+        if verdict is not None:
+            await self._reject(send, *verdict)
+            return
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.admission.release(cls)
+
+    @staticmethod
+    async def _reject(send, status: int, retry_after: int) -> None:
+        body = json.dumps({"detail": _DETAIL[status]}).encode()
+        await send({
+            "type": "http.response.start",
+            "status": status,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+                (b"retry-after", str(retry_after).encode()),
+            ],
+        })
+        await send({"type": "http.response.body", "body": body})
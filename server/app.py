@@ -1,14 +1,82 @@
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from .admission import Admission, AdmissionMiddleware, Limit
 from .config import settings
+from .metrics import MetricsMiddleware
+from .retention import GarbageCollector, RetentionPolicy
+from .routes import documents
 from .routes.documents import router as documents_router
 from .routes.firebase import router as firebase_router
 from .routes.ui import mount_static
 from .routes.admin import router as admin_router
+from .routes.collab import rooms, router as collab_router
+from .routes.metrics import router as metrics_router
+
+
+def check_deployment() -> None:
+    """Refuse configurations that silently break with more than one worker process."""
+    if settings.WORKERS <= 1:
+        return
+    per_process = [
+        f"{name}={value}"
+        for name, value in (
+            ("STORAGE_TYPE", settings.STORAGE_TYPE),
+            ("FIREBASE_STORAGE_TYPE", settings.FIREBASE_STORAGE_TYPE),
+        )
+        if value in ("memory", "memory-wal")
+    ]
+    if per_process:
+        raise RuntimeError(
+            f"WEB_CONCURRENCY={settings.WORKERS} but {', '.join(per_process)} keeps data per process; "
+            "use filesystem or sqlite storage, or run a single worker"
+        )
+    if settings.COLLAB_ENABLED:
+        raise RuntimeError(
+            f"WEB_CONCURRENCY={settings.WORKERS} but COLLAB_ENABLED keeps collaboration rooms per process; "
+            "run a single worker or a separate room server"
+        )
 
 
 def create_app() -> FastAPI:
-    app = FastAPI(title="Excalidraw All-in-one (FastAPI)")
+    check_deployment()
+    gc = GarbageCollector(
+        documents.store,
+        RetentionPolicy(
+            unkeyed_max_age_days=settings.RETENTION_UNKEYED_DAYS,
+            max_total_bytes=settings.RETENTION_MAX_BYTES,
+            interval=settings.RETENTION_INTERVAL,
+            batch=settings.RETENTION_BATCH,
+        ),
+    )
+
+    @asynccontextmanager
+    async def lifespan(app: FastAPI):
+        # Background retention sweeps; a no-op unless a policy is configured
+        gc.start()
+        yield
+        await gc.stop()
+        await rooms.stop()
+
+    app = FastAPI(title="Excalidraw All-in-one (FastAPI)", lifespan=lifespan)
+    app.state.gc = gc
+
+    # Inside CORS so browsers can read 429/503 answers; before routing so they cost nothing
+    admission = Admission(
+        {
+            "upload": Limit(
+                settings.ADMISSION_UPLOAD_CONCURRENCY, settings.ADMISSION_UPLOAD_RATE, settings.ADMISSION_UPLOAD_BURST
+            ),
+            "read": Limit(
+                settings.ADMISSION_READ_CONCURRENCY, settings.ADMISSION_READ_RATE, settings.ADMISSION_READ_BURST
+            ),
+        },
+        max_clients=settings.ADMISSION_MAX_CLIENTS,
+    )
+    if admission.enabled:
+        app.add_middleware(AdmissionMiddleware, admission=admission)
+        app.state.admission = admission
 
     # CORS: allow all by default; tighten in settings if needed
     app.add_middleware(
@@ -24,14 +92,24 @@ def create_app() -> FastAPI:
     app.include_router(documents_router)
     app.include_router(firebase_router)
     app.include_router(admin_router)
-
-    # Static frontend
-    mount_static(app, settings.FRONTEND_DIR)
+    if settings.METRICS_ENABLED:
+        app.include_router(metrics_router)
+    if settings.COLLAB_ENABLED:
+        # Realtime rooms at /socket.io/ (what WS_ORIGIN points the frontend at)
+        app.include_router(collab_router)
+        app.state.rooms = rooms
 
     @app.get("/ping")
     def ping():
         return {"msg": "pong"}
 
+    # Static frontend (mounted at "/", so it must come after every route)
+    mount_static(app, settings.FRONTEND_DIR, generate_compressed=settings.STATIC_PRECOMPRESS)
+
+    # Outermost, so the timing covers the SPA fallback and every other middleware
+    if settings.METRICS_ENABLED:
+        app.add_middleware(MetricsMiddleware)
+
     return app
 
 
@@ -0,0 +1,270 @@
+"""Streaming export and import of a whole document store as a tar archive.
+
+One archive member per document, oldest first: the member name is the id,
+its mtime the creation time and its content the body. Names and share keys
+travel as pax records in the xattr namespace (``user.excalidraw.name`` /
+``.key``), which GNU tar understands, so ``tar tvf`` lists an export quietly
+and ``tar xf`` unpacks the bodies.
+
+Both directions stream. The export pages through ``list`` and reads one body
+at a time in ``CHUNK``-sized pieces; the import parses the archive as it
+arrives, writes each body through ``create_stream`` and batches name/key
+updates into ``update_meta_many`` calls. Memory use does not grow with the
+number or total size of the documents.
+"""
+from __future__ import annotations
+
+import asyncio
+import re
+import tarfile
+from datetime import datetime, timedelta
+from typing import AsyncIterable, AsyncIterator, BinaryIO, Dict, Optional, Tuple
+
+from .storage import META_SUFFIX, Blob, DocumentInfo, cursor_of
+
+CHUNK = 256 * 1024
+BATCH = 100
+PAX_NAME = "SCHILY.xattr.user.excalidraw.name"
+PAX_KEY = "SCHILY.xattr.user.excalidraw.key"
+
+_BLOCK = 512
+_EPOCH = datetime(1970, 1, 1)
+# Ids are file names in filesystem storage: no separators, no leading dot, and
+# nothing the store keeps beside documents (two-character shard directories,
+# dedup blobs, sidecars, temp and lock files, databases)
+_ID = re.compile(r"^[A-Za-z0-9_-][A-Za-z0-9._-]{0,199}$")
+_RESERVED = {"blobs", "memory-wal", "LOCK"}
+_RESERVED_SUFFIXES = (META_SUFFIX, ".tmp", ".lock")
+
+
+def _valid_id(id_: str) -> bool:
+    """Whether an archive member name can be imported as a document id."""
+    return (
+        bool(_ID.match(id_))
+        and len(id_) != 2
+        and id_ not in _RESERVED
+        and not id_.endswith(_RESERVED_SUFFIXES)
+        and ".sqlite3" not in id_
+    )
+
+
+class ArchiveError(ValueError):
+    """The import stream is not a readable tar archive."""
+
+
+def _timestamp(dt: Optional[datetime]) -> str:
+    """Exact ``seconds[.micros]`` for a pax ``mtime`` record."""
+    delta = (dt or datetime.utcnow()) - _EPOCH
+    seconds = delta.days * 86400 + delta.seconds
+    return f"{seconds}.{delta.microseconds:06d}" if delta.microseconds else str(seconds)
+
+
+def _parse_timestamp(value: str) -> datetime:
+    seconds, _, frac = value.partition(".")
+    return _EPOCH + timedelta(seconds=int(seconds), microseconds=int((frac + "000000")[:6]) if frac else 0)
+
+
+def member_header(info: DocumentInfo, size: int) -> bytes:
+    """The pax header block(s) that precede a document body of ``size`` bytes."""
+    ti = tarfile.TarInfo(info.id)
+    ti.size = size
+    ti.mode = 0o644
+    ts = _timestamp(info.created_at)
+    ti.mtime = int(ts.partition(".")[0])
+    pax = {"mtime": ts} if "." in ts else {}
+    if info.name:
+        pax[PAX_NAME] = info.name
+    if info.key:
+        pax[PAX_KEY] = info.key
+    ti.pax_headers = pax
+    return ti.tobuf(tarfile.PAX_FORMAT, "utf-8", "surrogateescape")
+
+
+async def _open(store, id_: str) -> Optional[Tuple[Blob, Optional[BinaryIO]]]:
+    """The document's blob, with its file already open; None once it has been deleted.
+
+    Opening before the member header goes out lets a document deleted since it
+    was listed be skipped instead of cutting the archive short. An open file
+    stays readable even if it is unlinked afterwards.
+    """
+    loop = asyncio.get_running_loop()
+    for _ in range(2):
+        blob = await store.find_blob(id_)
+        if blob is None:
+            return None
+        if blob.data is not None:
+            return blob, None
+        try:
+            return blob, await loop.run_in_executor(None, open, blob.path, "rb")
+        except FileNotFoundError:
+            continue  # deleted, or dropped from a local cache: look it up once more
+    return None
+
+
+async def _blob_chunks(blob: Blob, f: Optional[BinaryIO]) -> AsyncIterator[bytes]:
+    if f is None:
+        for i in range(0, len(blob.data), CHUNK):
+            yield blob.data[i:i + CHUNK]
+        return
+    loop = asyncio.get_running_loop()
+    remaining = blob.size
+    while remaining > 0:
+        chunk = await loop.run_in_executor(None, f.read, min(CHUNK, remaining))
+        if not chunk:
+            raise ArchiveError(f"{blob.path} ended {remaining} byte(s) early")
+        remaining -= len(chunk)
+        yield chunk
+
+
+async def export_tar(store, batch: int = BATCH) -> AsyncIterator[bytes]:
+    """Yield a tar archive of every document in ``store`` (an ``AsyncStore``), oldest first."""
+    after = None
+    while True:
+        page = await store.list(limit=batch, after=after, sort="created_at", descending=False)
+        if not page:
+            break
+        for info in page:
+            opened = await _open(store, info.id)
+            if opened is None:
+                continue  # deleted since it was listed
+            blob, f = opened
+            try:
+                yield member_header(info, blob.size)
+                async for chunk in _blob_chunks(blob, f):
+                    yield chunk
+            finally:
+                if f is not None:
+                    f.close()
+            if blob.size % _BLOCK:
+                yield bytes(_BLOCK - blob.size % _BLOCK)
+        after = cursor_of(page[-1], "created_at")
+    yield bytes(2 * _BLOCK)
+
+
+class _Stream:
+    """Sized reads over an async byte stream, holding at most one incoming chunk."""
+
+    def __init__(self, chunks: AsyncIterable[bytes]) -> None:
+        self._it = chunks.__aiter__()
+        self._buf = b""
+        self._pos = 0
+
+    async def read(self, n: int) -> bytes:
+        """Up to ``n`` bytes; ``b""`` at the end of the stream."""
+        while self._pos >= len(self._buf):
+            try:
+                self._buf = bytes(await self._it.__anext__())
+            except StopAsyncIteration:
+                return b""
+            self._pos = 0
+        out = self._buf[self._pos:self._pos + n]
+        self._pos += len(out)
+        return out
+
+    async def read_exact(self, n: int) -> bytes:
+        parts = []
+        while n > 0:
+            part = await self.read(n)
+            if not part:
+                raise ArchiveError("archive is truncated")
+            parts.append(part)
+            n -= len(part)
+        return b"".join(parts)
+
+    async def header(self) -> Optional[bytes]:
+        """The next header block; None when the stream ends (a missing end-of-archive marker is tolerated)."""
+        first = await self.read(_BLOCK)
+        if not first:
+            return None
+        return first + await self.read_exact(_BLOCK - len(first)) if len(first) < _BLOCK else first
+
+    async def member(self, size: int) -> AsyncIterator[bytes]:
+        """The ``size`` content bytes of a member, then its padding is skipped."""
+        remaining = size
+        while remaining > 0:
+            part = await self.read(min(remaining, CHUNK))
+            if not part:
+                raise ArchiveError("archive is truncated")
+            remaining -= len(part)
+            yield part
+        if size % _BLOCK:
+            await self.read_exact(_BLOCK - size % _BLOCK)
+
+    async def skip(self, size: int) -> None:
+        async for _ in self.member(size):
+            pass
+
+
+def _parse_pax(raw: bytes) -> Dict[str, str]:
+    """``"<len> <key>=<value>\\n"`` records of a pax extended header."""
+    out: Dict[str, str] = {}
+    pos = 0
+    while pos < len(raw):
+        space = raw.find(b" ", pos)
+        if space < 0:
+            break
+        try:
+            length = int(raw[pos:space])
+        except ValueError:
+            raise ArchiveError("malformed pax header")
+        record = raw[space + 1:pos + length - 1]
+        key, _, value = record.partition(b"=")
+        out[key.decode("utf-8", "surrogateescape")] = value.decode("utf-8", "surrogateescape")
+        pos += length
+    return out
+
+
+async def import_tar(store, chunks: AsyncIterable[bytes], batch: int = BATCH) -> Dict[str, int]:
+    """Create every document of a tar archive in ``store`` (an ``AsyncStore``), keeping ids and times.
+
+    Ids that already exist are skipped, so an interrupted import can be rerun.
+    Members that are not regular files are ignored, and regular files whose
+    name isn't a valid id are counted as ``invalid``. Raises ``ArchiveError``
+    on a malformed archive; documents written before that point stay.
+    """
+    stats = {"imported": 0, "skipped": 0, "invalid": 0, "bytes": 0}
+    stream = _Stream(chunks)
+    meta: Dict[str, Dict[str, Optional[str]]] = {}
+    pax: Dict[str, str] = {}
+    try:
+        while True:
+            block = await stream.header()
+            if block is None or block == bytes(_BLOCK):
+                break
+            try:
+                ti = tarfile.TarInfo.frombuf(block, "utf-8", "surrogateescape")
+            except tarfile.HeaderError as e:
+                raise ArchiveError(f"not a tar archive ({e})")
+            if ti.type in (tarfile.XHDTYPE, tarfile.SOLARIS_XHDTYPE):
+                pax.update(_parse_pax(b"".join([c async for c in stream.member(ti.size)])))
+                continue
+            size = int(pax.get("size", ti.size))
+            if not ti.isreg():
+                await stream.skip(size)
+                pax = {}
+                continue
+            id_ = pax.get("path", ti.name)
+            id_ = id_[2:] if id_.startswith("./") else id_
+            created = _parse_timestamp(pax["mtime"]) if "mtime" in pax else _EPOCH + timedelta(seconds=int(ti.mtime))
+            fields = {f: pax.get(k) for f, k in (("name", PAX_NAME), ("key", PAX_KEY)) if pax.get(k)}
+            pax = {}
+            if not _valid_id(id_):
+                stats["invalid"] += 1
+                await stream.skip(size)
+                continue
+            if await store.exists(id_):
+                stats["skipped"] += 1
+                await stream.skip(size)
+                continue
+            await store.create_stream(stream.member(size), id_=id_, created=created)
+            stats["imported"] += 1
+            stats["bytes"] += size
+            if fields:
+                meta[id_] = fields
+            if len(meta) >= batch:
+                await store.update_meta_many(meta)
+                meta = {}
+    finally:
+        if meta:
+            await store.update_meta_many(meta)
+    return stats
@@ -0,0 +1,159 @@
+"""Maintenance commands (storage and frontend assets).
+
+    python -m server.cli migrate-layout [--path DATA_DIR] [--dry-run]
+    python -m server.cli reindex [--path DATA_DIR]
+    python -m server.cli precompress [--dir FRONTEND_DIR]
+    python -m server.cli compression-report [--path DATA_DIR]
+    python -m server.cli export [--storage TYPE] [--path DATA_DIR] [--out FILE]
+    python -m server.cli import [--storage TYPE] [--path DATA_DIR] [--in FILE]
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import sys
+
+from .config import settings
+from .storage import ContentAddressedStore, FilesystemStore, compression_report, get_async_store
+
+
+def _filesystem_store(args) -> FilesystemStore:
+    cls = ContentAddressedStore if settings.STORAGE_DEDUP else FilesystemStore
+    return cls(args.path, shard_depth=settings.STORAGE_SHARD_DEPTH, compression=settings.STORAGE_COMPRESSION)
+
+
+def cmd_migrate_layout(args) -> int:
+    store = _filesystem_store(args)
+    moved = store.migrate_layout(dry_run=args.dry_run)
+    verb = "would move" if args.dry_run else "moved"
+    print(f"{verb} {moved} file(s) into the sharded layout under {args.path}")
+    return 0
+
+
+def cmd_reindex(args) -> int:
+    store = _filesystem_store(args)
+    store.reindex()
+    print(f"rebuilt index for {args.path}")
+    return 0
+
+
+def cmd_precompress(args) -> int:
+    from .routes.ui import precompress
+
+    written = precompress(args.dir)
+    print(f"wrote {written} compressed file(s) under {args.dir}")
+    return 0
+
+
+def _report_row(label: str, row: dict) -> None:
+    saved = 1 - row["stored"] / row["logical"] if row["logical"] else 0.0
+    print(f"{label:>8}  {row['files']:>8}  {row['stored']:>14}  {row['logical']:>14}  {saved:>6.1%}")
+
+
+def cmd_compression_report(args) -> int:
+    report = compression_report(args.path)
+    print(f"{'codec':>8}  {'files':>8}  {'stored':>14}  {'logical':>14}  {'saved':>6}")
+    total = {"files": 0, "stored": 0, "logical": 0}
+    for codec, row in sorted(report.items()):
+        for k in total:
+            total[k] += row[k]
+        _report_row(codec, row)
+    _report_row("total", total)
+    return 0
+
+
+def _archive_store(args):
+    if args.storage == "memory":
+        raise SystemExit(
+            "memory storage lives inside the server process; use GET /api/v2/admin/export "
+            "and POST /api/v2/admin/import instead"
+        )
+    return get_async_store(args.storage, args.path, settings.STORAGE_THREADS, **settings.store_options())
+
+
+def cmd_export(args) -> int:
+    from .archive import export_tar
+
+    store = _archive_store(args)
+    out = sys.stdout.buffer if args.out == "-" else open(args.out, "wb")
+
+    async def run() -> None:
+        async for chunk in export_tar(store):
+            out.write(chunk)
+
+    try:
+        asyncio.run(run())
+    finally:
+        if out is not sys.stdout.buffer:
+            out.close()
+    return 0
+
+
+def cmd_import(args) -> int:
+    from .archive import ArchiveError, import_tar
+
+    store = _archive_store(args)
+    src = sys.stdin.buffer if args.input == "-" else open(args.input, "rb")
+
+    async def chunks():
+        while True:
+            chunk = src.read(256 * 1024)
+            if not chunk:
+                return
+            yield chunk
+
+    try:
+        stats = asyncio.run(import_tar(store, chunks()))
+    except ArchiveError as e:
+        print(f"import failed: {e}", file=sys.stderr)
+        return 1
+    finally:
+        if src is not sys.stdin.buffer:
+            src.close()
+    print(json.dumps(stats), file=sys.stderr)
+    return 0
+
+
+def _add_store_args(p) -> None:
+    p.add_argument("--storage", default=settings.STORAGE_TYPE, help="storage type (default STORAGE_TYPE)")
+    p.add_argument("--path", default=settings.LOCAL_STORAGE_PATH, help="storage directory (default LOCAL_STORAGE_PATH)")
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m server.cli", description="Maintenance commands")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("migrate-layout", help="move flat-layout files into shard directories (safe while serving)")
+    p.add_argument("--path", default=settings.LOCAL_STORAGE_PATH, help="filesystem storage directory")
+    p.add_argument("--dry-run", action="store_true", help="only count what would move")
+    p.set_defaults(func=cmd_migrate_layout)
+
+    p = sub.add_parser("reindex", help="rebuild the metadata index from the files on disk")
+    p.add_argument("--path", default=settings.LOCAL_STORAGE_PATH, help="filesystem storage directory")
+    p.set_defaults(func=cmd_reindex)
+
+    p = sub.add_parser("precompress", help="write .gz/.br/.zst siblings for frontend assets")
+    p.add_argument("--dir", default=settings.FRONTEND_DIR, help="frontend build directory")
+    p.set_defaults(func=cmd_precompress)
+
+    p = sub.add_parser("compression-report", help="on-disk vs. uncompressed bytes per codec")
+    p.add_argument("--path", default=settings.LOCAL_STORAGE_PATH, help="filesystem storage directory")
+    p.set_defaults(func=cmd_compression_report)
+
+    p = sub.add_parser("export", help="stream every document with its name and key as a tar archive")
+    _add_store_args(p)
+    p.add_argument("--out", default="-", help="archive file (default stdout)")
+    p.set_defaults(func=cmd_export)
+
+    p = sub.add_parser("import", help="create the documents of an export archive, keeping ids; existing ids are skipped")
+    _add_store_args(p)
+    p.add_argument("--in", dest="input", default="-", help="archive file (default stdin)")
+    p.set_defaults(func=cmd_import)
+
+    args = parser.parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,467 @@
+"""Collaboration room server speaking the excalidraw-room protocol.
+
+Implements the subset of Engine.IO v4 / Socket.IO v5 the Excalidraw client
+uses, over WebSocket only (the client tries WebSocket first):
+
+- ``join-room`` → ``first-in-room`` or ``new-user`` to the others, then
+  ``room-user-change`` with the member list to everyone in the room
+- ``server-broadcast`` / ``server-volatile-broadcast`` → ``client-broadcast``
+  to the other members, binary attachments passed through untouched
+- ``user-follow`` → ``user-follow-room-change`` / ``broadcast-unfollow``
+
+Membership is per process. Each broadcast is encoded once into a tuple of
+frames that every recipient's queue shares. A client's queue is bounded in
+bytes: volatile messages (pointer moves, idle status) are coalesced per
+sender or dropped while it is backed up, and a client that falls further
+behind than ``max_queue_bytes`` on reliable messages is disconnected.
+"""
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import secrets
+import time
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Engine.IO packet types (text frames start with the digit)
+EIO_OPEN, EIO_CLOSE, EIO_PING, EIO_PONG, EIO_MESSAGE = "0", "1", "2", "3", "4"
+# Socket.IO packet types
+SIO_CONNECT, SIO_DISCONNECT, SIO_EVENT, SIO_ACK, SIO_CONNECT_ERROR, SIO_BINARY_EVENT, SIO_BINARY_ACK = range(7)
+
+# Pending messages after which a client's volatile messages are dropped instead of queued
+VOLATILE_BACKLOG = 8
+# Binary attachments accepted on one packet (the client sends two: data and iv)
+MAX_ATTACHMENTS = 8
+FOLLOW_PREFIX = "follow@"
+
+Frames = Tuple[Any, ...]  # a str header frame followed by bytes attachment frames
+
+
+def encode_event(event: str, *args: Any) -> Frames:
+    """Encode a Socket.IO event as Engine.IO WebSocket frames, once for any number of recipients."""
+    attachments: List[bytes] = []
+
+    def deconstruct(value: Any) -> Any:
+        if isinstance(value, (bytes, bytearray, memoryview)):
+            attachments.append(value)
+            return {"_placeholder": True, "num": len(attachments) - 1}
+        if isinstance(value, list):
+            return [deconstruct(v) for v in value]
+        if isinstance(value, dict):
+            return {k: deconstruct(v) for k, v in value.items()}
+        return value
+
+    payload = json.dumps([event, *(deconstruct(a) for a in args)], separators=(",", ":"))
+    if attachments:
+        return (f"{EIO_MESSAGE}{SIO_BINARY_EVENT}{len(attachments)}-{payload}", *attachments)
+    return (f"{EIO_MESSAGE}{SIO_EVENT}{payload}",)
+
+
+def _frames_size(frames: Frames) -> int:
+    return sum(len(f) for f in frames)
+
+
+class Packet:
+    """A decoded Socket.IO packet, possibly still waiting for binary attachments."""
+
+    __slots__ = ("type", "nsp", "ack", "data", "attachments", "buffers")
+
+    def __init__(self, type_: int, nsp: str, ack: Optional[int], data: Any, attachments: int) -> None:
+        self.type = type_
+        self.nsp = nsp
+        self.ack = ack
+        self.data = data
+        self.attachments = attachments
+        self.buffers: List[bytes] = []
+
+    def reconstruct(self) -> Any:
+        buffers = self.buffers
+
+        def fill(value: Any) -> Any:
+            if isinstance(value, dict):
+                if value.get("_placeholder") is True and isinstance(value.get("num"), int):
+                    if not 0 <= value["num"] < len(buffers):
+                        raise ValueError("attachment index out of range")
+                    return buffers[value["num"]]
+                return {k: fill(v) for k, v in value.items()}
+            if isinstance(value, list):
+                return [fill(v) for v in value]
+            return value
+
+        return fill(self.data)
+
+
+def decode_packet(s: str) -> Packet:
+    """Parse ``<type>[<attachments>-][<nsp>,][<ack id>][<json>]``."""
+    if not s or not s[0].isdigit():
+        raise ValueError("bad packet type")
+    type_ = int(s[0])
+    i = 1
+    attachments = 0
+    if type_ in (SIO_BINARY_EVENT, SIO_BINARY_ACK):
+        j = s.index("-", i)
+        attachments = int(s[i:j])
+        if not 0 <= attachments <= MAX_ATTACHMENTS:
+            raise ValueError("too many attachments")
+        i = j + 1
+    nsp = "/"
+    if i < len(s) and s[i] == "/":
+        j = s.find(",", i)
+        nsp, i = (s[i:], len(s)) if j < 0 else (s[i:j], j + 1)
+    j = i
+    while j < len(s) and s[j].isdigit():
+        j += 1
+    ack = int(s[i:j]) if j > i else None
+    data = json.loads(s[j:]) if j < len(s) else None
+    return Packet(type_, nsp, ack, data, attachments)
+
+
+class Client:
+    """One connected socket: its rooms and a bounded outgoing queue drained by a writer task."""
+
+    __slots__ = (
+        "server", "ws", "sid", "rooms", "connected", "closed", "last_ping", "last_pong",
+        "_queue", "_queued_bytes", "_volatile", "_wakeup", "_writer", "_pending",
+    )
+
+    def __init__(self, server: "RoomServer", ws) -> None:
+        self.server = server
+        self.ws = ws
+        self.sid = secrets.token_urlsafe(15)
+        self.rooms: Set[str] = set()
+        self.connected = False  # Socket.IO namespace joined
+        self.closed = False
+        self.last_ping = self.last_pong = time.monotonic()
+        # entries: [frames, volatile key or None, size]
+        self._queue: Deque[list] = deque()
+        self._queued_bytes = 0
+        self._volatile: Dict[Any, list] = {}
+        self._wakeup = asyncio.Event()
+        self._writer: Optional[asyncio.Task] = None
+        self._pending: Optional[Packet] = None
+
+    def send(self, frames: Frames, volatile_key: Any = None) -> None:
+        if self.closed:
+            return
+        size = _frames_size(frames)
+        stats = self.server.stats
+        if volatile_key is not None:
+            entry = self._volatile.get(volatile_key)
+            if entry is not None:
+                # Still unsent: the newer update replaces it in place
+                self._queued_bytes += size - entry[2]
+                entry[0], entry[2] = frames, size
+                stats["volatile_coalesced"] += 1
+                return
+            if len(self._queue) >= VOLATILE_BACKLOG:
+                stats["volatile_dropped"] += 1
+                return
+        elif self._queued_bytes + size > self.server.max_queue_bytes:
+            stats["slow_disconnects"] += 1
+            logger.info("collab: disconnecting %s, %d bytes queued", self.sid, self._queued_bytes)
+            self.close()
+            return
+        entry = [frames, volatile_key, size]
+        if volatile_key is not None:
+            self._volatile[volatile_key] = entry
+        self._queue.append(entry)
+        self._queued_bytes += size
+        self._wakeup.set()
+
+    def emit(self, event: str, *args: Any) -> None:
+        self.send(encode_event(event, *args))
+
+    async def _drain(self) -> None:
+        ws = self.ws
+        queue = self._queue
+        while True:
+            while queue:
+                frames, key, size = entry = queue.popleft()
+                if key is not None and self._volatile.get(key) is entry:
+                    del self._volatile[key]
+                self._queued_bytes -= size
+                for f in frames:
+                    if isinstance(f, str):
+                        await ws.send_text(f)
+                    else:
+                        await ws.send_bytes(f)
+                self.server.stats["messages_sent"] += 1
+            self._wakeup.clear()
+            await self._wakeup.wait()
+
+    def start(self) -> None:
+        self._writer = asyncio.get_running_loop().create_task(self._drain())
+        self._writer.add_done_callback(self._writer_done)
+
+    def _writer_done(self, task: asyncio.Task) -> None:
+        if not task.cancelled() and task.exception() is not None:
+            # the socket went away under us; the reader sees the disconnect
+            self.close()
+
+    def close(self) -> None:
+        if self.closed:
+            return
+        self.closed = True
+        self._queue.clear()
+        self._volatile.clear()
+        self._queued_bytes = 0
+        if self._writer is not None:
+            self._writer.cancel()
+        asyncio.get_running_loop().create_task(self._close_ws())
+
+    async def _close_ws(self) -> None:
+        try:
+            await self.ws.close()
+        except Exception:
+            pass
+
+
+class RoomServer:
+    def __init__(
+        self,
+        *,
+        max_message_bytes: int = 10 * 1024 * 1024,
+        max_queue_bytes: int = 16 * 1024 * 1024,
+        ping_interval: float = 25.0,
+        ping_timeout: float = 20.0,
+    ) -> None:
+        self.max_message_bytes = max_message_bytes
+        self.max_queue_bytes = max_queue_bytes
+        self.ping_interval = ping_interval
+        self.ping_timeout = ping_timeout
+        # room id -> {socket id: client}, in join order
+        self.rooms: Dict[str, Dict[str, Client]] = {}
+        self.clients: Dict[str, Client] = {}
+        self.stats: Dict[str, int] = {
+            "connections": 0,
+            "messages_received": 0,
+            "messages_sent": 0,
+            "broadcasts": 0,
+            "volatile_coalesced": 0,
+            "volatile_dropped": 0,
+            "slow_disconnects": 0,
+            "ping_timeouts": 0,
+        }
+        self._heartbeat: Optional[asyncio.Task] = None
+
+    # -- connection lifecycle -------------------------------------------------
+
+    async def serve(self, ws) -> None:
+        """Run one WebSocket connection (a Starlette ``WebSocket``) to completion."""
+        params = ws.query_params
+        if params.get("EIO") != "4" or params.get("transport") != "websocket":
+            await ws.close(code=1008)
+            return
+        await ws.accept()
+        client = Client(self, ws)
+        open_packet = {
+            "sid": secrets.token_urlsafe(15),
+            "upgrades": [],
+            "pingInterval": int(self.ping_interval * 1000),
+            "pingTimeout": int(self.ping_timeout * 1000),
+            "maxPayload": self.max_message_bytes,
+        }
+        await ws.send_text(EIO_OPEN + json.dumps(open_packet, separators=(",", ":")))
+        self.stats["connections"] += 1
+        self.clients[client.sid] = client
+        self._ensure_heartbeat()
+        client.start()
+        try:
+            while not client.closed:
+                message = await ws.receive()
+                if message["type"] == "websocket.disconnect":
+                    break
+                text = message.get("text")
+                data = text if text is not None else message.get("bytes")
+                if data is None:
+                    continue
+                if len(data) > self.max_message_bytes:
+                    logger.info("collab: %s sent %d bytes, over COLLAB_MAX_MESSAGE_BYTES", client.sid, len(data))
+                    break
+                try:
+                    if text is not None:
+                        self._on_text(client, text)
+                    else:
+                        self._on_binary(client, data)
+                except (ValueError, TypeError, KeyError, IndexError) as exc:
+                    logger.info("collab: closing %s after malformed packet: %s", client.sid, exc)
+                    break
+        except Exception:
+            # connection reset mid-receive
+            pass
+        finally:
+            self._disconnect(client)
+            client.close()
+
+    def _on_text(self, client: Client, text: str) -> None:
+        kind, body = text[:1], text[1:]
+        if kind == EIO_MESSAGE:
+            if client._pending is not None:
+                raise ValueError("text frame while waiting for attachments")
+            packet = decode_packet(body)
+            if packet.attachments:
+                client._pending = packet
+            else:
+                self._on_packet(client, packet)
+        elif kind == EIO_PONG:
+            client.last_pong = time.monotonic()
+        elif kind == EIO_PING:
+            client.send((EIO_PONG + body,))
+        elif kind == EIO_CLOSE:
+            client.close()
+
+    def _on_binary(self, client: Client, data: bytes) -> None:
+        packet = client._pending
+        if packet is None:
+            raise ValueError("unexpected binary frame")
+        packet.buffers.append(data)
+        if len(packet.buffers) == packet.attachments:
+            client._pending = None
+            self._on_packet(client, packet)
+
+    def _on_packet(self, client: Client, packet: Packet) -> None:
+        self.stats["messages_received"] += 1
+        if packet.nsp != "/":
+            client.send((f"{EIO_MESSAGE}{SIO_CONNECT_ERROR}{packet.nsp},"
+                         + json.dumps({"message": "Invalid namespace"}),))
+            return
+        if packet.type == SIO_CONNECT:
+            if not client.connected:
+                client.connected = True
+                client.send((f"{EIO_MESSAGE}{SIO_CONNECT}" + json.dumps({"sid": client.sid}),))
+                client.emit("init-room")
+        elif packet.type == SIO_DISCONNECT:
+            self._disconnect(client)
+            client.close()
+        elif packet.type in (SIO_EVENT, SIO_BINARY_EVENT) and client.connected:
+            args = packet.reconstruct() if packet.attachments else packet.data
+            if not isinstance(args, list) or not args or not isinstance(args[0], str):
+                raise ValueError("event without a name")
+            handler = self._handlers.get(args[0])
+            if handler is not None:
+                handler(self, client, *args[1:])
+
+    # -- events ---------------------------------------------------------------
+
+    def _join_room(self, client: Client, room_id: Any = None, *_: Any) -> None:
+        if not isinstance(room_id, str) or not room_id:
+            return
+        self._join(client, room_id)
+        members = self.rooms[room_id]
+        if len(members) <= 1:
+            client.emit("first-in-room")
+        else:
+            self.broadcast(room_id, encode_event("new-user", client.sid), exclude=client)
+        self.broadcast(room_id, encode_event("room-user-change", list(members)))
+
+    def _server_broadcast(self, client: Client, room_id: Any = None, *payload: Any) -> None:
+        if isinstance(room_id, str):
+            self.broadcast(room_id, encode_event("client-broadcast", *payload), exclude=client)
+
+    def _server_volatile_broadcast(self, client: Client, room_id: Any = None, *payload: Any) -> None:
+        if isinstance(room_id, str):
+            # One pending pointer/idle update per sender and room is enough
+            self.broadcast(
+                room_id, encode_event("client-broadcast", *payload), exclude=client, volatile_key=(client.sid, room_id)
+            )
+
+    def _user_follow(self, client: Client, payload: Any = None, *_: Any) -> None:
+        if not isinstance(payload, dict):
+            return
+        target = (payload.get("userToFollow") or {}).get("socketId")
+        action = payload.get("action")
+        if not isinstance(target, str) or action not in ("FOLLOW", "UNFOLLOW"):
+            return
+        room_id = FOLLOW_PREFIX + target
+        if action == "FOLLOW":
+            self._join(client, room_id)
+        else:
+            self._leave(client, room_id)
+        followed = self.clients.get(target)
+        if followed is not None:
+            followed.emit("user-follow-room-change", list(self.rooms.get(room_id, ())))
+
+    _handlers = {
+        "join-room": _join_room,
+        "server-broadcast": _server_broadcast,
+        "server-volatile-broadcast": _server_volatile_broadcast,
+        "user-follow": _user_follow,
+    }
+
+    # -- rooms ----------------------------------------------------------------
+
+    def broadcast(self, room_id: str, frames: Frames, exclude: Optional[Client] = None, volatile_key: Any = None) -> int:
+        """Queue the same encoded frames for every member of ``room_id``; returns recipients."""
+        members = self.rooms.get(room_id)
+        if not members:
+            return 0
+        self.stats["broadcasts"] += 1
+        n = 0
+        for c in list(members.values()):
+            if c is not exclude:
+                c.send(frames, volatile_key)
+                n += 1
+        return n
+
+    def _join(self, client: Client, room_id: str) -> None:
+        self.rooms.setdefault(room_id, {})[client.sid] = client
+        client.rooms.add(room_id)
+
+    def _leave(self, client: Client, room_id: str) -> None:
+        members = self.rooms.get(room_id)
+        client.rooms.discard(room_id)
+        if members is not None:
+            members.pop(client.sid, None)
+            if not members:
+                del self.rooms[room_id]
+
+    def _disconnect(self, client: Client) -> None:
+        if self.clients.get(client.sid) is not client:
+            return
+        del self.clients[client.sid]
+        for room_id in list(client.rooms):
+            self._leave(client, room_id)
+            others = list(self.rooms.get(room_id, ()))
+            if not room_id.startswith(FOLLOW_PREFIX):
+                if others:
+                    self.broadcast(room_id, encode_event("room-user-change", others))
+            elif not others:
+                followed = self.clients.get(room_id[len(FOLLOW_PREFIX):])
+                if followed is not None:
+                    followed.emit("broadcast-unfollow")
+
+    # -- heartbeat ------------------------------------------------------------
+
+    def _ensure_heartbeat(self) -> None:
+        if self._heartbeat is None or self._heartbeat.done():
+            self._heartbeat = asyncio.get_running_loop().create_task(self._run_heartbeat())
+
+    async def _run_heartbeat(self) -> None:
+        ping = (EIO_PING,)
+        while True:
+            await asyncio.sleep(self.ping_interval)
+            now = time.monotonic()
+            for client in list(self.clients.values()):
+                if client.last_pong < client.last_ping and now - client.last_ping > self.ping_timeout:
+                    self.stats["ping_timeouts"] += 1
+                    self._disconnect(client)
+                    client.close()
+                    continue
+                client.last_ping = now
+                client.send(ping)
+
+    async def stop(self) -> None:
+        for client in list(self.clients.values()):
+            self._disconnect(client)
+            client.close()
+        if self._heartbeat is not None:
+            self._heartbeat.cancel()
+            try:
+                await self._heartbeat
+            except asyncio.CancelledError:
+                pass
+            self._heartbeat = None
@@ -7,14 +7,147 @@ class Settings:
     HOST: str = os.getenv("HOST", "127.0.0.1")
     PORT: int = int(os.getenv("PORT", "8888"))
 
-    STORAGE_TYPE: str = os.getenv("STORAGE_TYPE", "memory")  # memory | filesystem
+    # Worker processes; uvicorn reads the same variable as its --workers default
+    WORKERS: int = int(os.getenv("WEB_CONCURRENCY", "1"))
+
+    STORAGE_TYPE: str = os.getenv("STORAGE_TYPE", "memory")  # memory | memory-wal | filesystem | sqlite | s3
     LOCAL_STORAGE_PATH: str = os.getenv("LOCAL_STORAGE_PATH", "./data")
+    # Filesystem storage: directory levels for new files (ab/cd/<id> at 2); 0 keeps them flat
+    STORAGE_SHARD_DEPTH: int = int(os.getenv("STORAGE_SHARD_DEPTH", "2"))
+    # Filesystem storage: keep identical bodies once, shared by reference
+    STORAGE_DEDUP: bool = os.getenv("STORAGE_DEDUP", "").lower() in ("1", "true", "yes")
+    # At-rest compression for filesystem/sqlite bodies, sidecars and Firebase documents:
+    # none | zlib | lzma | zstd (needs the zstandard package). Kept per body only when smaller.
+    STORAGE_COMPRESSION: str = os.getenv("STORAGE_COMPRESSION", "none")
+    # Dedicated thread pool size for blocking storage I/O
+    STORAGE_THREADS: int = int(os.getenv("STORAGE_THREADS", "16"))
+    # In-process LRU cache for document bodies (filesystem, sqlite and s3 storage); 0 disables.
+    # Per worker: a document deleted through another worker can be served until evicted.
+    CACHE_MAX_BYTES: int = int(os.getenv("CACHE_MAX_BYTES", "0"))
+    # Largest single body kept in the cache; 0 means CACHE_MAX_BYTES / 8
+    CACHE_MAX_ITEM_BYTES: int = int(os.getenv("CACHE_MAX_ITEM_BYTES", "0"))
+
+    # S3-compatible object storage (STORAGE_TYPE=s3); credentials come from the usual AWS_* variables
+    S3_BUCKET: str | None = os.getenv("S3_BUCKET")
+    S3_PREFIX: str = os.getenv("S3_PREFIX", "")
+    S3_ENDPOINT_URL: str | None = os.getenv("S3_ENDPOINT_URL")  # e.g. http://minio:9000
+    S3_REGION: str | None = os.getenv("S3_REGION")
+    # Pooled keep-alive HTTP connections shared by all storage threads
+    S3_MAX_CONNECTIONS: int = int(os.getenv("S3_MAX_CONNECTIONS", "32"))
+    # Bodies larger than this are uploaded in parts of this size
+    S3_MULTIPART_THRESHOLD: int = int(os.getenv("S3_MULTIPART_THRESHOLD", str(8 * 1024 * 1024)))
+    # Local disk cache of document bodies; defaults to LOCAL_STORAGE_PATH/.s3-cache, 0 bytes disables
+    S3_CACHE_DIR: str | None = os.getenv("S3_CACHE_DIR")
+    S3_CACHE_MAX_BYTES: int = int(os.getenv("S3_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+    # Seconds an assembled admin listing is reused before the bucket is listed again. Each
+    # rebuild lists every object (O(bucket): one ListObjectsV2 call per 1000 keys), and the
+    # usage totals behind /metrics and retention are summed from that listing
+    S3_LIST_TTL: float = float(os.getenv("S3_LIST_TTL", "5"))
+
+    # memory / memory-wal: total body bytes kept in RAM. Past it the oldest documents without a
+    # share key are evicted; a create that still doesn't fit fails with 507. 0 means unbounded
+    MEMORY_MAX_BYTES: int = int(os.getenv("MEMORY_MAX_BYTES", "0"))
+    # memory-wal: documents served from RAM, every change logged under LOCAL_STORAGE_PATH/memory-wal.
+    # Log fsync policy: always (per write) | interval (every MEMORY_WAL_SYNC_INTERVAL s) | none
+    MEMORY_WAL_SYNC: str = os.getenv("MEMORY_WAL_SYNC", "interval")
+    MEMORY_WAL_SYNC_INTERVAL: float = float(os.getenv("MEMORY_WAL_SYNC_INTERVAL", "1"))
+    # Write a compacted snapshot once the log reaches this size, or this many seconds after the last one
+    MEMORY_SNAPSHOT_WAL_BYTES: int = int(os.getenv("MEMORY_SNAPSHOT_WAL_BYTES", str(256 * 1024 * 1024)))
+    MEMORY_SNAPSHOT_INTERVAL: float = float(os.getenv("MEMORY_SNAPSHOT_INTERVAL", "3600"))
+
+    # Largest accepted POST /api/v2/post body in bytes; 0 disables the limit
+    MAX_UPLOAD_BYTES: int = int(os.getenv("MAX_UPLOAD_BYTES", str(50 * 1024 * 1024)))
+
+    # Retention for documents without a saved share key (the admin list only shows keyed ones).
+    # Delete them after this many days; 0 keeps them forever
+    RETENTION_UNKEYED_DAYS: float = float(os.getenv("RETENTION_UNKEYED_DAYS", "0"))
+    # Delete the oldest of them while the store holds more than this many bytes; 0 disables
+    RETENTION_MAX_BYTES: int = int(os.getenv("RETENTION_MAX_BYTES", "0"))
+    # Seconds between background sweeps, and documents handled per step of a sweep
+    RETENTION_INTERVAL: float = float(os.getenv("RETENTION_INTERVAL", "3600"))
+    RETENTION_BATCH: int = int(os.getenv("RETENTION_BATCH", "100"))
+
+    # Admission control, off by default. "upload" is POST /api/v2/post and Firebase commits, "read" is
+    # GET /api/v2/{id} and Firebase batchGet. Requests in flight per class beyond the limit get 503; 0 disables
+    ADMISSION_UPLOAD_CONCURRENCY: int = int(os.getenv("ADMISSION_UPLOAD_CONCURRENCY", "0"))
+    ADMISSION_READ_CONCURRENCY: int = int(os.getenv("ADMISSION_READ_CONCURRENCY", "0"))
+    # Per-client token buckets (requests per second, burst depth); over the rate gets 429. 0 disables.
+    # Clients are told apart by address, so behind a proxy set uvicorn's FORWARDED_ALLOW_IPS
+    ADMISSION_UPLOAD_RATE: float = float(os.getenv("ADMISSION_UPLOAD_RATE", "0"))
+    ADMISSION_UPLOAD_BURST: int = int(os.getenv("ADMISSION_UPLOAD_BURST", "0"))
+    ADMISSION_READ_RATE: float = float(os.getenv("ADMISSION_READ_RATE", "0"))
+    ADMISSION_READ_BURST: int = int(os.getenv("ADMISSION_READ_BURST", "0"))
+    # Clients remembered by the rate limiter; the least recently seen are forgotten first
+    ADMISSION_MAX_CLIENTS: int = int(os.getenv("ADMISSION_MAX_CLIENTS", "10000"))
+
+    # Cache lifetime (seconds) advertised for GET /api/v2/{id}; bodies never change
+    DOCUMENT_MAX_AGE: int = int(os.getenv("DOCUMENT_MAX_AGE", str(365 * 24 * 3600)))
+
+    # Upper bound for the admin listing page size (?limit=)
+    ADMIN_PAGE_MAX: int = int(os.getenv("ADMIN_PAGE_MAX", "200"))
+    # Most ids accepted by one batch-delete / batch-meta request
+    ADMIN_BATCH_MAX: int = int(os.getenv("ADMIN_BATCH_MAX", "1000"))
+
+    # Backend for the Firebase emulation endpoints: memory | filesystem | sqlite
+    # (defaults to STORAGE_TYPE, or memory when that is s3 or memory-wal). Path defaults to LOCAL_STORAGE_PATH/.firebase[.sqlite3].
+    FIREBASE_STORAGE_TYPE: str = os.getenv(
+        "FIREBASE_STORAGE_TYPE",
+        "memory" if os.getenv("STORAGE_TYPE") in ("s3", "memory-wal") else os.getenv("STORAGE_TYPE", "memory"),
+    )
+    FIREBASE_STORAGE_PATH: str | None = os.getenv("FIREBASE_STORAGE_PATH")
+    # Byte budget for the memory backend; least recently used entries are evicted
+    FIREBASE_MEMORY_MAX_BYTES: int = int(os.getenv("FIREBASE_MEMORY_MAX_BYTES", str(64 * 1024 * 1024)))
+
+    # Prometheus metrics at /metrics (request latency per route, store call latency, gauges).
+    # Off by default: the endpoint is unauthenticated and reveals document counts and traffic
+    METRICS_ENABLED: bool = os.getenv("METRICS_ENABLED", "false").lower() in ("1", "true", "yes")
+
+    # Built-in collaboration room server (Socket.IO over WebSocket at /socket.io/), off by default.
+    # Rooms live in process memory, so it needs WEB_CONCURRENCY=1
+    COLLAB_ENABLED: bool = os.getenv("COLLAB_ENABLED", "false").lower() in ("1", "true", "yes")
+    # Largest message accepted from a client (a full scene sync can be several MiB)
+    COLLAB_MAX_MESSAGE_BYTES: int = int(os.getenv("COLLAB_MAX_MESSAGE_BYTES", str(10 * 1024 * 1024)))
+    # Bytes queued for one client before it is disconnected as too slow to keep up
+    COLLAB_SEND_QUEUE_BYTES: int = int(os.getenv("COLLAB_SEND_QUEUE_BYTES", str(16 * 1024 * 1024)))
+    # Engine.IO heartbeat (seconds): server pings every interval, client must answer within timeout
+    COLLAB_PING_INTERVAL: float = float(os.getenv("COLLAB_PING_INTERVAL", "25"))
+    COLLAB_PING_TIMEOUT: float = float(os.getenv("COLLAB_PING_TIMEOUT", "20"))
 
     FRONTEND_DIR: str = os.getenv("FRONTEND_DIR", "./frontend/build")
+    # Generate missing .gz/.br/.zst siblings of frontend assets at startup
+    STATIC_PRECOMPRESS: bool = os.getenv("STATIC_PRECOMPRESS", "true").lower() in ("1", "true", "yes")
 
     # When set, admin "Open" links will use this origin
     # e.g., https://chart.example.com (no trailing slash)
     PUBLIC_ORIGIN: str | None = os.getenv("PUBLIC_ORIGIN")
 
+    def store_options(self) -> dict:
+        """Keyword arguments for ``storage.get_store`` besides the type and path."""
+        return dict(
+            cache_bytes=self.CACHE_MAX_BYTES,
+            cache_item_bytes=self.CACHE_MAX_ITEM_BYTES,
+            dedup=self.STORAGE_DEDUP,
+            shard_depth=self.STORAGE_SHARD_DEPTH,
+            compression=self.STORAGE_COMPRESSION,
+            s3_options=dict(
+                bucket=self.S3_BUCKET,
+                prefix=self.S3_PREFIX,
+                endpoint_url=self.S3_ENDPOINT_URL,
+                region=self.S3_REGION,
+                max_connections=self.S3_MAX_CONNECTIONS,
+                multipart_threshold=self.S3_MULTIPART_THRESHOLD,
+                cache_dir=self.S3_CACHE_DIR or os.path.join(self.LOCAL_STORAGE_PATH, ".s3-cache"),
+                cache_max_bytes=self.S3_CACHE_MAX_BYTES,
+                list_ttl=self.S3_LIST_TTL,
+            ),
+            wal_options=dict(
+                sync=self.MEMORY_WAL_SYNC,
+                sync_interval=self.MEMORY_WAL_SYNC_INTERVAL,
+                snapshot_bytes=self.MEMORY_SNAPSHOT_WAL_BYTES,
+                snapshot_interval=self.MEMORY_SNAPSHOT_INTERVAL,
+            ),
+            memory_max_bytes=self.MEMORY_MAX_BYTES,
+        )
+
 
 settings = Settings()
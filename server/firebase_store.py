@@ -0,0 +1,291 @@
+"""Backends for the Firestore emulation endpoints (``server/routes/firebase.py``).
+
+Documents are keyed by their full Firestore resource name and hold the raw
+``fields`` map exactly as the client sent it. The SQLite and filesystem
+backends compress the stored JSON with ``compression`` when that saves space.
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Protocol
+
+try:
+    import fcntl  # type: ignore
+except ImportError:  # pragma: no cover
+    fcntl = None
+
+from .storage import Offloaded, compression_codec, is_packed, pack, unpack
+
+
+@dataclass
+class FirebaseDoc:
+    name: str
+    fields: Dict[str, object]
+    create_time: float
+    update_time: float
+
+
+@dataclass
+class FirebaseWrite:
+    """One entry of a ``documents:commit`` request.
+
+    ``fields`` is None for a delete. With ``mask`` set, only the listed
+    top-level fields are replaced and the rest of the stored document is kept.
+    """
+
+    name: str
+    fields: Optional[Dict[str, object]] = None
+    mask: Optional[List[str]] = None
+
+
+class FirebaseStore(Protocol):
+    def get_many(self, names: List[str]) -> Dict[str, FirebaseDoc]:
+        ...
+
+    def commit(self, writes: List[FirebaseWrite]) -> float:
+        """Apply ``writes`` in order and return the commit time."""
+        ...
+
+
+def _apply(existing: Optional[FirebaseDoc], write: FirebaseWrite, now: float) -> Optional[FirebaseDoc]:
+    if write.fields is None:
+        return None
+    fields = write.fields
+    if write.mask is not None and existing is not None:
+        fields = dict(existing.fields)
+        for path in write.mask:
+            top = path.split(".", 1)[0].strip("`")
+            if top in write.fields:
+                fields[top] = write.fields[top]
+            else:
+                fields.pop(top, None)
+    created = existing.create_time if existing is not None else now
+    return FirebaseDoc(name=write.name, fields=fields, create_time=created, update_time=now)
+
+
+class MemoryFirebaseStore:
+    """Per-process store with a byte budget; least recently used documents are evicted."""
+
+    def __init__(self, max_bytes: int = 0) -> None:
+        self.max_bytes = max_bytes
+        self._docs: "OrderedDict[str, FirebaseDoc]" = OrderedDict()
+        self._sizes: Dict[str, int] = {}
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.evictions = 0
+
+    def get_many(self, names: List[str]) -> Dict[str, FirebaseDoc]:
+        out: Dict[str, FirebaseDoc] = {}
+        with self._lock:
+            for name in names:
+                doc = self._docs.get(name)
+                if doc is not None:
+                    self._docs.move_to_end(name)
+                    out[name] = doc
+        return out
+
+    def _drop(self, name: str) -> None:
+        self._docs.pop(name, None)
+        self._bytes -= self._sizes.pop(name, 0)
+
+    def commit(self, writes: List[FirebaseWrite]) -> float:
+        now = time.time()
+        with self._lock:
+            for w in writes:
+                doc = _apply(self._docs.get(w.name), w, now)
+                self._drop(w.name)
+                if doc is None:
+                    continue
+                size = len(w.name) + len(json.dumps(doc.fields, separators=(",", ":")))
+                self._docs[w.name] = doc
+                self._sizes[w.name] = size
+                self._bytes += size
+            if self.max_bytes > 0:
+                while self._bytes > self.max_bytes and len(self._docs) > 1:
+                    oldest = next(iter(self._docs))
+                    self._drop(oldest)
+                    self.evictions += 1
+        return now
+
+
+class SqliteFirebaseStore:
+    """Single-file store, safe to share between worker processes (WAL mode)."""
+
+    def __init__(self, path: str, compression: Optional[str] = None) -> None:
+        self.compression = compression_codec(compression)
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS firebase_docs ("
+            " name TEXT PRIMARY KEY,"
+            " fields TEXT NOT NULL,"
+            " create_time REAL NOT NULL,"
+            " update_time REAL NOT NULL)"
+        )
+
+    def _encode(self, fields: Dict[str, object]):
+        text = json.dumps(fields, separators=(",", ":"))
+        if self.compression is None:
+            return text
+        packed = pack(text.encode("utf-8"), self.compression)
+        # kept as TEXT unless compression won, so uncompressed rows stay readable
+        return packed if is_packed(packed) else text
+
+    def _select(self, names: List[str]) -> Dict[str, FirebaseDoc]:
+        out: Dict[str, FirebaseDoc] = {}
+        # stay well below SQLite's bound-parameter limit
+        for i in range(0, len(names), 500):
+            batch = names[i:i + 500]
+            marks = ",".join("?" * len(batch))
+            for name, fields, ct, ut in self._conn.execute(
+                f"SELECT name, fields, create_time, update_time FROM firebase_docs WHERE name IN ({marks})", batch
+            ):
+                if isinstance(fields, bytes):
+                    fields = unpack(fields)
+                out[name] = FirebaseDoc(name=name, fields=json.loads(fields), create_time=ct, update_time=ut)
+        return out
+
+    def get_many(self, names: List[str]) -> Dict[str, FirebaseDoc]:
+        with self._lock:
+            return self._select(names)
+
+    def commit(self, writes: List[FirebaseWrite]) -> float:
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                current = self._select([w.name for w in writes])
+                for w in writes:
+                    doc = _apply(current.get(w.name), w, now)
+                    if doc is None:
+                        self._conn.execute("DELETE FROM firebase_docs WHERE name = ?", (w.name,))
+                        current.pop(w.name, None)
+                        continue
+                    self._conn.execute(
+                        "INSERT OR REPLACE INTO firebase_docs VALUES (?, ?, ?, ?)",
+                        (doc.name, self._encode(doc.fields), doc.create_time, doc.update_time),
+                    )
+                    current[w.name] = doc
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+        return now
+
+
+class FilesystemFirebaseStore:
+    """One JSON file per document under ``base_path/ab/cd/<sha256(name)>.json``.
+
+    Each file is replaced atomically; a multi-write commit is applied file by
+    file, so unlike the SQLite backend it is not atomic as a whole. Commits
+    are serialized across threads and, through ``flock`` on ``base_path/LOCK``,
+    across worker processes, so masked merges don't lose each other's fields.
+    """
+
+    def __init__(self, base_path: str, compression: Optional[str] = None) -> None:
+        self.compression = compression_codec(compression)
+        self.base_path = base_path
+        os.makedirs(base_path, exist_ok=True)
+        self._lock = threading.Lock()
+        self._lockfile = os.path.join(base_path, "LOCK")
+
+    def _path(self, name: str) -> str:
+        h = hashlib.sha256(name.encode("utf-8")).hexdigest()
+        return os.path.join(self.base_path, h[:2], h[2:4], h + ".json")
+
+    def _read(self, name: str) -> Optional[FirebaseDoc]:
+        try:
+            with open(self._path(name), "rb") as f:
+                raw = json.loads(unpack(f.read()))
+        except (FileNotFoundError, ValueError):
+            return None
+        if raw.get("name") != name:
+            return None
+        return FirebaseDoc(name=name, fields=raw["fields"], create_time=raw["createTime"], update_time=raw["updateTime"])
+
+    def get_many(self, names: List[str]) -> Dict[str, FirebaseDoc]:
+        out: Dict[str, FirebaseDoc] = {}
+        for name in names:
+            doc = self._read(name)
+            if doc is not None:
+                out[name] = doc
+        return out
+
+    def _write(self, p: str, body: bytes) -> None:
+        """Replace ``p`` through a uniquely named, fsync'ed temp file in the same directory."""
+        dir_ = os.path.dirname(p)
+        os.makedirs(dir_, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(prefix="." + os.path.basename(p) + ".", suffix=".tmp", dir=dir_)
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(body)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp, p)
+        except BaseException:
+            try:
+                os.remove(tmp)
+            except FileNotFoundError:
+                pass
+            raise
+
+    def commit(self, writes: List[FirebaseWrite]) -> float:
+        with self._lock, open(self._lockfile, "a") as lock:
+            if fcntl is not None:
+                fcntl.flock(lock, fcntl.LOCK_EX)  # released when the file closes
+            now = time.time()
+            for w in writes:
+                p = self._path(w.name)
+                doc = _apply(self._read(w.name), w, now)
+                if doc is None:
+                    try:
+                        os.remove(p)
+                    except FileNotFoundError:
+                        pass
+                    continue
+                body = json.dumps(
+                    {"name": doc.name, "fields": doc.fields, "createTime": doc.create_time, "updateTime": doc.update_time},
+                    ensure_ascii=False,
+                    separators=(",", ":"),
+                ).encode("utf-8")
+                self._write(p, pack(body, self.compression))
+        return now
+
+
+class AsyncFirebaseStore(Offloaded):
+    async def get_many(self, names: List[str]) -> Dict[str, FirebaseDoc]:
+        return await self._call(self.backend.get_many, names)
+
+    async def commit(self, writes: List[FirebaseWrite]) -> float:
+        return await self._call(self.backend.commit, writes)
+
+
+def get_firebase_store(
+    storage_type: str, path: str, memory_max_bytes: int = 0, compression: Optional[str] = None
+) -> FirebaseStore:
+    if storage_type == "sqlite":
+        return SqliteFirebaseStore(path, compression)
+    if storage_type == "filesystem":
+        return FilesystemFirebaseStore(path, compression)
+    return MemoryFirebaseStore(memory_max_bytes)
+
+
+def get_async_firebase_store(
+    storage_type: str, path: str, threads: int = 4, memory_max_bytes: int = 0, compression: Optional[str] = None
+) -> AsyncFirebaseStore:
+    backend = get_firebase_store(storage_type, path, memory_max_bytes, compression)
+    if isinstance(backend, MemoryFirebaseStore):
+        return AsyncFirebaseStore(backend)
+    return AsyncFirebaseStore(backend, ThreadPoolExecutor(max_workers=threads, thread_name_prefix="firebase"))
@@ -0,0 +1,262 @@
+"""Minimal Prometheus instrumentation: counters, histograms, text exposition.
+
+Kept dependency-free and cheap: observing a value is a bisect plus a few
+integer increments under a lock. Metrics are per worker process.
+"""
+from __future__ import annotations
+
+import bisect
+import threading
+import time
+from datetime import datetime
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from .storage import StoreWrapper
+
+PREFIX = "excalidraw_"
+# Seconds; spans in-memory hits (~50µs) to slow uploads
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    parts = [f'{n}="{_escape(str(v))}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _escape(v: str) -> str:
+    return v.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _num(v: float) -> str:
+    if v == float("inf"):
+        return "+Inf"
+    return repr(float(v)) if isinstance(v, float) else str(v)
+
+
+class Counter:
+    def __init__(self, name: str, help_: str, labelnames: Sequence[str] = ()) -> None:
+        self.name = PREFIX + name
+        self.help = help_
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels: str, amount: float = 1) -> None:
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self) -> Iterable[str]:
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} counter"
+        with self._lock:
+            items = sorted(self._values.items())
+        for labels, v in items:
+            yield f"{self.name}{_labels(self.labelnames, labels)} {_num(v)}"
+
+
+class Histogram:
+    def __init__(
+        self, name: str, help_: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS
+    ) -> None:
+        self.name = PREFIX + name
+        self.help = help_
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        # per label set: [count per bucket (+Inf last)..., sum]
+        self._series: Dict[Tuple[str, ...], List[float]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *labels: str) -> None:
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            s = self._series.get(labels)
+            if s is None:
+                s = self._series[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+            s[i] += 1
+            s[-1] += value
+
+    def render(self) -> Iterable[str]:
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} histogram"
+        with self._lock:
+            items = sorted((k, list(v)) for k, v in self._series.items())
+        for labels, s in items:
+            cumulative = 0
+            for bound, n in zip(self.buckets + (float("inf"),), s[:-1]):
+                cumulative += n
+                le = 'le="%s"' % _num(bound)
+                yield f"{self.name}_bucket{_labels(self.labelnames, labels, le)} {cumulative}"
+            yield f"{self.name}_sum{_labels(self.labelnames, labels)} {_num(s[-1])}"
+            yield f"{self.name}_count{_labels(self.labelnames, labels)} {cumulative}"
+
+
+class Registry:
+    """Holds metrics plus callbacks that produce gauge samples at scrape time."""
+
+    def __init__(self) -> None:
+        self.metrics: List[object] = []
+        self._collectors: List[Callable[[], Iterable[Tuple[str, str, str, Dict[str, str], float]]]] = []
+
+    def counter(self, *args, **kwargs) -> Counter:
+        m = Counter(*args, **kwargs)
+        self.metrics.append(m)
+        return m
+
+    def histogram(self, *args, **kwargs) -> Histogram:
+        m = Histogram(*args, **kwargs)
+        self.metrics.append(m)
+        return m
+
+    def collector(self, fn: Callable[[], Iterable[Tuple[str, str, str, Dict[str, str], float]]]) -> None:
+        """Register ``fn`` yielding ``(name, type, help, labels, value)`` samples on every scrape."""
+        self._collectors.append(fn)
+
+    def render(self, extra: Iterable[Tuple[str, str, str, Dict[str, str], float]] = ()) -> str:
+        lines: List[str] = []
+        for m in self.metrics:
+            lines.extend(m.render())
+        seen = set()
+        samples = [s for fn in self._collectors for s in fn()] + list(extra)
+        for name, type_, help_, labels, value in samples:
+            full = PREFIX + name
+            if full not in seen:
+                seen.add(full)
+                lines.append(f"# HELP {full} {help_}")
+                lines.append(f"# TYPE {full} {type_}")
+            lines.append(f"{full}{_labels(list(labels), list(labels.values()))} {_num(value)}")
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+REQUEST_LATENCY = REGISTRY.histogram(
+    "http_request_duration_seconds", "HTTP request latency by route template", ("method", "route", "status")
+)
+STORE_LATENCY = REGISTRY.histogram("store_operation_duration_seconds", "DocumentStore call latency", ("op",))
+STORE_ERRORS = REGISTRY.counter("store_operation_errors_total", "DocumentStore calls that raised", ("op",))
+BYTES_WRITTEN = REGISTRY.counter("store_written_bytes_total", "Document bytes accepted by the store")
+
+
+def route_label(scope) -> str:
+    """The matched route's path template (``/api/v2/{id}``), so ids don't explode cardinality.
+
+    Mounted apps (the static frontend) leave an ``endpoint`` but no route and
+    are labelled ``static``; a response made before routing can name itself
+    in ``scope["route_label"]`` (the SPA fallback says ``spa``). Anything else,
+    such as a 404 with no frontend mounted, is ``unmatched``.
+    """
+    route = scope.get("route")
+    path = getattr(route, "path", None)
+    if path is not None:
+        return path or "static"
+    if scope.get("route_label"):
+        return scope["route_label"]
+    if scope.get("endpoint") is not None:
+        return "static"
+    return "unmatched"
+
+
+class MetricsMiddleware:
+    """Pure ASGI middleware recording request latency per method, route template and status."""
+
+    def __init__(self, app, histogram: Histogram = REQUEST_LATENCY) -> None:
+        self.app = app
+        self.histogram = histogram
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        t0 = time.perf_counter()
+        status = [500]
+
+        async def send_wrapper(message) -> None:
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            self.histogram.observe(time.perf_counter() - t0, scope["method"], route_label(scope), str(status[0]))
+
+
+class _TimedUpload:
+    def __init__(self, upload, store: "InstrumentedStore") -> None:
+        self._upload = upload
+        self._store = store
+        self._size = 0
+
+    def write(self, chunk: bytes) -> None:
+        self._size += len(chunk)
+        self._store._timed("upload_write", self._upload.write, chunk)
+
+    def commit(self) -> str:
+        id_ = self._store._timed("create", self._upload.commit)
+        BYTES_WRITTEN.inc(amount=self._size)
+        return id_
+
+    def abort(self) -> None:
+        self._upload.abort()
+
+
+class InstrumentedStore(StoreWrapper):
+    """Times every ``DocumentStore`` call into ``STORE_LATENCY`` (label ``op``)."""
+
+    def _timed(self, op: str, fn, *args, **kwargs):
+        t0 = time.perf_counter()
+        try:
+            return fn(*args, **kwargs)
+        except BaseException:
+            STORE_ERRORS.inc(op)
+            raise
+        finally:
+            STORE_LATENCY.observe(time.perf_counter() - t0, op)
+
+    def find_id(self, id_: str) -> Optional[bytes]:
+        return self._timed("find_id", self.inner.find_id, id_)
+
+    def find_blob(self, id_: str):
+        return self._timed("find_blob", self.inner.find_blob, id_)
+
+    def exists(self, id_: str) -> bool:
+        return self._timed("exists", self.inner.exists, id_)
+
+    def create(self, data: bytes) -> str:
+        id_ = self._timed("create", self.inner.create, data)
+        BYTES_WRITTEN.inc(amount=len(data))
+        return id_
+
+    def begin_upload(self, id_: Optional[str] = None, created: Optional[datetime] = None):
+        return _TimedUpload(self._timed("begin_upload", self.inner.begin_upload, id_, created), self)
+
+    def list(self, **opts):
+        return self._timed("list", self.inner.list, **opts)
+
+    def delete(self, id_: str) -> bool:
+        return self._timed("delete", self.inner.delete, id_)
+
+    def delete_many(self, ids):
+        return self._timed("delete_many", self.inner.delete_many, ids)
+
+    def update_meta_many(self, updates):
+        return self._timed("meta_write_many", self.inner.update_meta_many, updates)
+
+    def usage(self):
+        return self._timed("usage", self.inner.usage)
+
+    def update_meta(self, id_: str, **fields) -> bool:
+        return self._timed("meta_write", self.inner.update_meta, id_, **fields)
+
+    def set_name(self, id_: str, name: Optional[str]) -> bool:
+        return self._timed("meta_write", self.inner.set_name, id_, name)
+
+    def set_key(self, id_: str, key: Optional[str]) -> bool:
+        return self._timed("meta_write", self.inner.set_key, id_, key)
+
+    def get_name(self, id_: str) -> Optional[str]:
+        return self._timed("meta_read", self.inner.get_name, id_)
+
+    def get_key(self, id_: str) -> Optional[str]:
+        return self._timed("meta_read", self.inner.get_key, id_)
@@ -0,0 +1,127 @@
+"""Retention policies for documents, enforced by a background sweep.
+
+Only documents without a saved share key are ever removed: those are the
+anonymous ``/api/v2/post`` uploads nobody curated in the admin UI.
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Dict, Optional
+
+from .storage import cursor_of
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class RetentionPolicy:
+    # Delete unkeyed documents older than this many days; 0 disables
+    unkeyed_max_age_days: float = 0
+    # Delete the oldest unkeyed documents while the store holds more than this; 0 disables
+    max_total_bytes: int = 0
+    # Seconds between sweeps
+    interval: float = 3600
+    # Documents listed (and deleted) per step; the loop yields between steps
+    batch: int = 100
+
+    @property
+    def enabled(self) -> bool:
+        return self.unkeyed_max_age_days > 0 or self.max_total_bytes > 0
+
+
+class GarbageCollector:
+    """Applies a ``RetentionPolicy`` to an ``AsyncStore`` in small batches.
+
+    Each sweep walks unkeyed documents oldest first, ``batch`` at a time, and
+    removes each batch with one ``delete_many``, so serving is never held up
+    by one large delete. Counters in ``stats`` are cumulative for the process.
+    """
+
+    def __init__(self, store, policy: RetentionPolicy) -> None:
+        self.store = store
+        self.policy = policy
+        self.stats: Dict[str, float] = {
+            "runs": 0,
+            "errors": 0,
+            "deleted_documents": 0,
+            "deleted_bytes": 0,
+            "last_run_seconds": 0.0,
+            "last_run_timestamp": 0.0,
+        }
+        self._task: Optional[asyncio.Task] = None
+
+    async def sweep(self) -> int:
+        """Run one full pass; returns the number of documents deleted."""
+        p = self.policy
+        t0 = time.perf_counter()
+        cutoff = datetime.utcnow() - timedelta(days=p.unkeyed_max_age_days) if p.unkeyed_max_age_days > 0 else None
+        excess = 0
+        if p.max_total_bytes > 0:
+            _, total = await self.store.usage()
+            excess = total - p.max_total_bytes
+        deleted = 0
+        after = None
+        while cutoff is not None or excess > 0:
+            page = await self.store.list(
+                limit=p.batch, after=after, sort="created_at", descending=False, keyed=False
+            )
+            if not page:
+                break
+            done = False
+            victims = []
+            planned = excess
+            for info in page:
+                expired = cutoff is not None and info.created_at is not None and info.created_at < cutoff
+                if not expired and planned <= 0:
+                    # oldest first: everything after this is newer and we are under the cap
+                    done = True
+                    break
+                victims.append(info)
+                planned -= info.size
+            results = await self.store.delete_many([v.id for v in victims]) if victims else {}
+            for info in victims:
+                if results.get(info.id):
+                    deleted += 1
+                    excess -= info.size
+                    self.stats["deleted_documents"] += 1
+                    self.stats["deleted_bytes"] += info.size
+            if done or len(page) < p.batch:
+                break
+            after = cursor_of(page[-1], "created_at")
+            await asyncio.sleep(0)
+        if excess > 0:
+            logger.warning("retention: still %d bytes over RETENTION_MAX_BYTES; only unkeyed documents are removed", excess)
+        self.stats["runs"] += 1
+        self.stats["last_run_seconds"] = time.perf_counter() - t0
+        self.stats["last_run_timestamp"] = time.time()
+        if deleted:
+            logger.info("retention: deleted %d document(s) in %.2fs", deleted, self.stats["last_run_seconds"])
+        return deleted
+
+    async def run_forever(self) -> None:
+        while True:
+            try:
+                await self.sweep()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                self.stats["errors"] += 1
+                logger.exception("retention sweep failed")
+            await asyncio.sleep(self.policy.interval)
+
+    def start(self) -> None:
+        if self._task is None and self.policy.enabled:
+            self._task = asyncio.get_running_loop().create_task(self.run_forever())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
@@ -34,6 +34,7 @@ PAGE = """
     .field input { width: 100%; box-sizing: border-box; }
     .modal-actions { display: flex; gap: 8px; margin-top: 12px; justify-content: flex-end; }
     .error { color: #c00; }
+    select { padding: 6px 8px; border: 1px solid #ddd; border-radius: 4px; background: #fff; }
   </style>
   <script>
     const APP_ORIGIN = __APP_ORIGIN__;
@@ -95,34 +96,126 @@ PAGE = """
       }
     }
     // Keys are included as shareLink in list response.
-    async function fetchList() {
-      const res = await fetch('/api/v2/admin/documents');
+    // The list is paged server-side; `listState` tracks the current query and cursor.
+    const listState = { cursor: null, done: false, loading: false, count: 0, gen: 0 };
+
+    function listQuery() {
+      const params = new URLSearchParams();
+      params.set('limit', '50');
+      const q = (document.getElementById('search-input').value || '').trim();
+      if (q) params.set('q', q);
+      const [sort, order] = document.getElementById('sort-select').value.split(':');
+      params.set('sort', sort);
+      params.set('order', order);
+      if (listState.cursor) params.set('cursor', listState.cursor);
+      return params.toString();
+    }
+
+    async function fetchPage() {
+      const res = await fetch('/api/v2/admin/documents?' + listQuery());
       if (!res.ok) throw new Error('Failed to fetch list');
       return res.json();
     }
 
+    function dropRows(ids) {
+      for (const id of ids) {
+        const row = document.getElementById('row-' + id);
+        if (row) row.remove();
+        edited.delete(id);
+      }
+      if (listState.done && !document.getElementById('tbody').children.length) setFooter('No documents');
+      updateSelection();
+      updateEdited();
+    }
+
     async function remove(id) {
       if (!confirm('Delete document ' + id + '?')) return;
       const res = await fetch('/api/v2/' + id, { method: 'DELETE' });
-      if (res.status !== 204) {
+      if (res.status !== 204 && res.status !== 404) {
         const msg = await res.text();
         alert('Delete failed: ' + msg);
+        return;
       }
-      await render();
+      dropRows([id]);
     }
 
-    async function saveName(id) {
-      const el = document.getElementById('name-' + id);
-      const name = el.value.trim();
-      const res = await fetch('/api/v2/admin/documents/' + id + '/name', {
-        method: 'POST',
-        headers: { 'Content-Type': 'application/json' },
-        body: JSON.stringify({ name: name || null }),
-      });
-      if (!res.ok) {
-        const msg = await res.text();
-        alert('Save failed: ' + msg);
+    function selectedIds() {
+      return [...document.querySelectorAll('#tbody input.sel:checked')].map((el) => el.value);
+    }
+
+    function updateSelection() {
+      const n = selectedIds().length;
+      const btn = document.getElementById('delete-selected-btn');
+      btn.disabled = n === 0;
+      btn.textContent = n ? `Delete selected (${n})` : 'Delete selected';
+    }
+
+    function toggleAll(checked) {
+      document.querySelectorAll('#tbody input.sel').forEach((el) => { el.checked = checked; });
+      updateSelection();
+    }
+
+    async function removeSelected() {
+      const ids = selectedIds();
+      if (!ids.length || !confirm('Delete ' + ids.length + ' document(s)?')) return;
+      // One request per 500 ids; rows are removed locally instead of reloading the list
+      for (let i = 0; i < ids.length; i += 500) {
+        const chunk = ids.slice(i, i + 500);
+        const res = await fetch('/api/v2/admin/documents/batch-delete', {
+          method: 'POST',
+          headers: { 'Content-Type': 'application/json' },
+          body: JSON.stringify({ ids: chunk }),
+        });
+        if (!res.ok) {
+          const msg = await res.text();
+          alert('Delete failed: ' + msg);
+          return;
+        }
+        const { results } = await res.json();
+        dropRows(results.map((r) => r.id));
       }
+      document.getElementById('select-all').checked = false;
+    }
+
+    // Ids whose name input changed since it was loaded or last saved
+    const edited = new Set();
+
+    function markEdited(id) {
+      edited.add(id);
+      updateEdited();
+    }
+
+    function updateEdited() {
+      const btn = document.getElementById('save-edited-btn');
+      btn.disabled = edited.size === 0;
+      btn.textContent = edited.size ? `Save names (${edited.size})` : 'Save names';
+    }
+
+    async function saveNames(ids) {
+      // One batch-meta request per 500 rows; an empty name clears it
+      const failed = [];
+      for (let i = 0; i < ids.length; i += 500) {
+        const items = ids.slice(i, i + 500).map((id) => ({
+          id, name: document.getElementById('name-' + id).value.trim(),
+        }));
+        const res = await fetch('/api/v2/admin/documents/batch-meta', {
+          method: 'POST',
+          headers: { 'Content-Type': 'application/json' },
+          body: JSON.stringify({ items }),
+        });
+        if (!res.ok) {
+          const msg = await res.text();
+          alert('Save failed: ' + msg);
+          return;
+        }
+        const { results } = await res.json();
+        for (const r of results) {
+          if (r.ok) edited.delete(r.id);
+          else failed.push(r.id + ': ' + r.error);
+        }
+      }
+      updateEdited();
+      if (failed.length) alert('Save failed:\\n' + failed.join('\\n'));
     }
 
     function openWithLink(link) { window.open(link, '_blank'); }
@@ -138,20 +231,13 @@ PAGE = """
       return d.toLocaleString();
     }
 
-    async function render() {
-      document.getElementById('tbody').innerHTML = '<tr><td colspan="5" class="muted">Loading...</td></tr>';
-      try {
-        const items = await fetchList();
-        if (!items.length) {
-          document.getElementById('tbody').innerHTML = '<tr><td colspan="5" class="muted">No documents</td></tr>';
-          return;
-        }
-        const rows = items.map((it, idx) => `
-          <tr>
-            <td>${idx + 1}</td>
+    function rowHtml(it, idx) {
+      return `
+          <tr id="row-${it.id}">
+            <td><input type="checkbox" class="sel" value="${it.id}" onchange="updateSelection()" /> ${idx}</td>
             <td>
-              <input id="name-${it.id}" type="text" value="${(it.name || '').replace(/"/g, '&quot;')}" placeholder="(untitled)" style="width: 220px" />
-              <button onclick="saveName('${it.id}')">Save</button>
+              <input id="name-${it.id}" type="text" value="${(it.name || '').replace(/"/g, '&quot;')}" placeholder="(untitled)" style="width: 220px" oninput="markEdited('${it.id}')" />
+              <button onclick="saveNames(['${it.id}'])">Save</button>
             </td>
             <td class="id">${it.id}</td>
             <td>${(it.size || 0)} bytes<br/><span class="muted">${toLocal(it.createdAt)}</span></td>
@@ -161,13 +247,65 @@ PAGE = """
               <button onclick="remove('${it.id}')">Delete</button>
             </td>
           </tr>
-        `).join('');
-        document.getElementById('tbody').innerHTML = rows;
+        `;
+    }
+
+    function setFooter(text) {
+      document.getElementById('list-footer').textContent = text;
+    }
+
+    async function loadMore() {
+      if (listState.loading || listState.done) return;
+      listState.loading = true;
+      const gen = listState.gen;
+      setFooter('Loading...');
+      try {
+        const page = await fetchPage();
+        if (gen !== listState.gen) return; // a newer render() started
+        const tbody = document.getElementById('tbody');
+        const rows = page.items.map((it) => rowHtml(it, ++listState.count)).join('');
+        tbody.insertAdjacentHTML('beforeend', rows);
+        listState.cursor = page.nextCursor;
+        listState.done = !page.nextCursor;
+        if (listState.count === 0) setFooter('No documents');
+        else setFooter(listState.done ? '' : 'Scroll for more');
+        // The observer only fires on changes; keep filling while the footer stays visible
+        const rect = document.getElementById('list-footer').getBoundingClientRect();
+        if (!listState.done && rect.top < window.innerHeight) setTimeout(loadMore, 0);
       } catch (e) {
-        document.getElementById('tbody').innerHTML = '<tr><td colspan="5" class="muted">Failed: ' + e.message + '</td></tr>';
+        if (gen === listState.gen) setFooter('Failed: ' + e.message);
+      } finally {
+        if (gen === listState.gen) listState.loading = false;
       }
     }
 
+    async function render() {
+      listState.gen += 1;
+      listState.cursor = null;
+      listState.done = false;
+      listState.loading = false;
+      listState.count = 0;
+      document.getElementById('tbody').innerHTML = '';
+      document.getElementById('select-all').checked = false;
+      edited.clear();
+      updateSelection();
+      updateEdited();
+      await loadMore();
+    }
+
+    let searchTimer = null;
+    function onSearchInput() {
+      clearTimeout(searchTimer);
+      searchTimer = setTimeout(render, 250);
+    }
+
+    window.addEventListener('DOMContentLoaded', () => {
+      // Fetch the next page whenever the footer scrolls into view
+      const observer = new IntersectionObserver((entries) => {
+        if (entries.some((e) => e.isIntersecting)) loadMore();
+      });
+      observer.observe(document.getElementById('list-footer'));
+    });
     window.addEventListener('DOMContentLoaded', render);
   </script>
 </head>
@@ -177,6 +315,17 @@ PAGE = """
     <button onclick="render()">Refresh</button>
     <span class="muted">List shows canvases with saved key</span>
     <button onclick="openAddModal()">Add Canvas</button>
+    <button id="delete-selected-btn" onclick="removeSelected()" disabled>Delete selected</button>
+    <button id="save-edited-btn" onclick="saveNames([...edited])" disabled>Save names</button>
+    <input id="search-input" type="text" placeholder="Search name or id prefix" oninput="onSearchInput()" />
+    <select id="sort-select" onchange="render()">
+      <option value="created_at:desc">Newest first</option>
+      <option value="created_at:asc">Oldest first</option>
+      <option value="name:asc">Name A→Z</option>
+      <option value="name:desc">Name Z→A</option>
+      <option value="size:desc">Largest first</option>
+      <option value="size:asc">Smallest first</option>
+    </select>
   </div>
   <div id="add-modal" class="modal-overlay" onclick="if(event.target===this) closeAddModal()">
     <div class="modal" role="dialog" aria-modal="true" aria-labelledby="add-title">
@@ -198,17 +347,18 @@ PAGE = """
   </div>
   <table>
     <thead>
-      <tr><th>#</th><th>Name</th><th>ID</th><th>Info</th><th>Actions</th></tr>
+      <tr><th><input type="checkbox" id="select-all" onchange="toggleAll(this.checked)" /> #</th><th>Name</th><th>ID</th><th>Info</th><th>Actions</th></tr>
     </thead>
     <tbody id="tbody"></tbody>
   </table>
+  <div id="list-footer" class="muted" style="padding: 12px 8px;"></div>
 </body>
 </html>
 """
 
 
 @router.get("/admin", response_class=HTMLResponse)
-def admin_page():
+async def admin_page():
     origin = settings.PUBLIC_ORIGIN or ""
     injected = PAGE.replace("__APP_ORIGIN__", f"{origin!r}")
     return HTMLResponse(injected)
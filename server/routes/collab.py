@@ -0,0 +1,27 @@
+from __future__ import annotations
+
+from fastapi import APIRouter, WebSocket
+from fastapi.responses import JSONResponse
+
+from ..collab import RoomServer
+from ..config import settings
+
+
+router = APIRouter()
+rooms = RoomServer(
+    max_message_bytes=settings.COLLAB_MAX_MESSAGE_BYTES,
+    max_queue_bytes=settings.COLLAB_SEND_QUEUE_BYTES,
+    ping_interval=settings.COLLAB_PING_INTERVAL,
+    ping_timeout=settings.COLLAB_PING_TIMEOUT,
+)
+
+
+@router.websocket("/socket.io/")
+async def socket_io(ws: WebSocket):
+    await rooms.serve(ws)
+
+
+@router.api_route("/socket.io/", methods=["GET", "POST"], include_in_schema=False)
+async def socket_io_polling():
+    # Engine.IO's answer to an unsupported transport; the client then stays on WebSocket
+    return JSONResponse({"code": 0, "message": "Transport unknown"}, status_code=400)
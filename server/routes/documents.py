@@ -1,43 +1,199 @@
 from fastapi import APIRouter, Response, Request, HTTPException
+from fastapi.responses import FileResponse, StreamingResponse
 from urllib.parse import quote
 from pydantic import BaseModel
+from email.utils import formatdate, parsedate_to_datetime
+import base64
+import json
+import time
 
+from ..archive import ArchiveError, export_tar, import_tar
 from ..config import settings
-from ..storage import get_store
+from ..storage import get_async_store, cursor_of, SORT_FIELDS, Blob, UploadTooLarge, StoreFull
 
 
 router = APIRouter()
-store = get_store(settings.STORAGE_TYPE, settings.LOCAL_STORAGE_PATH)
+store = get_async_store(
+    settings.STORAGE_TYPE,
+    settings.LOCAL_STORAGE_PATH,
+    settings.STORAGE_THREADS,
+    instrument=settings.METRICS_ENABLED,
+    **settings.store_options(),
+)
 
 
 @router.post("/api/v2/post/")
 @router.post("/api/v2/post")
 async def create_document(request: Request):
-    data = await request.body()
-    doc_id = store.create(data)
+    limit = settings.MAX_UPLOAD_BYTES or None
+    declared = request.headers.get("content-length")
+    # Reject early when the client announces an oversized body
+    if limit and declared and declared.isdigit() and int(declared) > limit:
+        raise HTTPException(status_code=413, detail="payload too large")
+    try:
+        doc_id = await store.create_stream(request.stream(), max_bytes=limit)
+    except UploadTooLarge:
+        raise HTTPException(status_code=413, detail="payload too large")
+    except StoreFull:
+        raise HTTPException(status_code=507, detail="storage full")
     return {"id": doc_id}
 
 
 @router.get("/api/v2/{id}/")
 @router.get("/api/v2/{id}")
-def get_document(id: str):
-    data = store.find_id(id)
-    if data is None:
+async def get_document(id: str, request: Request):
+    blob = await store.find_blob(id)
+    if blob is None:
         raise HTTPException(status_code=404, detail="not found")
-    return Response(content=data, media_type="application/octet-stream")
+    # Documents are immutable once created and ids are never reused, so the id
+    # itself is a strong validator and responses can be cached indefinitely.
+    etag = f'"{id}"'
+    headers = {
+        "ETag": etag,
+        "Cache-Control": f"public, max-age={settings.DOCUMENT_MAX_AGE}, immutable",
+    }
+    if blob.mtime is not None:
+        headers["Last-Modified"] = formatdate(blob.mtime, usegmt=True)
+    if _not_modified(request, etag, blob.mtime):
+        return Response(status_code=304, headers=headers)
+    return _blob_response(blob, request.headers.get("range"), headers)
+
+
+def _not_modified(request: Request, etag: str, mtime: float | None) -> bool:
+    inm = request.headers.get("if-none-match")
+    if inm is not None:
+        # Weak comparison, as RFC 9110 requires for If-None-Match
+        tags = [t.strip().removeprefix("W/") for t in inm.split(",")]
+        return "*" in tags or etag in tags
+    ims = request.headers.get("if-modified-since")
+    if ims and mtime is not None:
+        try:
+            return int(mtime) <= parsedate_to_datetime(ims).timestamp()
+        except (TypeError, ValueError):
+            return False
+    return False
+
+
+CHUNK_SIZE = 64 * 1024
+
+
+def _parse_range(header: str, size: int) -> tuple[int, int] | None:
+    """Parse a single ``bytes=`` range into inclusive (start, end).
+
+    Returns None for anything we don't serve partially (multiple ranges,
+    other units, malformed values) so the caller falls back to a full 200.
+    Raises 416 when the range is well-formed but unsatisfiable.
+    """
+    unit, _, spec = header.partition("=")
+    if unit.strip().lower() != "bytes" or "," in spec:
+        return None
+    first, sep, last = spec.strip().partition("-")
+    if not sep:
+        return None
+    try:
+        if first == "":
+            # suffix range: last N bytes
+            n = int(last)
+            if n <= 0:
+                raise ValueError
+            start, end = max(0, size - n), size - 1
+        else:
+            start = int(first)
+            end = int(last) if last else max(start, size - 1)
+            if start < 0 or end < start:
+                return None
+    except ValueError:
+        return None
+    if start >= size:
+        raise HTTPException(status_code=416, detail="range not satisfiable", headers={"Content-Range": f"bytes */{size}"})
+    return start, min(end, size - 1)
+
+
+def _iter_file(path: str, start: int, length: int):
+    with open(path, "rb") as f:
+        f.seek(start)
+        while length > 0:
+            chunk = f.read(min(CHUNK_SIZE, length))
+            if not chunk:
+                break
+            length -= len(chunk)
+            yield chunk
+
+
+class _WholeFileResponse(FileResponse):
+    """FileResponse that always sends the whole file.
+
+    Newer Starlette versions parse ``Range`` in FileResponse too, answering
+    400 or multipart for ranges that ``_parse_range`` chose to serve in full.
+    """
+
+    async def __call__(self, scope, receive, send) -> None:
+        scope = {**scope, "headers": [(k, v) for k, v in scope["headers"] if k != b"range"]}
+        await super().__call__(scope, receive, send)
+
+
+def _blob_response(blob: Blob, range_header: str | None, headers: dict[str, str]) -> Response:
+    media_type = "application/octet-stream"
+    headers = {**headers, "Accept-Ranges": "bytes"}
+    rng = _parse_range(range_header, blob.size) if range_header and blob.size else None
+    if rng is None:
+        if blob.path is not None:
+            # FileResponse streams from disk (sendfile/pathsend where the server supports it)
+            return _WholeFileResponse(blob.path, media_type=media_type, headers=headers)
+        return Response(content=blob.data, media_type=media_type, headers=headers)
+    start, end = rng
+    length = end - start + 1
+    headers["Content-Range"] = f"bytes {start}-{end}/{blob.size}"
+    headers["Content-Length"] = str(length)
+    if blob.path is not None:
+        return StreamingResponse(_iter_file(blob.path, start, length), status_code=206, media_type=media_type, headers=headers)
+    return Response(content=blob.data[start:end + 1], status_code=206, media_type=media_type, headers=headers)
+
+
+def _encode_cursor(pos: tuple) -> str:
+    raw = json.dumps(list(pos), separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def _decode_cursor(cursor: str, sort: str) -> tuple:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        value, id_ = json.loads(raw)
+    except Exception:
+        raise HTTPException(status_code=400, detail="invalid cursor")
+    # name sorts by text, created_at (µs) and size by integers
+    if not isinstance(id_, str) or not (isinstance(value, str) if sort == "name" else type(value) is int):
+        raise HTTPException(status_code=400, detail="invalid cursor")
+    return (value, id_)
 
 
 @router.get("/api/v2/admin/documents")
-def list_documents():
+async def list_documents(
+    limit: int = 50,
+    cursor: str | None = None,
+    sort: str = "created_at",
+    order: str = "desc",
+    q: str | None = None,
+):
+    if sort not in SORT_FIELDS:
+        raise HTTPException(status_code=400, detail=f"sort must be one of {', '.join(SORT_FIELDS)}")
+    if order not in ("asc", "desc"):
+        raise HTTPException(status_code=400, detail="order must be asc or desc")
+    limit = max(1, min(limit, settings.ADMIN_PAGE_MAX))
+    after = _decode_cursor(cursor, sort) if cursor else None
     # Only canvases that can be opened (key present)
-    items_all = store.list()
+    items = await store.list(
+        limit=limit,
+        after=after,
+        sort=sort,
+        descending=order == "desc",
+        prefix=(q or "").strip() or None,
+        keyed=True,
+    )
     origin = settings.PUBLIC_ORIGIN or ""
     out = []
-    for it in items_all:
-        key = store.get_key(it.id)
-        if not key:
-            continue
-        share = f"{origin}/#json={it.id},{quote(key)}"
+    for it in items:
+        share = f"{origin}/#json={it.id},{quote(it.key or '')}"
         out.append({
             "id": it.id,
             "size": it.size,
@@ -45,13 +201,14 @@ def list_documents():
             "name": it.name,
             "shareLink": share,
         })
-    return out
+    next_cursor = _encode_cursor(cursor_of(items[-1], sort)) if len(items) == limit else None
+    return {"items": out, "nextCursor": next_cursor}
 
 
 @router.delete("/api/v2/{id}/")
 @router.delete("/api/v2/{id}")
-def delete_document(id: str):
-    ok = store.delete(id)
+async def delete_document(id: str):
+    ok = await store.delete(id)
     if not ok:
         raise HTTPException(status_code=404, detail="not found")
     return Response(status_code=204)
@@ -62,8 +219,8 @@ class NameBody(BaseModel):
 
 
 @router.post("/api/v2/admin/documents/{id}/name")
-def set_document_name(id: str, body: NameBody):
-    ok = store.set_name(id, body.name)
+async def set_document_name(id: str, body: NameBody):
+    ok = await store.set_name(id, body.name)
     if not ok:
         raise HTTPException(status_code=404, detail="not found")
     return {"id": id, "name": body.name}
@@ -78,16 +235,80 @@ class MetaBody(BaseModel):
 
 
 @router.post("/api/v2/admin/documents/{id}/meta")
-def set_document_meta(id: str, body: MetaBody):
+async def set_document_meta(id: str, body: MetaBody):
     # Both fields optional, but at least one must be provided
     if body.name is None and body.key is None:
         raise HTTPException(status_code=400, detail="name or key required")
-    key_ok = True
-    if body.key is not None:
-        key_ok = store.set_key(id, body.key)
-    name_ok = True
-    if body.name is not None:
-        name_ok = store.set_name(id, body.name)
-    if not key_ok and not name_ok:
+    fields = {f: v for f, v in (("name", body.name), ("key", body.key)) if v is not None}
+    # One sidecar write for both fields instead of two racing ones
+    if not await store.update_meta(id, **fields):
         raise HTTPException(status_code=404, detail="not found")
-    return {"id": id, "name": body.name if body.name is not None else store.get_name(id)}
+    return {"id": id, "name": body.name if body.name is not None else await store.get_name(id)}
+
+
+class BatchDeleteBody(BaseModel):
+    ids: list[str]
+
+
+class BatchMetaItem(BaseModel):
+    id: str
+    name: str | None = None
+    key: str | None = None
+
+
+class BatchMetaBody(BaseModel):
+    items: list[BatchMetaItem]
+
+
+def _check_batch_size(n: int) -> None:
+    if n > settings.ADMIN_BATCH_MAX:
+        raise HTTPException(status_code=413, detail=f"at most {settings.ADMIN_BATCH_MAX} items per request")
+
+
+@router.post("/api/v2/admin/documents/batch-delete")
+async def batch_delete_documents(body: BatchDeleteBody):
+    ids = list(dict.fromkeys(body.ids))
+    _check_batch_size(len(ids))
+    done = await store.delete_many(ids) if ids else {}
+    return {"results": [{"id": i, "ok": True} if done[i] else {"id": i, "ok": False, "error": "not found"} for i in ids]}
+
+
+@router.post("/api/v2/admin/documents/batch-meta")
+async def batch_set_document_meta(body: BatchMetaBody):
+    _check_batch_size(len(body.items))
+    updates: dict[str, dict[str, str | None]] = {}
+    for it in body.items:
+        fields = {f: v for f, v in (("name", it.name), ("key", it.key)) if v is not None}
+        if fields:
+            # a later entry for the same id wins field by field
+            updates.setdefault(it.id, {}).update(fields)
+    done = await store.update_meta_many(updates) if updates else {}
+    results = []
+    for id_ in dict.fromkeys(it.id for it in body.items):
+        if id_ not in updates:
+            results.append({"id": id_, "ok": False, "error": "name or key required"})
+        elif done[id_]:
+            results.append({"id": id_, "ok": True})
+        else:
+            results.append({"id": id_, "ok": False, "error": "not found"})
+    return {"results": results}
+
+
+@router.get("/api/v2/admin/export")
+async def export_documents():
+    filename = time.strftime("excalidraw-%Y%m%d-%H%M%S.tar", time.gmtime())
+    return StreamingResponse(
+        export_tar(store),
+        media_type="application/x-tar",
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
+
+
+@router.post("/api/v2/admin/import")
+async def import_documents(request: Request):
+    try:
+        return await import_tar(store, request.stream())
+    except ArchiveError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except StoreFull:
+        raise HTTPException(status_code=507, detail="storage full")
@@ -1,14 +1,44 @@
 from __future__ import annotations
 
+import os
 from fastapi import APIRouter, Request
 from fastapi.responses import JSONResponse
 from datetime import datetime, timezone
 
+from ..config import settings
+from ..firebase_store import FirebaseWrite, get_async_firebase_store
+
 
 router = APIRouter()
 
-# in-memory for demo; adjust to persistent store if needed
-saved_items: dict[str, object] = {}
+
+def _default_path() -> str:
+    suffix = ".sqlite3" if settings.FIREBASE_STORAGE_TYPE == "sqlite" else ""
+    return os.path.join(settings.LOCAL_STORAGE_PATH, ".firebase" + suffix)
+
+
+store = get_async_firebase_store(
+    settings.FIREBASE_STORAGE_TYPE,
+    settings.FIREBASE_STORAGE_PATH or _default_path(),
+    memory_max_bytes=settings.FIREBASE_MEMORY_MAX_BYTES,
+    compression=settings.STORAGE_COMPRESSION,
+)
+
+
+def _ts(t: float) -> str:
+    return datetime.fromtimestamp(t, timezone.utc).isoformat()
+
+
+def _parse_write(w: dict) -> FirebaseWrite | None:
+    if "delete" in w:
+        name = w.get("delete")
+        return FirebaseWrite(name=name) if isinstance(name, str) and name else None
+    update = w.get("update") or {}
+    name = update.get("name", "")
+    if not name:
+        return None
+    mask = (w.get("updateMask") or {}).get("fieldPaths")
+    return FirebaseWrite(name=name, fields=update.get("fields", {}), mask=mask if isinstance(mask, list) else None)
 
 
 @router.post("/v1/projects/{project}/databases/{db}/documents:commit")
@@ -18,17 +48,14 @@ async def firebase_commit(project: str, db: str, request: Request):
     writes = payload.get("writes", [])
     if not writes:
         return JSONResponse(status_code=400, content={"detail": "no writes"})
-    update = writes[0].get("update", {})
-    name = update.get("name", "")
-    fields = update.get("fields", {})
-    if not name:
+    parsed = [_parse_write(w) for w in writes]
+    if any(w is None for w in parsed):
         return JSONResponse(status_code=400, content={"detail": "missing name"})
 
-    saved_items[name] = fields
-    now = datetime.now(timezone.utc).isoformat()
+    commit_time = _ts(await store.commit(parsed))
     return {
-        "writeResults": [{"updateTime": now}],
-        "commitTime": now,
+        "writeResults": [{"updateTime": commit_time} for _ in parsed],
+        "commitTime": commit_time,
     }
 
 
@@ -38,23 +65,23 @@ async def firebase_batch_get(project: str, db: str, request: Request):
     docs = payload.get("documents", [])
     if not docs:
         return JSONResponse(status_code=400, content={"detail": "no documents"})
-    key = docs[0]
+    found = await store.get_many(docs)
     now = datetime.now(timezone.utc).isoformat()
-    if key in saved_items:
-        return JSONResponse(
-            content=[
-                {
-                    "found": {
-                        "name": key,
-                        "fields": saved_items[key],
-                        "createTime": now,
-                        "updateTime": now,
-                    },
-                    "readTime": now,
-                }
-            ]
+    out = []
+    for key in docs:
+        doc = found.get(key)
+        if doc is None:
+            out.append({"missing": key, "readTime": now})
+            continue
+        out.append(
+            {
+                "found": {
+                    "name": key,
+                    "fields": doc.fields,
+                    "createTime": _ts(doc.create_time),
+                    "updateTime": _ts(doc.update_time),
+                },
+                "readTime": now,
+            }
         )
-    return JSONResponse(
-        content=[{"missing": key, "readTime": now}]
-    )
-
+    return JSONResponse(content=out)
@@ -0,0 +1,68 @@
+from __future__ import annotations
+
+from fastapi import APIRouter, Request, Response
+
+from ..metrics import REGISTRY
+from . import documents
+
+
+router = APIRouter()
+
+
+def _samples(request: Request, count: int, total: int):
+    yield "documents", "gauge", "Stored documents", {}, count
+    yield "documents_bytes", "gauge", "Total size of stored documents (uncompressed)", {}, total
+
+    stats = getattr(documents.store.backend, "stats", None)
+    if stats is not None:
+        s = stats()
+        for k in ("hits", "misses", "evictions"):
+            yield f"cache_{k}_total", "counter", f"Document body cache {k}", {}, s[k]
+        yield "cache_bytes", "gauge", "Bytes held by the document body cache", {}, s["bytes"]
+        yield "cache_entries", "gauge", "Entries in the document body cache", {}, s["entries"]
+
+    wal_stats = getattr(documents.store.backend, "wal_stats", None)
+    if wal_stats is not None:
+        w = wal_stats()
+        yield "wal_bytes", "gauge", "Bytes in the current memory-wal log generation", {}, w["wal_bytes"]
+        yield "wal_snapshots_total", "counter", "memory-wal snapshots written", {}, w["snapshots"]
+        yield "wal_last_snapshot_seconds", "gauge", "Duration of the last memory-wal snapshot", {}, w["last_snapshot_seconds"]
+        yield "wal_load_seconds", "gauge", "Startup time spent loading the snapshot and replaying logs", {}, w["load_seconds"]
+
+    gc = getattr(request.app.state, "gc", None)
+    if gc is not None:
+        g = gc.stats
+        yield "retention_runs_total", "counter", "Retention sweeps completed", {}, g["runs"]
+        yield "retention_errors_total", "counter", "Retention sweeps that failed", {}, g["errors"]
+        yield "retention_deleted_documents_total", "counter", "Documents removed by retention", {}, g["deleted_documents"]
+        yield "retention_deleted_bytes_total", "counter", "Bytes removed by retention", {}, g["deleted_bytes"]
+        yield "retention_last_run_seconds", "gauge", "Duration of the last retention sweep", {}, g["last_run_seconds"]
+
+    rooms = getattr(request.app.state, "rooms", None)
+    if rooms is not None:
+        yield "collab_rooms", "gauge", "Open collaboration rooms", {}, len(rooms.rooms)
+        yield "collab_clients", "gauge", "Connected collaboration sockets", {}, len(rooms.clients)
+        for k, v in sorted(rooms.stats.items()):
+            yield f"collab_{k}_total", "counter", f"Collaboration {k.replace('_', ' ')}", {}, v
+
+    admission = getattr(request.app.state, "admission", None)
+    if admission is not None:
+        for cls, n in sorted(admission.active.items()):
+            yield "admission_active_requests", "gauge", "Admitted requests in flight", {"class": cls}, n
+        for (cls, reason), n in sorted(admission.rejected.items()):
+            yield "admission_rejected_total", "counter", "Requests refused (rate: 429, busy: 503)", {"class": cls, "reason": reason}, n
+        for cls, buckets in sorted(admission.buckets.items()):
+            yield "admission_tracked_clients", "gauge", "Clients with a rate-limit bucket", {"class": cls}, len(buckets)
+
+    index = getattr(request.app.state, "spa_index", None)
+    if index is not None:
+        yield "spa_index_builds_total", "counter", "Times the injected index.html was rebuilt", {}, index.builds
+        for enc, n in sorted(index.responses.items()):
+            yield "spa_index_responses_total", "counter", "index.html responses from the SPA fallback", {"encoding": enc}, n
+
+
+@router.get("/metrics", include_in_schema=False)
+async def metrics(request: Request):
+    count, total = await documents.store.usage()
+    body = REGISTRY.render(_samples(request, count, total))
+    return Response(body, media_type="text/plain; version=0.0.4; charset=utf-8")
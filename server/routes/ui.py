@@ -1,49 +1,294 @@
 from fastapi import FastAPI, Request
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse, HTMLResponse
+from fastapi.responses import FileResponse, Response
+from starlette.datastructures import Headers
+from starlette.staticfiles import NotModifiedResponse
+import gzip
+import hashlib
+import mimetypes
 import os
+import re
+import threading
+import time
 
+try:  # optional: brotli variant when the module is installed
+    import brotli  # type: ignore
+except ImportError:  # pragma: no cover
+    brotli = None
 
-def mount_static(app: FastAPI, static_dir: str):
+try:  # optional: zstd variant when the module is installed
+    import zstandard  # type: ignore
+except ImportError:  # pragma: no cover
+    zstandard = None
+
+
+INJECT_JS = os.path.join(os.path.dirname(os.path.dirname(__file__)), "inject", "save-to-admin.js")
+
+
+def accepted_encodings(header: str) -> set[str]:
+    """Content codings the client accepts (q > 0) from an Accept-Encoding header."""
+    out = set()
+    for part in header.split(","):
+        coding, _, params = part.strip().partition(";")
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        q = 1.0
+        for param in params.split(";"):
+            k, _, v = param.strip().partition("=")
+            if k == "q":
+                try:
+                    q = float(v)
+                except ValueError:
+                    q = 0.0
+        if q > 0:
+            out.add(coding)
+    return out
+
+
+# Sibling suffix per content coding, in server preference order
+ENCODINGS = (("br", ".br"), ("zstd", ".zst"), ("gzip", ".gz"))
+COMPRESSIBLE = (".js", ".mjs", ".css", ".html", ".svg", ".json", ".map", ".txt", ".xml", ".wasm", ".ttf", ".otf", ".webmanifest")
+# Build tools put a fixed-length content hash right before the extension; such files never change.
+# Vite/Rollup: 8 base64url characters after a dash (index-B2x9kLq0.js). webpack and friends: 8, 20
+# or 32 hex digits (main.3f2a1b4c.chunk.js, Virgil-a88b72a24fb54c9f94e3b5fdaa7481c9.woff2).
+# The segment must mix digits with letters (upper case for base64url), so names such as
+# font-v20-latin.woff2 or logo-20240101.png are not mistaken for hashes.
+HASHED_NAME = re.compile(
+    r"(?:-(?=[A-Za-z0-9_-]{0,7}\d)(?=[A-Za-z0-9_-]{0,7}[A-Z])[A-Za-z0-9_-]{8}"
+    r"|[.-](?=[0-9a-f]{0,31}\d)(?=[0-9a-f]{0,31}[a-f])(?:[0-9a-f]{32}|[0-9a-f]{20}|[0-9a-f]{8}))"
+    r"(?:\.chunk)?\.[A-Za-z0-9]+$"
+)
+
+
+def _compressors() -> dict:
+    out = {"gzip": lambda b: gzip.compress(b, compresslevel=9)}
+    if brotli is not None:
+        out["br"] = brotli.compress
+    if zstandard is not None:
+        out["zstd"] = zstandard.ZstdCompressor(level=19).compress
+    return out
+
+
+def precompress(static_dir: str, min_size: int = 1024) -> int:
+    """Write missing ``.gz`` (and ``.br``/``.zst`` if available) siblings for compressible files.
+
+    Siblings are only kept when smaller than the original. Each is written to
+    a temp file and renamed, so concurrent workers can run this at startup.
+    Returns the number of files written.
+    """
+    compressors = _compressors()
+    written = 0
+    for root, _, names in os.walk(static_dir):
+        for n in names:
+            if not n.endswith(COMPRESSIBLE):
+                continue
+            path = os.path.join(root, n)
+            try:
+                if os.path.getsize(path) < min_size:
+                    continue
+            except OSError:
+                continue
+            data = None
+            for enc, suffix in ENCODINGS:
+                if enc not in compressors or os.path.exists(path + suffix):
+                    continue
+                if data is None:
+                    with open(path, "rb") as f:
+                        data = f.read()
+                packed = compressors[enc](data)
+                if len(packed) >= len(data):
+                    continue
+                tmp = f"{path}{suffix}.{os.getpid()}.tmp"
+                with open(tmp, "wb") as f:
+                    f.write(packed)
+                os.replace(tmp, path + suffix)
+                written += 1
+    return written
+
+
+class PrecompressedStaticFiles(StaticFiles):
+    """StaticFiles that serves ``.br``/``.zst``/``.gz`` siblings and sets cache headers.
+
+    Hashed asset names get ``immutable`` caching; everything else must
+    revalidate (ETag/Last-Modified, answered with 304).
+    """
+
+    def __init__(self, *, directory: str, **kwargs) -> None:
+        super().__init__(directory=directory, **kwargs)
+        self.variants = self._scan_variants(directory)
+
+    @staticmethod
+    def _scan_variants(directory: str) -> dict[str, dict[str, tuple[str, os.stat_result]]]:
+        variants: dict[str, dict[str, tuple[str, os.stat_result]]] = {}
+        for root, _, names in os.walk(directory):
+            present = set(names)
+            for n in names:
+                for enc, suffix in ENCODINGS:
+                    if n + suffix in present:
+                        p = os.path.join(root, n + suffix)
+                        full = os.path.realpath(os.path.join(root, n))
+                        variants.setdefault(full, {})[enc] = (p, os.stat(p))
+        return variants
+
+    def file_response(self, full_path, stat_result, scope, status_code: int = 200) -> Response:
+        request_headers = Headers(scope=scope)
+        name = os.path.basename(full_path)
+        headers = {
+            "Cache-Control": "public, max-age=31536000, immutable" if HASHED_NAME.search(name) else "no-cache",
+        }
+        options = self.variants.get(os.path.realpath(full_path))
+        path, st = full_path, stat_result
+        if options:
+            headers["Vary"] = "Accept-Encoding"
+            accept = accepted_encodings(request_headers.get("accept-encoding", ""))
+            for enc, _ in ENCODINGS:
+                if enc in options and enc in accept:
+                    path, st = options[enc]
+                    headers["Content-Encoding"] = enc
+                    break
+        media_type = mimetypes.guess_type(name)[0] or "application/octet-stream"
+        response = FileResponse(path, status_code=status_code, headers=headers, media_type=media_type, stat_result=st)
+        if self.is_not_modified(response.headers, request_headers):
+            return NotModifiedResponse(response.headers)
+        return response
+
+
+class SpaIndex:
+    """index.html with the admin helper injected, built once and kept in memory.
+
+    Also holds a manifest of the build directory so static-file checks don't
+    touch the filesystem. Sources are re-stat'ed at most every
+    ``check_interval`` seconds and everything is rebuilt when one of them
+    changes mtime, size or inode (a deploy that copies files with their old
+    mtimes still replaces or resizes them). The sources include every
+    directory of the build, whose mtime moves when a file in it is added,
+    removed or renamed over, so new hashed assets show up in the manifest.
+    """
+
+    def __init__(self, static_dir: str, check_interval: float = 2.0) -> None:
+        self.static_dir = static_dir
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._checked = 0.0
+        self._stamps: tuple = ()
+        self.files: frozenset = frozenset()
+        self.variants: dict[str, bytes] = {}
+        self.etag = ""
+        self.builds = 0
+        # responses served, by content coding ("304" for revalidations)
+        self.responses: dict[str, int] = {}
+        self.refresh()
+
+    def _source_stamps(self) -> tuple:
+        out = []
+        dirs = [root for root, _, _ in os.walk(self.static_dir)] or [self.static_dir]
+        for p in (os.path.join(self.static_dir, "index.html"), INJECT_JS, *dirs):
+            try:
+                st = os.stat(p)
+                out.append((p, st.st_mtime_ns, st.st_size, st.st_ino))
+            except OSError:
+                out.append((p, None))
+        return tuple(out)
+
+    def _scan_files(self) -> frozenset:
+        files = set()
+        for root, _, names in os.walk(self.static_dir):
+            rel = os.path.relpath(root, self.static_dir)
+            for n in names:
+                files.add(n if rel == "." else f"{rel}/{n}".replace(os.sep, "/"))
+        # index.html is always served through the injecting fallback
+        files.discard("index.html")
+        return frozenset(files)
+
+    def _render(self) -> bytes | None:
+        index_path = os.path.join(self.static_dir, "index.html")
+        try:
+            with open(index_path, "r", encoding="utf-8") as f:
+                html = f.read()
+        except Exception:
+            return None
+        # Prefer inline inject to avoid extra network fetch; if reading fails, skip injection.
+        try:
+            with open(INJECT_JS, "r", encoding="utf-8") as jf:
+                js_code = jf.read()
+            tag = "<script>\n" + js_code + "\n</script>"
+        except Exception:
+            tag = None
+        if tag and "</head>" in html:
+            html = html.replace("</head>", tag + "</head>")
+        return html.encode("utf-8")
+
+    def refresh(self) -> None:
+        stamps = self._source_stamps()
+        with self._lock:
+            self._checked = time.monotonic()
+            if stamps == self._stamps:
+                return
+            body = self._render()
+            variants: dict[str, bytes] = {}
+            if body is not None:
+                variants["identity"] = body
+                variants["gzip"] = gzip.compress(body, compresslevel=9)
+                if brotli is not None:
+                    variants["br"] = brotli.compress(body)
+            self.files = self._scan_files()
+            self.variants = variants
+            self.etag = '"%s"' % hashlib.sha256(body or b"").hexdigest()[:32]
+            self._stamps = stamps
+            self.builds += 1
+
+    def maybe_refresh(self) -> None:
+        if time.monotonic() - self._checked >= self.check_interval:
+            self.refresh()
+
+    def response(self, request: Request) -> Response | None:
+        variants = self.variants
+        if not variants:
+            return None
+        headers = {"ETag": self.etag, "Cache-Control": "no-cache", "Vary": "Accept-Encoding"}
+        inm = request.headers.get("if-none-match")
+        if inm and self.etag in [t.strip().removeprefix("W/") for t in inm.split(",")]:
+            self._count("304")
+            return Response(status_code=304, headers=headers)
+        accept = accepted_encodings(request.headers.get("accept-encoding", ""))
+        for enc in ("br", "gzip"):
+            if enc in variants and (enc in accept or "*" in accept):
+                headers["Content-Encoding"] = enc
+                self._count(enc)
+                return Response(variants[enc], media_type="text/html", headers=headers)
+        self._count("identity")
+        return Response(variants["identity"], media_type="text/html", headers=headers)
+
+    def _count(self, kind: str) -> None:
+        self.responses[kind] = self.responses.get(kind, 0) + 1
+
+
+def mount_static(app: FastAPI, static_dir: str, generate_compressed: bool = False):
     static_dir = static_dir or "./frontend/build"
     if os.path.isdir(static_dir):
-        app.mount("/", StaticFiles(directory=static_dir, html=True), name="static")
+        if generate_compressed:
+            try:
+                precompress(static_dir)
+            except OSError:
+                pass  # read-only build dir: serve whatever siblings already exist
+        app.mount("/", PrecompressedStaticFiles(directory=static_dir, html=True), name="static")
         # (No external asset mount; helper JS is injected inline when serving index.html.)
+        index = SpaIndex(static_dir)
+        app.state.spa_index = index
 
         # Fallback for client-side routing to index.html
         @app.middleware("http")
         async def spa_fallback(request: Request, call_next):
             # pass through API routes
-            if request.url.path.startswith("/api/") or request.url.path.startswith("/v1/") or request.url.path.startswith("/ping") or request.url.path.startswith("/admin"):
+            if request.url.path.startswith("/api/") or request.url.path.startswith("/v1/") or request.url.path.startswith("/ping") or request.url.path.startswith("/admin") or request.url.path == "/metrics" or request.url.path.startswith("/socket.io/"):
                 return await call_next(request)
+            index.maybe_refresh()
             # try static first
-            path = os.path.join(static_dir, request.url.path.lstrip("/"))
-            if os.path.exists(path) and os.path.isfile(path):
+            if request.url.path.lstrip("/") in index.files:
                 return await call_next(request)
-            index_path = os.path.join(static_dir, "index.html")
-            if os.path.exists(index_path):
-                try:
-                    with open(index_path, "r", encoding="utf-8") as f:
-                        html = f.read()
-                except Exception:
-                    return FileResponse(index_path)
-
-                # Prefer inline inject to avoid extra network fetch; if reading fails, skip injection.
-                try:
-                    base_dir = os.path.dirname(os.path.dirname(__file__))  # server/
-                    inject_dir = os.path.join(base_dir, "inject")
-                    js_path = os.path.join(inject_dir, "save-to-admin.js")
-                    with open(js_path, "r", encoding="utf-8") as jf:
-                        js_code = jf.read()
-                    tag = "<script>\n" + js_code + "\n</script>"
-                except Exception:
-                    tag = None
-
-                try:
-                    if tag and "</head>" in html:
-                        html = html.replace("</head>", tag + "</head>")
-                        return HTMLResponse(html)
-                except Exception:
-                    pass
-                return FileResponse(index_path)
+            resp = index.response(request)
+            if resp is not None:
+                request.scope["route_label"] = "spa"  # for the request metrics
+                return resp
             return await call_next(request)
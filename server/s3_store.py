@@ -0,0 +1,417 @@
+"""Document storage in an S3-compatible bucket (AWS S3, MinIO, ...).
+
+Objects live under ``prefix``: ``docs/<id>`` holds the body and
+``meta/<id>.json`` the optional name/share key. Any number of app replicas can
+share a bucket; each keeps only a bounded local disk cache of bodies.
+Needs ``boto3`` (``pip install boto3``).
+"""
+from __future__ import annotations
+
+import json
+import logging
+import os
+import shutil
+import tempfile
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Tuple
+
+from .storage import Blob, DocumentInfo, _meta_updates, paginate
+
+try:  # optional: only needed for STORAGE_TYPE=s3
+    import boto3  # type: ignore
+    from boto3.s3.transfer import TransferConfig  # type: ignore
+    from botocore.config import Config  # type: ignore
+    from botocore.exceptions import ClientError  # type: ignore
+except ImportError:  # pragma: no cover
+    boto3 = None
+
+logger = logging.getLogger(__name__)
+
+COPY_CHUNK = 256 * 1024
+
+
+def _missing(exc: Exception) -> bool:
+    code = getattr(exc, "response", {}).get("Error", {}).get("Code")
+    return code in ("404", "NoSuchKey", "NotFound")
+
+
+def _valid_id(id_: str) -> bool:
+    return bool(id_) and "/" not in id_ and os.sep not in id_ and not id_.startswith(".")
+
+
+class DiskCache:
+    """Local copies of (immutable) document bodies with a byte budget, least recently used evicted.
+
+    Bodies never change once written, so entries only go stale on delete. The
+    directory may be shared by worker processes; each tracks its own budget.
+    """
+
+    def __init__(self, path: str, max_bytes: int) -> None:
+        self.path = path
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, int]" = OrderedDict()
+        self._bytes = 0
+        os.makedirs(path, exist_ok=True)
+        found = []
+        for e in os.scandir(path):
+            if e.name.startswith("."):
+                continue  # partial download left by a crash
+            st = e.stat()
+            found.append((st.st_atime, e.name, st.st_size))
+        for _, name, size in sorted(found):
+            self._entries[name] = size
+            self._bytes += size
+        with self._lock:
+            self._evict()
+
+    def _evict(self) -> None:
+        # the newest entry stays even if it alone exceeds the budget: it is about to be served
+        while self._bytes > self.max_bytes and len(self._entries) > 1:
+            name, size = self._entries.popitem(last=False)
+            self._bytes -= size
+            try:
+                os.remove(os.path.join(self.path, name))
+            except FileNotFoundError:
+                pass
+
+    def get(self, id_: str) -> Optional[str]:
+        with self._lock:
+            if id_ not in self._entries:
+                return None
+            self._entries.move_to_end(id_)
+        p = os.path.join(self.path, id_)
+        if not os.path.isfile(p):
+            # evicted by another worker sharing the directory
+            self.discard(id_)
+            return None
+        return p
+
+    def put(self, id_: str, src, mtime: Optional[float] = None) -> str:
+        """Copy the file-like ``src`` into the cache and return the cached path."""
+        fd, tmp = tempfile.mkstemp(prefix=".", dir=self.path)
+        try:
+            with os.fdopen(fd, "wb") as f:
+                shutil.copyfileobj(src, f, COPY_CHUNK)
+            if mtime is not None:
+                os.utime(tmp, (mtime, mtime))
+            size = os.path.getsize(tmp)
+            p = os.path.join(self.path, id_)
+            os.replace(tmp, p)
+        except BaseException:
+            try:
+                os.remove(tmp)
+            except FileNotFoundError:
+                pass
+            raise
+        with self._lock:
+            self._bytes += size - self._entries.pop(id_, 0)
+            self._entries[id_] = size
+            self._evict()
+        return p
+
+    def discard(self, id_: str) -> None:
+        with self._lock:
+            self._bytes -= self._entries.pop(id_, 0)
+        try:
+            os.remove(os.path.join(self.path, id_))
+        except FileNotFoundError:
+            pass
+
+
+class _S3Upload:
+    """Spools to memory, spilling to a temp file past 1 MiB; multipart-uploaded on commit."""
+
+    def __init__(self, store: "S3Store", id_: Optional[str] = None) -> None:
+        self._store = store
+        self._id = id_
+        self._file = tempfile.SpooledTemporaryFile(max_size=1024 * 1024)
+
+    def write(self, chunk: bytes) -> None:
+        self._file.write(chunk)
+
+    def commit(self) -> str:
+        try:
+            self._file.seek(0)
+            return self._store._put_body(self._file, self._id)
+        finally:
+            self._file.close()
+
+    def abort(self) -> None:
+        self._file.close()
+
+
+class S3Store:
+    """``DocumentStore`` on an S3-compatible bucket.
+
+    One boto3 client with a pool of ``max_connections`` keep-alive connections
+    is shared by all threads. Bodies above ``multipart_threshold`` are sent as
+    concurrent multipart uploads. ``list`` pages through ListObjectsV2 and
+    fetches only the metadata objects whose ETag changed, several at a time;
+    the assembled listing is reused for ``list_ttl`` seconds. Rebuilding it
+    costs a walk of the whole bucket, and so does ``usage``: replicas share no
+    state, so there are no running totals to keep.
+    """
+
+    def __init__(
+        self,
+        bucket: str,
+        prefix: str = "",
+        *,
+        endpoint_url: Optional[str] = None,
+        region: Optional[str] = None,
+        max_connections: int = 32,
+        multipart_threshold: int = 8 * 1024 * 1024,
+        cache_dir: Optional[str] = None,
+        cache_max_bytes: int = 0,
+        list_ttl: float = 5.0,
+        client=None,
+    ) -> None:
+        if not bucket:
+            raise ValueError("S3 storage needs a bucket (S3_BUCKET)")
+        if client is None:
+            if boto3 is None:
+                raise RuntimeError("S3 storage needs the 'boto3' package")
+            client = boto3.session.Session().client(
+                "s3",
+                endpoint_url=endpoint_url or None,
+                region_name=region or None,
+                config=Config(max_pool_connections=max_connections, retries={"mode": "standard", "max_attempts": 5}),
+            )
+        self._s3 = client
+        self.bucket = bucket
+        prefix = prefix.strip("/")
+        self.prefix = prefix + "/" if prefix else ""
+        self._transfer = TransferConfig(
+            multipart_threshold=multipart_threshold,
+            multipart_chunksize=multipart_threshold,
+            max_concurrency=max(1, min(8, max_connections)),
+        )
+        self._pool = ThreadPoolExecutor(max_workers=max(1, max_connections), thread_name_prefix="s3-meta")
+        self._cache = DiskCache(cache_dir, cache_max_bytes) if cache_dir and cache_max_bytes > 0 else None
+        self.list_ttl = list_ttl
+        self._lock = threading.Lock()
+        self._meta_cache: Dict[str, Tuple[str, Dict[str, object]]] = {}
+        self._listing: Optional[Tuple[float, List[DocumentInfo]]] = None
+        self._meta_locks = [threading.Lock() for _ in range(64)]
+
+    def _doc_key(self, id_: str) -> str:
+        return f"{self.prefix}docs/{id_}"
+
+    def _meta_key(self, id_: str) -> str:
+        return f"{self.prefix}meta/{id_}.json"
+
+    def exists(self, id_: str) -> bool:
+        if not _valid_id(id_):
+            return False
+        try:
+            self._s3.head_object(Bucket=self.bucket, Key=self._doc_key(id_))
+        except ClientError as e:
+            if _missing(e):
+                return False
+            raise
+        return True
+
+    def find_blob(self, id_: str) -> Optional[Blob]:
+        if not _valid_id(id_):
+            return None
+        if self._cache is not None:
+            p = self._cache.get(id_)
+            if p is not None:
+                try:
+                    st = os.stat(p)
+                    return Blob(size=st.st_size, path=p, mtime=st.st_mtime)
+                except FileNotFoundError:
+                    pass
+        try:
+            obj = self._s3.get_object(Bucket=self.bucket, Key=self._doc_key(id_))
+        except ClientError as e:
+            if _missing(e):
+                return None
+            raise
+        body = obj["Body"]
+        mtime = obj["LastModified"].timestamp()
+        try:
+            if self._cache is not None and obj["ContentLength"] <= self._cache.max_bytes:
+                p = self._cache.put(id_, body, mtime)
+                return Blob(size=obj["ContentLength"], path=p, mtime=mtime)
+            data = body.read()
+        finally:
+            body.close()
+        return Blob(size=len(data), data=data, mtime=mtime)
+
+    def find_id(self, id_: str) -> Optional[bytes]:
+        blob = self.find_blob(id_)
+        if blob is None:
+            return None
+        if blob.data is not None:
+            return blob.data
+        with open(blob.path, "rb") as f:
+            return f.read()
+
+    def _put_body(self, f, id_: Optional[str] = None) -> str:
+        id_ = id_ or uuid.uuid4().hex
+        self._s3.upload_fileobj(f, self.bucket, self._doc_key(id_), Config=self._transfer)
+        self._listing = None
+        return id_
+
+    def create(self, data: bytes) -> str:
+        upload = self.begin_upload()
+        upload.write(data)
+        return upload.commit()
+
+    def begin_upload(self, id_: Optional[str] = None, created: Optional[datetime] = None) -> _S3Upload:
+        # created_at is the object's LastModified, which S3 sets itself
+        return _S3Upload(self, id_)
+
+    def _list_keys(self, sub: str):
+        start = len(self.prefix) + len(sub)
+        paginator = self._s3.get_paginator("list_objects_v2")
+        for page in paginator.paginate(Bucket=self.bucket, Prefix=self.prefix + sub):
+            for obj in page.get("Contents", ()):
+                yield obj["Key"][start:], obj
+
+    def _fetch_meta(self, id_: str) -> Optional[Tuple[str, Dict[str, object]]]:
+        try:
+            obj = self._s3.get_object(Bucket=self.bucket, Key=self._meta_key(id_))
+        except ClientError as e:
+            if _missing(e):
+                return None
+            raise
+        with obj["Body"] as body:
+            raw = body.read()
+        try:
+            meta = json.loads(raw) or {}
+        except ValueError:
+            meta = {}
+        return obj["ETag"], meta
+
+    def _snapshot(self) -> List[DocumentInfo]:
+        docs: Dict[str, DocumentInfo] = {}
+        for id_, obj in self._list_keys("docs/"):
+            created = obj["LastModified"].astimezone(timezone.utc).replace(tzinfo=None, microsecond=0)
+            docs[id_] = DocumentInfo(id=id_, size=obj["Size"], created_at=created)
+        etags = {
+            name[: -len(".json")]: obj["ETag"] for name, obj in self._list_keys("meta/") if name.endswith(".json")
+        }
+        with self._lock:
+            cached = {i: self._meta_cache[i] for i in etags if i in self._meta_cache}
+        stale = [i for i, etag in etags.items() if i in docs and cached.get(i, ("",))[0] != etag]
+        # only changed metadata objects are fetched, many at a time over the pooled connections
+        for id_, got in zip(stale, self._pool.map(self._fetch_meta, stale)):
+            if got is not None:
+                cached[id_] = got
+        with self._lock:
+            self._meta_cache = cached
+        for id_, (_, meta) in cached.items():
+            info = docs.get(id_)
+            if info is None:
+                continue
+            n, k = meta.get("name"), meta.get("key")
+            info.name = n if isinstance(n, str) else None
+            info.key = k if isinstance(k, str) and k else None
+        return list(docs.values())
+
+    def list(self, **opts) -> List[DocumentInfo]:
+        listing = self._listing
+        if listing is None or time.monotonic() - listing[0] > self.list_ttl:
+            listing = (time.monotonic(), self._snapshot())
+            self._listing = listing
+        return paginate(listing[1], **opts)
+
+    def usage(self) -> Tuple[int, int]:
+        items = self.list()
+        return len(items), sum(i.size for i in items)
+
+    def delete(self, id_: str) -> bool:
+        return self.delete_many([id_])[id_]
+
+    def delete_many(self, ids: List[str]) -> Dict[str, bool]:
+        """Check existence concurrently, then remove bodies and metadata with DeleteObjects (1000 keys per call).
+
+        An id whose body the bucket refused to delete (listed in the response's
+        ``Errors``) is reported as not deleted.
+        """
+        valid = [id_ for id_ in dict.fromkeys(ids) if _valid_id(id_)]
+        found = dict(zip(valid, self._pool.map(self.exists, valid)))
+        owner = {}
+        for id_ in valid:
+            if found[id_]:
+                owner[self._meta_key(id_)] = owner[self._doc_key(id_)] = id_
+        keys = list(owner)
+        for i in range(0, len(keys), 1000):
+            resp = self._s3.delete_objects(
+                Bucket=self.bucket,
+                Delete={"Objects": [{"Key": k} for k in keys[i:i + 1000]], "Quiet": True},
+            )
+            for err in resp.get("Errors") or ():
+                key = err.get("Key")
+                id_ = owner.get(key)
+                if id_ is None:
+                    continue
+                logger.warning("s3: could not delete %s: %s %s", key, err.get("Code"), err.get("Message"))
+                if key == self._doc_key(id_):
+                    found[id_] = False
+        gone = [id_ for id_ in valid if found[id_]]
+        for id_ in gone:
+            if self._cache is not None:
+                self._cache.discard(id_)
+            with self._lock:
+                self._meta_cache.pop(id_, None)
+        if gone:
+            self._listing = None
+        return {id_: found.get(id_, False) for id_ in ids}
+
+    def _read_meta(self, id_: str) -> Dict[str, object]:
+        got = self._fetch_meta(id_) if _valid_id(id_) else None
+        return dict(got[1]) if got else {}
+
+    def update_meta(self, id_: str, **fields: Optional[str]) -> bool:
+        fields = _meta_updates(fields)
+        if not _valid_id(id_):
+            return False
+        with self._meta_locks[hash(id_) % len(self._meta_locks)]:
+            if not self.exists(id_):
+                return False
+            meta = self._read_meta(id_)
+            for f, value in fields.items():
+                if value is None:
+                    meta.pop(f, None)
+                else:
+                    meta[f] = value
+            if meta:
+                self._s3.put_object(
+                    Bucket=self.bucket,
+                    Key=self._meta_key(id_),
+                    Body=json.dumps(meta, ensure_ascii=False).encode("utf-8"),
+                    ContentType="application/json",
+                )
+            else:
+                self._s3.delete_object(Bucket=self.bucket, Key=self._meta_key(id_))
+        self._listing = None
+        return True
+
+    def update_meta_many(self, updates: Dict[str, Dict[str, Optional[str]]]) -> Dict[str, bool]:
+        checked = {id_: _meta_updates(fields) for id_, fields in updates.items()}
+        ids = list(checked)
+        done = self._pool.map(lambda id_: self.update_meta(id_, **checked[id_]), ids)
+        return dict(zip(ids, done))
+
+    def set_name(self, id_: str, name: Optional[str]) -> bool:
+        return self.update_meta(id_, name=name)
+
+    def get_name(self, id_: str) -> Optional[str]:
+        n = self._read_meta(id_).get("name")
+        return n if isinstance(n, str) else None
+
+    def set_key(self, id_: str, key: Optional[str]) -> bool:
+        return self.update_meta(id_, key=key)
+
+    def get_key(self, id_: str) -> Optional[str]:
+        k = self._read_meta(id_).get("key")
+        return k if isinstance(k, str) and k else None
@@ -1,32 +1,105 @@
 from __future__ import annotations
 
+import asyncio
+import functools
+import hashlib
 import os
+import tempfile
 import uuid
-from dataclasses import dataclass
-from typing import Protocol, Optional, List, Dict
-from datetime import datetime
+import time
+import sqlite3
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack, contextmanager
+from dataclasses import dataclass, field
+from typing import Protocol, Optional, List, Dict, Iterable, Iterator, Callable, AsyncIterable, Tuple
+from datetime import datetime, timedelta
+import heapq
+import itertools
 import json
+import lzma
+import re
+import struct
+import zlib
+
+try:
+    import fcntl  # type: ignore
+except ImportError:  # pragma: no cover
+    fcntl = None
+
+try:  # optional: zstd codec for at-rest compression
+    import zstandard  # type: ignore
+except ImportError:  # pragma: no cover
+    zstandard = None
 
 
 class DocumentStore(Protocol):
     def find_id(self, id_: str) -> Optional[bytes]:
         ...
 
+    def find_blob(self, id_: str) -> Optional["Blob"]:
+        """Locate a document body without loading it when it lives on disk."""
+        ...
+
+    def exists(self, id_: str) -> bool:
+        """Whether ``id_`` is stored, without reading (or downloading) its body."""
+        ...
+
     def create(self, data: bytes) -> str:
         ...
 
-    def list(self) -> List["DocumentInfo"]:
+    def begin_upload(self, id_: Optional[str] = None, created: Optional[datetime] = None) -> "Upload":
+        """Start an incremental ``create``; the id is assigned on ``commit``.
+
+        An import passes the original ``id_`` and ``created`` time instead
+        (the caller makes sure the id is free).
+        """
+        ...
+
+    def list(
+        self,
+        *,
+        limit: Optional[int] = None,
+        after: Optional["Cursor"] = None,
+        sort: str = "created_at",
+        descending: bool = True,
+        prefix: Optional[str] = None,
+        keyed: Optional[bool] = None,
+    ) -> List["DocumentInfo"]:
+        """Return one page of documents ordered by ``sort`` (ties broken by id).
+
+        ``after`` is the ``(sort value, id)`` of the last item of the previous
+        page (see ``cursor_of``). ``prefix`` matches the start of the id or the
+        name, case-insensitively. ``keyed`` filters on whether a share key is set.
+        """
         ...
 
     def delete(self, id_: str) -> bool:
         ...
 
+    def delete_many(self, ids: List[str]) -> Dict[str, bool]:
+        """Delete several documents in one batch; maps each id to whether it existed."""
+        ...
+
+    def usage(self) -> Tuple[int, int]:
+        """``(document count, total bytes)``; sizes are logical (uncompressed, per reference)."""
+        ...
+
     def set_name(self, id_: str, name: Optional[str]) -> bool:
         ...
 
     def get_name(self, id_: str) -> Optional[str]:
         ...
 
+    def update_meta(self, id_: str, **fields: Optional[str]) -> bool:
+        """Set several ``META_FIELDS`` at once (``None``/``""`` clears one); False if ``id_`` is unknown."""
+        ...
+
+    def update_meta_many(self, updates: Dict[str, Dict[str, Optional[str]]]) -> Dict[str, bool]:
+        """``update_meta`` for many ids in one batch; maps each id to its result."""
+        ...
+
     # Optional: store share key (admin convenience)
     def set_key(self, id_: str, key: Optional[str]) -> bool:
         ...
@@ -35,229 +108,1788 @@ class DocumentStore(Protocol):
         ...
 
 
+class Upload(Protocol):
+    def write(self, chunk: bytes) -> None:
+        ...
+
+    def commit(self) -> str:
+        ...
+
+    def abort(self) -> None:
+        ...
+
+
+class UploadTooLarge(Exception):
+    def __init__(self, limit: int) -> None:
+        super().__init__(f"upload exceeds {limit} bytes")
+        self.limit = limit
+
+
+class StoreFull(Exception):
+    """The memory budget can't fit a new document even after evicting what it may."""
+
+    def __init__(self, limit: int) -> None:
+        super().__init__(f"memory store is full ({limit} bytes)")
+        self.limit = limit
+
+
+class AsyncDocumentStore(Protocol):
+    """Awaitable counterpart of ``DocumentStore`` used by the HTTP routes."""
+
+    async def find_id(self, id_: str) -> Optional[bytes]:
+        ...
+
+    async def find_blob(self, id_: str) -> Optional["Blob"]:
+        ...
+
+    async def exists(self, id_: str) -> bool:
+        ...
+
+    async def create(self, data: bytes) -> str:
+        ...
+
+    async def create_stream(
+        self,
+        chunks: AsyncIterable[bytes],
+        max_bytes: Optional[int] = None,
+        id_: Optional[str] = None,
+        created: Optional[datetime] = None,
+    ) -> str:
+        ...
+
+    async def list(self, **opts) -> List["DocumentInfo"]:
+        ...
+
+    async def delete(self, id_: str) -> bool:
+        ...
+
+    async def usage(self) -> Tuple[int, int]:
+        ...
+
+    async def set_name(self, id_: str, name: Optional[str]) -> bool:
+        ...
+
+    async def get_name(self, id_: str) -> Optional[str]:
+        ...
+
+    async def set_key(self, id_: str, key: Optional[str]) -> bool:
+        ...
+
+    async def get_key(self, id_: str) -> Optional[str]:
+        ...
+
+    async def update_meta(self, id_: str, **fields: Optional[str]) -> bool:
+        ...
+
+    async def delete_many(self, ids: List[str]) -> Dict[str, bool]:
+        ...
+
+    async def update_meta_many(self, updates: Dict[str, Dict[str, Optional[str]]]) -> Dict[str, bool]:
+        ...
+
+
 @dataclass
 class DocumentInfo:
     id: str
     size: int
     created_at: Optional[datetime] = None
     name: Optional[str] = None
+    key: Optional[str] = None
+
+
+@dataclass
+class Blob:
+    """A document body: a file to stream from disk, or bytes already in memory."""
+
+    size: int
+    path: Optional[str] = None
+    data: Optional[bytes] = None
+    mtime: Optional[float] = None
+
+
+SORT_FIELDS = ("created_at", "size", "name")
+# Metadata an admin can edit through ``update_meta``
+META_FIELDS = ("name", "key")
+
+# Keyset pagination position: (sort value, id) of the last item returned.
+Cursor = tuple
+
+
+def _epoch(dt: Optional[datetime]) -> int:
+    return int((dt - datetime(1970, 1, 1)).total_seconds()) if dt else 0
+
+
+def _micros(dt: Optional[datetime]) -> int:
+    return (dt - datetime(1970, 1, 1)) // timedelta(microseconds=1) if dt else 0
+
+
+def sort_value(info: DocumentInfo, sort: str) -> object:
+    if sort == "size":
+        return info.size
+    if sort == "name":
+        return (info.name or "").lower()
+    # Microseconds, so documents created within one second keep their order where the store has it
+    return _micros(info.created_at)
+
+
+def cursor_of(info: DocumentInfo, sort: str) -> Cursor:
+    return (sort_value(info, sort), info.id)
+
+
+def _meta_updates(fields: Dict[str, Optional[str]]) -> Dict[str, Optional[str]]:
+    """Validate ``update_meta`` arguments, normalizing empty strings to None."""
+    for f in fields:
+        if f not in META_FIELDS:
+            raise ValueError(f"unknown field: {f}")
+    return {f: v or None for f, v in fields.items()}
+
+
+def paginate(
+    items: Iterable[DocumentInfo],
+    *,
+    limit: Optional[int] = None,
+    after: Optional[Cursor] = None,
+    sort: str = "created_at",
+    descending: bool = True,
+    prefix: Optional[str] = None,
+    keyed: Optional[bool] = None,
+) -> List[DocumentInfo]:
+    """Filter/sort/page an in-memory collection with ``DocumentStore.list`` semantics."""
+    if sort not in SORT_FIELDS:
+        raise ValueError(f"unsupported sort: {sort}")
+    p = prefix.lower() if prefix else None
+    after_t = tuple(after) if after is not None else None
+
+    def keep(it: DocumentInfo) -> bool:
+        if keyed is not None and bool(it.key) != keyed:
+            return False
+        if p and not (it.id.lower().startswith(p) or (it.name or "").lower().startswith(p)):
+            return False
+        if after_t is not None:
+            pos = cursor_of(it, sort)
+            return pos < after_t if descending else pos > after_t
+        return True
+
+    key = lambda it: cursor_of(it, sort)  # noqa: E731
+    candidates = (it for it in items if keep(it))
+    if limit is not None:
+        pick = heapq.nlargest if descending else heapq.nsmallest
+        return pick(limit, candidates, key=key)
+    return sorted(candidates, key=key, reverse=descending)
+
+
+# At-rest compression. A compressed body starts with a 13-byte header: the magic,
+# a codec byte and the uncompressed size. Anything without the magic is a raw
+# body, so directories written before compression was enabled keep working.
+# 0x89 never starts JSON or an Excalidraw payload (version word 0x00000001);
+# bodies that do begin with the magic are stored behind a "stored" header.
+COMPRESSION_MAGIC = b"\x89EXZ"
+_HEADER = struct.Struct(">4sBQ")
+CODECS = {"stored": 0, "zlib": 1, "lzma": 2, "zstd": 3}
+# Bytes compressed up front to decide whether the rest is worth it
+_SAMPLE_BYTES = 64 * 1024
+_MIN_SAVING = 0.1
+
+
+def compression_codec(name: Optional[str]) -> Optional[str]:
+    """Validate a ``STORAGE_COMPRESSION`` value; ``None``/``""``/``"none"`` disable compression."""
+    if not name or name == "none":
+        return None
+    if name not in CODECS or name == "stored":
+        raise ValueError(f"unsupported compression codec: {name}")
+    if name == "zstd" and zstandard is None:
+        raise ValueError("zstd compression needs the 'zstandard' package")
+    return name
+
+
+class _Stored:
+    def compress(self, data: bytes) -> bytes:
+        return data
+
+    def flush(self) -> bytes:
+        return b""
+
+
+def _compressobj(codec: Optional[str]):
+    if codec == "zlib":
+        return zlib.compressobj(6)
+    if codec == "lzma":
+        return lzma.LZMACompressor()
+    if codec == "zstd":
+        return zstandard.ZstdCompressor(level=9).compressobj()
+    return _Stored()
+
+
+def _decompress(codec_id: int, body) -> bytes:
+    if codec_id == CODECS["stored"]:
+        return bytes(body)
+    if codec_id == CODECS["zlib"]:
+        return zlib.decompress(body)
+    if codec_id == CODECS["lzma"]:
+        return lzma.decompress(body)
+    if codec_id == CODECS["zstd"]:
+        if zstandard is None:
+            raise RuntimeError("found a zstd-compressed body but 'zstandard' is not installed")
+        return zstandard.ZstdDecompressor().decompressobj().decompress(bytes(body))
+    raise ValueError(f"unknown compression codec id {codec_id}")
+
+
+def _compress(codec: Optional[str], data: bytes) -> bytes:
+    c = _compressobj(codec)
+    return c.compress(data) + c.flush()
+
+
+def is_packed(head: bytes) -> bool:
+    return len(head) >= _HEADER.size and head[:4] == COMPRESSION_MAGIC
+
+
+def packed_info(head: bytes) -> Optional[Tuple[str, int]]:
+    """``(codec, uncompressed size)`` from the first bytes of a body, or None if it is raw."""
+    if not is_packed(head):
+        return None
+    _, codec_id, size = _HEADER.unpack_from(head)
+    name = next((k for k, v in CODECS.items() if v == codec_id), str(codec_id))
+    return name, size
+
+
+def pack(data: bytes, codec: Optional[str]) -> bytes:
+    """Compress ``data`` with ``codec`` if that makes it smaller; otherwise return it as is."""
+    if codec is not None:
+        packed = _HEADER.pack(COMPRESSION_MAGIC, CODECS[codec], len(data)) + _compress(codec, data)
+        if len(packed) < len(data):
+            return packed
+    if data[:4] == COMPRESSION_MAGIC:
+        return _HEADER.pack(COMPRESSION_MAGIC, CODECS["stored"], len(data)) + data
+    return data
+
+
+def unpack(data: bytes) -> bytes:
+    """Inverse of ``pack``; raw bodies are returned unchanged."""
+    if not is_packed(data):
+        return data
+    _, codec_id, _ = _HEADER.unpack_from(data)
+    return _decompress(codec_id, memoryview(data)[_HEADER.size:])
+
+
+def pack_stream(src, dst, size: int, codec: Optional[str]) -> bool:
+    """Stream ``size`` bytes from ``src`` into ``dst`` behind a compression header.
+
+    Returns False (leaving ``dst`` to be discarded) when the body should stay
+    raw: no codec, or a sample of it didn't compress, or the result wasn't
+    smaller. Bodies starting with the magic are always wrapped.
+    """
+    sample = src.read(_SAMPLE_BYTES)
+    clash = sample[:4] == COMPRESSION_MAGIC
+    if codec is not None and len(_compress(codec, sample)) > len(sample) * (1 - _MIN_SAVING):
+        codec = None  # encrypted or already compressed; don't spend CPU on the rest
+    if codec is None and not clash:
+        return False
+    comp = _compressobj(codec)
+    dst.write(_HEADER.pack(COMPRESSION_MAGIC, CODECS[codec or "stored"], size))
+    written = _HEADER.size
+    for chunk in itertools.chain((sample,), iter(lambda: src.read(256 * 1024), b"")):
+        out = comp.compress(chunk)
+        dst.write(out)
+        written += len(out)
+    out = comp.flush()
+    dst.write(out)
+    written += len(out)
+    return clash or written < size
+
+
+def pack_file(src_path: str, dst_path: str, codec: Optional[str]) -> bool:
+    """``pack_stream`` between files; ``dst_path`` is fsync'ed when kept and removed otherwise."""
+    size = os.path.getsize(src_path)
+    with open(src_path, "rb") as src, open(dst_path, "wb") as dst:
+        kept = pack_stream(src, dst, size, codec)
+        if kept:
+            dst.flush()
+            os.fsync(dst.fileno())
+    if not kept:
+        os.remove(dst_path)
+    return kept
+
+
+def read_blob_file(path: str) -> Optional[Blob]:
+    """A ``Blob`` for a stored file: streamed from disk if raw, decompressed into memory if packed."""
+    try:
+        f = open(path, "rb")
+    except FileNotFoundError:
+        return None
+    with f:
+        st = os.fstat(f.fileno())
+        head = f.read(_HEADER.size)
+        if not is_packed(head):
+            return Blob(size=st.st_size, path=path, mtime=st.st_mtime)
+        data = unpack(head + f.read())
+    return Blob(size=len(data), data=data, mtime=st.st_mtime)
+
+
+def read_file(path: str) -> bytes:
+    with open(path, "rb") as f:
+        return unpack(f.read())
+
+
+def logical_size(path: str, st: Optional[os.stat_result] = None) -> int:
+    """Uncompressed size of a stored file (its on-disk size when raw)."""
+    st = st or os.stat(path)
+    if st.st_size < _HEADER.size:
+        return st.st_size
+    with open(path, "rb") as f:
+        info = packed_info(f.read(_HEADER.size))
+    return info[1] if info else st.st_size
+
+
+def compression_report(root: str) -> Dict[str, Dict[str, int]]:
+    """Per-codec ``files``/``stored``/``logical`` byte totals for every data file under ``root``.
+
+    Raw files are counted under ``"none"``; databases and temp files are skipped.
+    """
+    out: Dict[str, Dict[str, int]] = {}
+    for dirpath, _, names in os.walk(root):
+        for n in names:
+            if ".sqlite3" in n or n.endswith((".tmp", ".lock")) or n.startswith(".upload-"):
+                continue
+            fp = os.path.join(dirpath, n)
+            try:
+                st = os.stat(fp)
+                with open(fp, "rb") as f:
+                    info = packed_info(f.read(_HEADER.size))
+            except OSError:
+                continue
+            codec, size = info if info else ("none", st.st_size)
+            row = out.setdefault(codec, {"files": 0, "stored": 0, "logical": 0})
+            row["files"] += 1
+            row["stored"] += st.st_size
+            row["logical"] += size
+    return out
+
+
+class _MemoryUpload:
+    def __init__(self, store: "MemoryStore", id_: Optional[str], created: Optional[datetime]) -> None:
+        self._store = store
+        self._id = id_
+        self._created = created
+        self._buf = bytearray()
+
+    def write(self, chunk: bytes) -> None:
+        self._buf += chunk
+
+    def commit(self) -> str:
+        if self._id is None and self._created is None:
+            return self._store.create(bytes(self._buf))
+        id_ = self._id or uuid.uuid4().hex
+        created = self._created or datetime.utcnow()
+        self._store._insert(id_, bytes(self._buf), (created - _EPOCH) // timedelta(microseconds=1))
+        return id_
+
+    def abort(self) -> None:
+        self._buf = bytearray()
+
+
+_HEX_ID = re.compile(r"[0-9a-f]{32}\Z")
+_EPOCH = datetime(1970, 1, 1)
+
+
+def _pack_key(id_: str):
+    """Dict key for an id: 16 raw bytes for the hex uuids ``create`` makes, else the id itself."""
+    return bytes.fromhex(id_) if len(id_) == 32 and _HEX_ID.match(id_) else id_
+
+
+def _unpack_key(k) -> str:
+    return k.hex() if type(k) is bytes else k
+
+
+class _Doc:
+    """One ``MemoryStore`` document; ``created`` is microseconds since the epoch."""
+
+    __slots__ = ("data", "created", "name", "key")
+
+    def __init__(self, data: bytes, created: int) -> None:
+        self.data = data
+        self.created = created
+        self.name: Optional[str] = None
+        self.key: Optional[str] = None
+
+
+class _SortedKeys:
+    """Keys sorted by ``pos(key)``, held in chunks of at most ``2 * load``.
+
+    Inserting or removing a key shifts one chunk rather than the whole
+    sequence, so building an index of a million documents in random order
+    stays linearithmic. Only the keys are stored; positions are computed on
+    demand.
+    """
+
+    def __init__(self, pos: Callable[[object], tuple], load: int = 512) -> None:
+        self._pos = pos
+        self._load = load
+        self._chunks: List[List[object]] = []
+        self._lasts: List[object] = []  # last key of each chunk
+        self._len = 0
+
+    def __len__(self) -> int:
+        return self._len
+
+    def _bisect(self, keys: List[object], pos: tuple, right: bool) -> int:
+        """Index of the first key at ``pos`` or after it (strictly after with ``right``)."""
+        lo, hi = 0, len(keys)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            p = self._pos(keys[mid])
+            if p < pos or (right and p == pos):
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def _locate(self, pos: tuple, right: bool = False) -> Tuple[int, int]:
+        ci = self._bisect(self._lasts, pos, right)
+        if ci == len(self._chunks):
+            return ci, 0
+        return ci, self._bisect(self._chunks[ci], pos, right)
+
+    def add(self, k) -> None:
+        self._len += 1
+        if not self._chunks:
+            self._chunks.append([k])
+            self._lasts.append(k)
+            return
+        ci, j = self._locate(self._pos(k))
+        if ci == len(self._chunks):
+            ci -= 1  # past the end: the usual case for created_at
+            j = len(self._chunks[ci])
+        chunk = self._chunks[ci]
+        chunk.insert(j, k)
+        self._lasts[ci] = chunk[-1]
+        if len(chunk) > 2 * self._load:
+            half = self._load
+            self._chunks[ci:ci + 1] = [chunk[:half], chunk[half:]]
+            self._lasts[ci:ci + 1] = [chunk[half - 1], chunk[-1]]
+
+    def remove(self, k) -> None:
+        """Drop ``k``; its position must not have changed since it was added."""
+        ci, j = self._locate(self._pos(k))
+        chunk = self._chunks[ci]
+        del chunk[j]
+        self._len -= 1
+        if chunk:
+            self._lasts[ci] = chunk[-1]
+        else:
+            del self._chunks[ci]
+            del self._lasts[ci]
+
+    def walk(self, after: Optional[tuple] = None, descending: bool = False) -> Iterator[object]:
+        """Keys in order (reversed with ``descending``), starting just past ``after``."""
+        chunks = self._chunks
+        if descending:
+            ci, j = self._locate(after) if after is not None else (len(chunks), 0)
+            if ci < len(chunks):
+                yield from reversed(chunks[ci][:j])
+            for c in range(ci - 1, -1, -1):
+                yield from reversed(chunks[c])
+        else:
+            ci, j = self._locate(after, right=True) if after is not None else (0, 0)
+            if ci < len(chunks):
+                yield from chunks[ci][j:]
+            for c in range(ci + 1, len(chunks)):
+                yield from chunks[c]
 
 
 class MemoryStore:
-    def __init__(self) -> None:
-        self._data: Dict[str, bytes] = {}
-        self._meta: Dict[str, datetime] = {}
-        self._names: Dict[str, str] = {}
-        self._keys: Dict[str, str] = {}
+    """Documents in process memory.
+
+    One slotted ``_Doc`` per document, keyed by the packed id, plus one
+    ``_SortedKeys`` index per sort field, ordered like that field's cursors
+    (``(created µs, id)``, ``(size, id)``, ``(lowercased name, id)``). A page
+    is a walk from the cursor, so its cost doesn't grow with the store (beyond
+    documents skipped by ``prefix``/``keyed`` filters). ``max_bytes`` caps the
+    total body size: a create that would pass it evicts the oldest documents
+    without a share key, and raises ``StoreFull`` when that can't make room.
+    """
+
+    def __init__(self, max_bytes: int = 0) -> None:
+        self.max_bytes = max_bytes
+        self._docs: Dict[object, _Doc] = {}
+        self._sorted = {sort: _SortedKeys(functools.partial(self._pos, sort=sort)) for sort in SORT_FIELDS}
+        self._order = self._sorted["created_at"]
+        self._bytes = 0
+        self.evictions = 0
+
+    def _pos(self, k, sort: str = "created_at") -> tuple:
+        doc = self._docs[k]
+        if sort == "size":
+            return len(doc.data), _unpack_key(k)
+        if sort == "name":
+            return (doc.name or "").lower(), _unpack_key(k)
+        return doc.created, _unpack_key(k)
+
+    def _put(self, id_: str, data: bytes, created: int) -> None:
+        """Store a document without checking the budget (log replay)."""
+        k = _pack_key(id_)
+        if k in self._docs:
+            self._drop(k)
+        self._docs[k] = _Doc(data, created)
+        self._bytes += len(data)
+        for index in self._sorted.values():
+            index.add(k)
+
+    def _drop(self, k) -> None:
+        for index in self._sorted.values():
+            index.remove(k)
+        self._bytes -= len(self._docs.pop(k).data)
+
+    def _make_room(self, incoming: int) -> None:
+        """Evict the oldest unkeyed documents until ``incoming`` more bytes fit ``max_bytes``."""
+        if not self.max_bytes or self._bytes + incoming <= self.max_bytes:
+            return
+        need = self._bytes + incoming - self.max_bytes
+        victims = []
+        if incoming <= self.max_bytes:
+            for k in self._order.walk():
+                doc = self._docs[k]
+                if doc.key is None:
+                    victims.append(k)
+                    need -= len(doc.data)
+                    if need <= 0:
+                        break
+        if need > 0:
+            raise StoreFull(self.max_bytes)
+        for k in victims:
+            self._remove(_unpack_key(k))
+        self.evictions += len(victims)
+
+    # Every mutation goes through _insert/_remove/_set_meta, so a subclass can log them
+
+    def _insert(self, id_: str, data: bytes, created: int) -> None:
+        self._make_room(len(data))
+        self._put(id_, data, created)
+
+    def _remove(self, id_: str) -> bool:
+        k = _pack_key(id_)
+        if k not in self._docs:
+            return False
+        self._drop(k)
+        return True
+
+    def _set_meta(self, id_: str, fields: Dict[str, Optional[str]]) -> bool:
+        doc = self._docs.get(_pack_key(id_))
+        if doc is None:
+            return False
+        for f, value in fields.items():
+            if f == "name":
+                # Re-filed in the name index when its sort position changes
+                moves = (value or "").lower() != (doc.name or "").lower()
+                if moves:
+                    self._sorted["name"].remove(_pack_key(id_))
+                doc.name = value
+                if moves:
+                    self._sorted["name"].add(_pack_key(id_))
+            else:
+                doc.key = value
+        return True
+
+    def _records(self) -> List[Tuple[str, bytes, int, Optional[str], Optional[str]]]:
+        """A point-in-time copy of every document, oldest first: (id, data, created µs, name, key)."""
+        docs = self._docs
+        keys = list(self._order.walk())
+        return [(_unpack_key(k), d.data, d.created, d.name, d.key) for k, d in ((k, docs[k]) for k in keys)]
+
+    @staticmethod
+    def _info(k, doc: _Doc) -> DocumentInfo:
+        return DocumentInfo(
+            id=_unpack_key(k),
+            size=len(doc.data),
+            created_at=_EPOCH + timedelta(microseconds=doc.created),
+            name=doc.name,
+            key=doc.key,
+        )
 
     def find_id(self, id_: str) -> Optional[bytes]:
-        return self._data.get(id_)
+        doc = self._docs.get(_pack_key(id_))
+        return doc.data if doc is not None else None
+
+    def find_blob(self, id_: str) -> Optional[Blob]:
+        doc = self._docs.get(_pack_key(id_))
+        if doc is None:
+            return None
+        return Blob(size=len(doc.data), data=doc.data, mtime=doc.created // 1_000_000)
+
+    def exists(self, id_: str) -> bool:
+        return _pack_key(id_) in self._docs
 
     def create(self, data: bytes) -> str:
         id_ = uuid.uuid4().hex
-        self._data[id_] = data
-        self._meta[id_] = datetime.utcnow()
+        self._insert(id_, data, time.time_ns() // 1000)
         return id_
 
-    def list(self) -> List[DocumentInfo]:
-        items: List[DocumentInfo] = []
-        for k, v in self._data.items():
-            items.append(DocumentInfo(id=k, size=len(v), created_at=self._meta.get(k), name=self._names.get(k)))
-        # sort by created_at desc when available
-        items.sort(key=lambda x: x.created_at or datetime.min, reverse=True)
-        return items
+    def begin_upload(self, id_: Optional[str] = None, created: Optional[datetime] = None) -> _MemoryUpload:
+        return _MemoryUpload(self, id_, created)
+
+    def list(
+        self,
+        *,
+        limit: Optional[int] = None,
+        after: Optional[Cursor] = None,
+        sort: str = "created_at",
+        descending: bool = True,
+        prefix: Optional[str] = None,
+        keyed: Optional[bool] = None,
+    ) -> List[DocumentInfo]:
+        if sort not in SORT_FIELDS:
+            raise ValueError(f"unsupported sort: {sort}")
+        if limit is not None and limit <= 0:
+            return []
+        p = prefix.lower() if prefix else None
+
+        def keep(k, doc: _Doc) -> bool:
+            if keyed is not None and bool(doc.key) != keyed:
+                return False
+            if p and not (_unpack_key(k).lower().startswith(p) or (doc.name or "").lower().startswith(p)):
+                return False
+            return True
+
+        docs = self._docs
+        out: List[DocumentInfo] = []
+        for k in self._sorted[sort].walk(tuple(after) if after is not None else None, descending):
+            doc = docs[k]
+            if keep(k, doc):
+                out.append(self._info(k, doc))
+                if limit is not None and len(out) >= limit:
+                    break
+        return out
+
+    def usage(self) -> Tuple[int, int]:
+        return len(self._docs), self._bytes
 
     def delete(self, id_: str) -> bool:
-        existed = id_ in self._data
-        self._data.pop(id_, None)
-        self._meta.pop(id_, None)
-        self._names.pop(id_, None)
-        self._keys.pop(id_, None)
-        return existed
+        return self._remove(id_)
+
+    def delete_many(self, ids: List[str]) -> Dict[str, bool]:
+        return {id_: self._remove(id_) for id_ in ids}
+
+    def update_meta(self, id_: str, **fields: Optional[str]) -> bool:
+        return self._set_meta(id_, _meta_updates(fields))
+
+    def update_meta_many(self, updates: Dict[str, Dict[str, Optional[str]]]) -> Dict[str, bool]:
+        checked = {id_: _meta_updates(fields) for id_, fields in updates.items()}
+        return {id_: self._set_meta(id_, fields) for id_, fields in checked.items()}
 
     def set_name(self, id_: str, name: Optional[str]) -> bool:
-        if id_ not in self._data:
-            return False
-        if name is None or name == "":
-            self._names.pop(id_, None)
-        else:
-            self._names[id_] = name
-        return True
+        return self.update_meta(id_, name=name)
 
     def get_name(self, id_: str) -> Optional[str]:
-        return self._names.get(id_)
+        doc = self._docs.get(_pack_key(id_))
+        return doc.name if doc is not None else None
 
     def set_key(self, id_: str, key: Optional[str]) -> bool:
-        if id_ not in self._data:
-            return False
-        if key is None or key == "":
-            self._keys.pop(id_, None)
-        else:
-            self._keys[id_] = key
-        return True
+        return self.update_meta(id_, key=key)
 
     def get_key(self, id_: str) -> Optional[str]:
-        return self._keys.get(id_)
+        doc = self._docs.get(_pack_key(id_))
+        return doc.key if doc is not None else None
+
+
+class MetaIndex:
+    """SQLite index of document metadata (id, size, created_at, name, key).
+
+    The blobs and ``.meta.json`` sidecars on disk stay authoritative; the index
+    is a derived cache that lets listing run as a single query instead of a
+    stat + JSON parse per file. It is rebuilt from disk when missing.
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        # Re-entrant so index calls can run inside ``transaction()``
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS documents ("
+            " id TEXT PRIMARY KEY,"
+            " size INTEGER NOT NULL,"
+            " created_at INTEGER,"
+            " name TEXT,"
+            " key TEXT,"
+            " blob TEXT)"
+        )
+        if "blob" not in {r[1] for r in self._conn.execute("PRAGMA table_info(documents)")}:
+            self._conn.execute("ALTER TABLE documents ADD COLUMN blob TEXT")
+        # Content-addressed mode: blob reference counts are COUNT(*) over this index
+        self._conn.execute("CREATE INDEX IF NOT EXISTS documents_by_blob ON documents (blob)")
+        # One index per sort order so paged listing is a range scan
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS documents_by_created ON documents (COALESCE(created_at, 0), id)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS documents_by_size ON documents (size, id)")
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS documents_by_name ON documents (LOWER(COALESCE(name, '')), id)"
+        )
+        self._conn.execute("CREATE TABLE IF NOT EXISTS index_state (k TEXT PRIMARY KEY, v TEXT)")
+
+    @staticmethod
+    def _row_to_info(row: tuple) -> DocumentInfo:
+        id_, size, created_at, name, key = row
+        return DocumentInfo(
+            id=id_,
+            size=size,
+            created_at=datetime.utcfromtimestamp(created_at) if created_at is not None else None,
+            name=name,
+            key=key,
+        )
+
+    @staticmethod
+    def _info_to_row(info: DocumentInfo, blob: Optional[str] = None) -> tuple:
+        ts = _epoch(info.created_at) if info.created_at else None
+        return (info.id, info.size, ts, info.name, info.key, blob)
+
+    _INSERT = "INSERT OR REPLACE INTO documents (id, size, created_at, name, key, blob) VALUES (?, ?, ?, ?, ?, ?)"
+
+    def ensure_built(self, scan: Callable[[], Iterable[Tuple[DocumentInfo, Optional[str]]]]) -> None:
+        """Populate the index from ``scan()`` unless a previous run already did.
+
+        ``scan`` yields ``(info, blob)`` pairs; ``blob`` is the content hash for
+        documents stored by reference, else None.
+        """
+        with self._lock:
+            if self._conn.execute("SELECT 1 FROM index_state WHERE k = 'built'").fetchone():
+                return
+            # IMMEDIATE takes the write lock up front so concurrent workers
+            # starting on the same directory don't both rebuild.
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                if not self._conn.execute("SELECT 1 FROM index_state WHERE k = 'built'").fetchone():
+                    self._conn.execute("DELETE FROM documents")
+                    self._conn.executemany(
+                        self._INSERT,
+                        (self._info_to_row(info, blob) for info, blob in scan()),
+                    )
+                    self._conn.execute("INSERT OR REPLACE INTO index_state VALUES ('built', ?)", (str(int(time.time())),))
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM index_state WHERE k = 'built'")
+
+    @contextmanager
+    def transaction(self) -> Iterator["MetaIndex"]:
+        """Serialize a multi-step update across threads and processes."""
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield self
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+
+    def put(self, info: DocumentInfo, blob: Optional[str] = None) -> None:
+        with self._lock:
+            self._conn.execute(self._INSERT, self._info_to_row(info, blob))
+
+    def blob_of(self, id_: str) -> Optional[str]:
+        with self._lock:
+            row = self._conn.execute("SELECT blob FROM documents WHERE id = ?", (id_,)).fetchone()
+        return row[0] if row else None
+
+    def blob_refs(self, blob: str) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM documents WHERE blob = ?", (blob,)).fetchone()[0]
+
+    def remove(self, id_: str) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM documents WHERE id = ?", (id_,))
+
+    def set_fields(self, id_: str, fields: Dict[str, Optional[str]]) -> None:
+        """Update several ``META_FIELDS`` of one row in a single statement."""
+        if not fields:
+            return
+        for f in fields:
+            if f not in META_FIELDS:
+                raise ValueError(f"unknown field: {f}")
+        assignments = ", ".join(f"{f} = ?" for f in fields)
+        with self._lock:
+            self._conn.execute(f"UPDATE documents SET {assignments} WHERE id = ?", (*fields.values(), id_))
+
+    def usage(self) -> Tuple[int, int]:
+        with self._lock:
+            count, total = self._conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM documents").fetchone()
+        return count, total
+
+    def get(self, id_: str) -> Optional[DocumentInfo]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT id, size, created_at, name, key FROM documents WHERE id = ?", (id_,)
+            ).fetchone()
+        return self._row_to_info(row) if row else None
+
+    _SORT_EXPR = {
+        "created_at": "COALESCE(created_at, 0)",
+        "size": "size",
+        "name": "LOWER(COALESCE(name, ''))",
+    }
+
+    def query(
+        self,
+        *,
+        limit: Optional[int] = None,
+        after: Optional[Cursor] = None,
+        sort: str = "created_at",
+        descending: bool = True,
+        prefix: Optional[str] = None,
+        keyed: Optional[bool] = None,
+    ) -> List[DocumentInfo]:
+        if sort not in self._SORT_EXPR:
+            raise ValueError(f"unsupported sort: {sort}")
+        expr = self._SORT_EXPR[sort]
+        where: List[str] = []
+        args: List[object] = []
+        if keyed is not None:
+            where.append("key IS NOT NULL" if keyed else "key IS NULL")
+        if prefix:
+            like = prefix.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+            where.append("(id LIKE ? ESCAPE '\\' OR name LIKE ? ESCAPE '\\')")
+            args += [like, like]
+        if after is not None:
+            where.append(f"({expr}, id) {'<' if descending else '>'} (?, ?)")
+            value, id_ = after
+            if sort == "created_at":
+                value = value // 1_000_000  # the index keeps whole seconds; cursors are in microseconds
+            args += [value, id_]
+        direction = "DESC" if descending else "ASC"
+        sql = "SELECT id, size, created_at, name, key FROM documents"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += f" ORDER BY {expr} {direction}, id {direction}"
+        if limit is not None:
+            sql += " LIMIT ?"
+            args.append(int(limit))
+        with self._lock:
+            rows = self._conn.execute(sql, args).fetchall()
+        return [self._row_to_info(r) for r in rows]
+
+
+class _FileUpload:
+    """Writes into a hidden temp file in the store directory, then renames it into place."""
+
+    def __init__(self, store: "FilesystemStore", id_: Optional[str] = None, created: Optional[datetime] = None) -> None:
+        self._store = store
+        self._id = id_
+        self._created = created
+        fd, self._tmp = tempfile.mkstemp(prefix=".upload-", dir=store.base_path)
+        self._file = os.fdopen(fd, "wb")
+        self._size = 0
+        self._head = b""
+
+    def write(self, chunk: bytes) -> None:
+        self._file.write(chunk)
+        self._size += len(chunk)
+        if len(self._head) < len(COMPRESSION_MAGIC):
+            self._head = (self._head + chunk)[: len(COMPRESSION_MAGIC)]
+
+    def _finish(self) -> None:
+        self._file.flush()
+        codec = self._store.compression
+        if codec is not None or self._head == COMPRESSION_MAGIC:
+            packed = self._tmp + ".z"
+            if pack_file(self._tmp, packed, codec):
+                self._file.close()
+                os.replace(packed, self._tmp)
+                return
+        os.fsync(self._file.fileno())
+        self._file.close()
+
+    def commit(self) -> str:
+        self._finish()
+        id_ = self._id or uuid.uuid4().hex
+        ts = _epoch(self._created) if self._created else int(time.time())
+        dest = self._store._path(id_)
+        os.makedirs(os.path.dirname(dest), exist_ok=True)
+        if self._created:
+            # A rebuilt index takes created_at from the file's mtime
+            os.utime(self._tmp, (ts, ts))
+        os.replace(self._tmp, dest)
+        self._store._index.put(DocumentInfo(id=id_, size=self._size, created_at=datetime.utcfromtimestamp(ts)))
+        return id_
+
+    def abort(self) -> None:
+        self._file.close()
+        try:
+            os.remove(self._tmp)
+        except FileNotFoundError:
+            pass
+
+
+META_SUFFIX = ".meta.json"
 
 
 @dataclass
 class FilesystemStore:
+    """Documents as files under ``base_path``, with ``<id>.meta.json`` sidecars.
+
+    New documents go to a sharded layout (``ab/cd/<id>`` for ``shard_depth=2``)
+    so no directory grows past a few hundred entries; files in the legacy flat
+    layout are still found, and ``migrate_layout`` moves them over in place.
+
+    With ``compression`` set, bodies and sidecars are written compressed when
+    that saves space (see ``pack``); reads handle both forms.
+    """
+
     base_path: str
+    index_name: str = ".index.sqlite3"
+    shard_depth: int = 2
+    compression: Optional[str] = None
+    _index: MetaIndex = field(init=False, repr=False)
+    # Striped per-document locks serializing sidecar read-modify-writes; each stripe
+    # also has a lock file under .locks/ so other worker processes are held off too
+    _meta_locks: List[threading.Lock] = field(
+        init=False, repr=False, default_factory=lambda: [threading.Lock() for _ in range(64)]
+    )
 
     def __post_init__(self) -> None:
-        os.makedirs(self.base_path, exist_ok=True)
+        self.compression = compression_codec(self.compression)
+        os.makedirs(os.path.join(self.base_path, ".locks"), exist_ok=True)
+        self._index = MetaIndex(os.path.join(self.base_path, self.index_name))
+        self._index.ensure_built(self._scan)
+        self._remove_stale_uploads()
+
+    def _remove_stale_uploads(self, max_age: float = 3600) -> None:
+        # Leftovers from a crash mid-upload; recent ones may belong to another worker
+        cutoff = time.time() - max_age
+        for name in os.listdir(self.base_path):
+            if not name.startswith(".upload-"):
+                continue
+            fp = os.path.join(self.base_path, name)
+            try:
+                if os.stat(fp).st_mtime < cutoff:
+                    os.remove(fp)
+            except FileNotFoundError:
+                pass
 
     def _path(self, id_: str) -> str:
+        """Where ``id_`` is written: its shard directory (flat for short legacy ids)."""
         # keep ID as filename; no extension required
+        depth = self.shard_depth
+        if depth <= 0 or len(id_) <= 2 * depth:
+            return os.path.join(self.base_path, id_)
+        shards = [id_[2 * i:2 * i + 2] for i in range(depth)]
+        return os.path.join(self.base_path, *shards, id_)
+
+    def _legacy_path(self, id_: str) -> str:
         return os.path.join(self.base_path, id_)
 
-    def find_id(self, id_: str) -> Optional[bytes]:
+    def _find_path(self, id_: str) -> Optional[str]:
+        """Locate an existing document file in either layout."""
+        if id_.startswith(".") or os.sep in id_:
+            return None
         p = self._path(id_)
-        if not os.path.exists(p):
+        if os.path.isfile(p):
+            return p
+        legacy = self._legacy_path(id_)
+        if legacy != p:
+            if os.path.isfile(legacy):
+                return legacy
+            # migrate_layout may have moved it between the two checks
+            if os.path.isfile(p):
+                return p
+        return None
+
+    def find_id(self, id_: str) -> Optional[bytes]:
+        p = self._find_path(id_)
+        if p is None:
+            return None
+        return read_file(p)
+
+    def find_blob(self, id_: str) -> Optional[Blob]:
+        p = self._find_path(id_)
+        if p is None:
             return None
-        with open(p, "rb") as f:
-            return f.read()
+        return read_blob_file(p)
 
     def create(self, data: bytes) -> str:
-        id_ = uuid.uuid4().hex
-        p = self._path(id_)
-        with open(p, "wb") as f:
-            f.write(data)
-        return id_
+        upload = self.begin_upload()
+        try:
+            upload.write(data)
+            return upload.commit()
+        except BaseException:
+            upload.abort()
+            raise
+
+    def begin_upload(self, id_: Optional[str] = None, created: Optional[datetime] = None) -> "_FileUpload":
+        return _FileUpload(self, id_, created)
 
     def _meta_path(self, id_: str) -> str:
-        return self._path(f"{id_}.meta.json")
+        p = self._path(id_) + META_SUFFIX
+        legacy = self._legacy_path(id_)
+        if legacy + META_SUFFIX != p and not os.path.exists(p):
+            # sidecars stay next to legacy documents until they are migrated
+            if os.path.exists(legacy + META_SUFFIX) or os.path.isfile(legacy):
+                return legacy + META_SUFFIX
+        return p
+
+    def _read_meta(self, id_: str) -> Dict[str, object]:
+        mp = self._meta_path(id_)
+        if os.path.isfile(mp):
+            try:
+                return json.loads(read_file(mp)) or {}
+            except Exception:
+                return {}
+        return {}
 
-    def list(self) -> List[DocumentInfo]:
-        items: List[DocumentInfo] = []
+    def _write_meta(self, id_: str, meta: Dict[str, object]) -> None:
+        """Replace the sidecar atomically, or remove it when ``meta`` is empty.
+
+        The new content is fsync'ed in a uniquely named temp file before the
+        rename, so a crash or a concurrent writer never leaves a torn sidecar.
+        """
+        mp = self._meta_path(id_)
+        if not meta:
+            try:
+                os.remove(mp)
+            except FileNotFoundError:
+                pass
+            return
+        dir_ = os.path.dirname(mp)
+        os.makedirs(dir_, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(prefix="." + os.path.basename(mp) + ".", suffix=".tmp", dir=dir_)
         try:
-            for name in os.listdir(self.base_path):
-                fp = self._path(name)
-                if not os.path.isfile(fp):
-                    continue
-                # Skip sidecar metadata files
-                if name.endswith(".meta.json"):
+            with os.fdopen(fd, "wb") as mf:
+                mf.write(pack(json.dumps(meta, ensure_ascii=False).encode("utf-8"), self.compression))
+                mf.flush()
+                os.fsync(mf.fileno())
+            os.replace(tmp, mp)
+        except BaseException:
+            try:
+                os.remove(tmp)
+            except FileNotFoundError:
+                pass
+            raise
+
+    def exists(self, id_: str) -> bool:
+        return self._find_path(id_) is not None
+
+    def _walk(self) -> Iterator[Tuple[str, str]]:
+        """Yield ``(name, path)`` for every regular file in the flat and sharded layouts."""
+        def visit(dir_: str, depth: int) -> Iterator[Tuple[str, str]]:
+            try:
+                entries = list(os.scandir(dir_))
+            except FileNotFoundError:
+                return
+            for e in entries:
+                if e.name.startswith("."):
                     continue
-                st = os.stat(fp)
-                info = DocumentInfo(
-                    id=name,
-                    size=st.st_size,
-                    created_at=datetime.utcfromtimestamp(int(st.st_mtime)),
-                )
-                # try read name from meta
-                meta_file = self._meta_path(name)
-                if os.path.isfile(meta_file):
-                    try:
-                        with open(meta_file, "r", encoding="utf-8") as mf:
-                            meta = json.load(mf)
-                            info.name = meta.get("name")
-                    except Exception:
-                        pass
-                items.append(info)
-        except FileNotFoundError:
-            return []
-        items.sort(key=lambda x: x.created_at or datetime.min, reverse=True)
-        return items
+                if e.is_file():
+                    yield e.name, e.path
+                elif depth < self.shard_depth and len(e.name) == 2 and e.is_dir():
+                    yield from visit(e.path, depth + 1)
 
-    def delete(self, id_: str) -> bool:
-        p = self._path(id_)
-        if os.path.exists(p) and os.path.isfile(p):
-            os.remove(p)
-            # remove meta too
-            mp = self._meta_path(id_)
-            if os.path.isfile(mp):
-                try:
-                    os.remove(mp)
-                except Exception:
-                    pass
-            return True
-        return False
+        yield from visit(self.base_path, 0)
 
-    def set_name(self, id_: str, name: Optional[str]) -> bool:
-        p = self._path(id_)
-        if not (os.path.exists(p) and os.path.isfile(p)):
+    def _scan(self) -> Iterator[Tuple[DocumentInfo, Optional[str]]]:
+        """Walk the data directory; only used to (re)build the index."""
+        for name, fp in self._walk():
+            # Skip sidecar metadata files and databases kept in the same directory
+            if name.endswith(META_SUFFIX) or name.endswith(".tmp") or ".sqlite3" in name:
+                continue
+            st = os.stat(fp)
+            meta = self._read_meta(name)
+            n = meta.get("name")
+            k = meta.get("key")
+            info = DocumentInfo(
+                id=name,
+                size=logical_size(fp, st),
+                created_at=datetime.utcfromtimestamp(int(st.st_mtime)),
+                name=n if isinstance(n, str) else None,
+                key=k if isinstance(k, str) and k else None,
+            )
+            yield info, None
+
+    def reindex(self) -> None:
+        """Drop and rebuild the metadata index from the files on disk."""
+        self._index.invalidate()
+        self._index.ensure_built(self._scan)
+
+    def migrate_layout(self, dry_run: bool = False) -> int:
+        """Move flat-layout documents and sidecars into their shard directories.
+
+        Safe to run while serving: readers look in both places, and each file
+        is moved with a single rename. Returns the number of files moved.
+        """
+        moved = 0
+        for name in os.listdir(self.base_path):
+            src = self._legacy_path(name)
+            if name.startswith(".") or not os.path.isfile(src):
+                continue
+            id_ = name[: -len(META_SUFFIX)] if name.endswith(META_SUFFIX) else name
+            dest = self._path(id_) + (META_SUFFIX if name.endswith(META_SUFFIX) else "")
+            if dest == src:
+                continue
+            moved += 1
+            if dry_run:
+                continue
+            os.makedirs(os.path.dirname(dest), exist_ok=True)
+            os.replace(src, dest)
+        return moved
+
+    def list(self, **opts) -> List[DocumentInfo]:
+        return self._index.query(**opts)
+
+    def usage(self) -> Tuple[int, int]:
+        return self._index.usage()
+
+    def _delete_locked(self, id_: str, index: MetaIndex) -> bool:
+        """Remove one document; the caller holds an index transaction."""
+        p = self._find_path(id_)
+        if p is None:
             return False
+        os.remove(p)
+        # remove meta too
         mp = self._meta_path(id_)
-        # read current meta
-        meta: Dict[str, object] = {}
         if os.path.isfile(mp):
             try:
-                with open(mp, "r", encoding="utf-8") as mf:
-                    meta = json.load(mf) or {}
+                os.remove(mp)
             except Exception:
-                meta = {}
-        # update name
-        if name is None or name == "":
-            meta.pop("name", None)
-        else:
-            meta["name"] = name
-        # write or delete file if empty
-        try:
-            if meta:
-                with open(mp, "w", encoding="utf-8") as mf:
-                    json.dump(meta, mf, ensure_ascii=False)
-            else:
-                if os.path.isfile(mp):
-                    os.remove(mp)
-            return True
-        except Exception:
-            return False
+                pass
+        index.remove(id_)
+        return True
+
+    def delete(self, id_: str) -> bool:
+        return self.delete_many([id_])[id_]
+
+    def delete_many(self, ids: List[str]) -> Dict[str, bool]:
+        """Delete files one by one; all index rows go in a single transaction.
+
+        Holds the ids' metadata locks so a concurrent ``update_meta`` can't
+        write a sidecar back after it was removed.
+        """
+        results: Dict[str, bool] = {}
+        with self._meta_locks_for(ids), self._index.transaction() as index:
+            for id_ in ids:
+                results[id_] = self._delete_locked(id_, index)
+        return results
+
+    @contextmanager
+    def _meta_locks_for(self, ids: Iterable[str]) -> Iterator[None]:
+        # acquire stripes in a fixed order so concurrent batches can't deadlock; crc32
+        # rather than hash() so every worker process maps an id to the same stripe
+        stripes = sorted({zlib.crc32(id_.encode()) % len(self._meta_locks) for id_ in ids})
+        with ExitStack() as stack:
+            for i in stripes:
+                stack.enter_context(self._meta_locks[i])
+                if fcntl is not None:
+                    lock = stack.enter_context(open(os.path.join(self.base_path, ".locks", f"meta-{i}.lock"), "a"))
+                    fcntl.flock(lock, fcntl.LOCK_EX)  # released when the file closes
+            yield
+
+    def update_meta(self, id_: str, **fields: Optional[str]) -> bool:
+        return self.update_meta_many({id_: fields})[id_]
+
+    def update_meta_many(self, updates: Dict[str, Dict[str, Optional[str]]]) -> Dict[str, bool]:
+        """Read-modify-write each sidecar once under its document's lock, then update the index.
+
+        The lock is held across processes, so workers sharing ``base_path``
+        can't interleave the sidecar and index writes for one document. Index
+        rows for the whole batch are written in one transaction.
+        """
+        checked = {id_: _meta_updates(fields) for id_, fields in updates.items()}
+        results: Dict[str, bool] = {}
+        written: Dict[str, Dict[str, Optional[str]]] = {}
+        with self._meta_locks_for(checked):
+            for id_, fields in checked.items():
+                results[id_] = False
+                if not self.exists(id_):
+                    continue
+                meta = self._read_meta(id_)
+                for f, value in fields.items():
+                    if value is None:
+                        meta.pop(f, None)
+                    else:
+                        meta[f] = value
+                try:
+                    self._write_meta(id_, meta)
+                except OSError:
+                    continue
+                written[id_] = fields
+                results[id_] = True
+            if written:
+                with self._index.transaction() as index:
+                    for id_, fields in written.items():
+                        index.set_fields(id_, fields)
+        return results
+
+    def set_name(self, id_: str, name: Optional[str]) -> bool:
+        return self.update_meta(id_, name=name)
 
     def get_name(self, id_: str) -> Optional[str]:
-        mp = self._meta_path(id_)
-        if os.path.isfile(mp):
-            try:
-                with open(mp, "r", encoding="utf-8") as mf:
-                    meta = json.load(mf)
-                    n = meta.get("name")
-                    if isinstance(n, str):
-                        return n
-            except Exception:
-                return None
-        return None
+        info = self._index.get(id_)
+        return info.name if info else None
 
     def set_key(self, id_: str, key: Optional[str]) -> bool:
-        p = self._path(id_)
-        if not (os.path.exists(p) and os.path.isfile(p)):
-            return False
-        mp = self._meta_path(id_)
-        meta: Dict[str, object] = {}
-        if os.path.isfile(mp):
+        return self.update_meta(id_, key=key)
+
+    def get_key(self, id_: str) -> Optional[str]:
+        info = self._index.get(id_)
+        return info.key if info else None
+
+
+class _CasUpload(_FileUpload):
+    """Upload that hashes while writing so the blob can be stored by content."""
+
+    def __init__(self, store: "ContentAddressedStore", id_: Optional[str] = None, created: Optional[datetime] = None) -> None:
+        super().__init__(store, id_, created)
+        self._hash = hashlib.sha256()
+
+    def write(self, chunk: bytes) -> None:
+        super().write(chunk)
+        self._hash.update(chunk)
+
+    def commit(self) -> str:
+        self._finish()
+        return self._store._commit_blob(self._tmp, self._size, self._hash.hexdigest(), self._id, self._created)
+
+
+@dataclass
+class ContentAddressedStore(FilesystemStore):
+    """FilesystemStore that keeps each distinct body once under ``blobs/ab/cd/<sha256>``.
+
+    A document is its sidecar (``{"blob": <sha256>, "created_at": ...}``) plus an
+    index row pointing at the blob; a blob is removed when the last document
+    referencing it is deleted. Plain per-id files from the non-deduplicated
+    layout are still read, listed and deleted as before.
+    """
+
+    def _blob_path(self, digest: str) -> str:
+        return os.path.join(self.base_path, "blobs", digest[:2], digest[2:4], digest)
+
+    def begin_upload(self, id_: Optional[str] = None, created: Optional[datetime] = None) -> _CasUpload:
+        return _CasUpload(self, id_, created)
+
+    def _commit_blob(
+        self, tmp: str, size: int, digest: str, id_: Optional[str] = None, created: Optional[datetime] = None
+    ) -> str:
+        id_ = id_ or uuid.uuid4().hex
+        now = _epoch(created) if created else int(time.time())
+        bp = self._blob_path(digest)
+        with self._index.transaction() as index:
+            if os.path.exists(bp):
+                os.remove(tmp)
+            else:
+                os.makedirs(os.path.dirname(bp), exist_ok=True)
+                os.replace(tmp, bp)
+            self._write_meta(id_, {"blob": digest, "created_at": now})
+            index.put(DocumentInfo(id=id_, size=size, created_at=datetime.utcfromtimestamp(now)), blob=digest)
+        return id_
+
+    def exists(self, id_: str) -> bool:
+        return self._index.blob_of(id_) is not None or super().exists(id_)
+
+    def find_blob(self, id_: str) -> Optional[Blob]:
+        digest = self._index.blob_of(id_)
+        if digest is None:
+            return super().find_blob(id_)
+        return read_blob_file(self._blob_path(digest))
+
+    def find_id(self, id_: str) -> Optional[bytes]:
+        digest = self._index.blob_of(id_)
+        if digest is None:
+            return super().find_id(id_)
+        try:
+            return read_file(self._blob_path(digest))
+        except FileNotFoundError:
+            return None
+
+    def _delete_locked(self, id_: str, index: MetaIndex) -> bool:
+        digest = index.blob_of(id_)
+        if digest is None:
+            return super()._delete_locked(id_, index)
+        index.remove(id_)
+        self._write_meta(id_, {})
+        if index.blob_refs(digest) == 0:
+            bp = self._blob_path(digest)
             try:
-                with open(mp, "r", encoding="utf-8") as mf:
-                    meta = json.load(mf) or {}
-            except Exception:
-                meta = {}
-        if key is None or key == "":
-            meta.pop("key", None)
-        else:
-            meta["key"] = key
+                os.remove(bp)
+            except FileNotFoundError:
+                pass
+            self._prune_blob_dirs(os.path.dirname(bp))
+        return True
+
+    def _prune_blob_dirs(self, dir_: str) -> None:
+        """Remove ``blobs/ab/cd`` and ``blobs/ab`` once empty; the caller holds an index transaction.
+
+        ``_commit_blob`` creates these directories under the same transaction,
+        so a concurrent upload can't lose its directory between the two.
+        """
+        root = os.path.join(self.base_path, "blobs")
+        while dir_ != root and dir_.startswith(root):
+            try:
+                os.rmdir(dir_)
+            except OSError:
+                return  # not empty (or already gone)
+            dir_ = os.path.dirname(dir_)
+
+    def _scan(self) -> Iterator[Tuple[DocumentInfo, Optional[str]]]:
+        yield from super()._scan()
+        for name, _ in self._walk():
+            if not name.endswith(META_SUFFIX):
+                continue
+            id_ = name[: -len(META_SUFFIX)]
+            if super().exists(id_):
+                continue  # plain document, already yielded above
+            meta = self._read_meta(id_)
+            digest = meta.get("blob")
+            if not isinstance(digest, str):
+                continue
+            try:
+                size = logical_size(self._blob_path(digest))
+            except FileNotFoundError:
+                continue
+            created = meta.get("created_at")
+            n = meta.get("name")
+            k = meta.get("key")
+            info = DocumentInfo(
+                id=id_,
+                size=size,
+                created_at=datetime.utcfromtimestamp(created) if isinstance(created, int) else None,
+                name=n if isinstance(n, str) else None,
+                key=k if isinstance(k, str) and k else None,
+            )
+            yield info, digest
+
+
+class _SqliteUpload:
+    """Spools to memory, spilling to a temp file past 1 MiB, then inserts in one transaction."""
+
+    def __init__(self, store: "SqliteStore", id_: Optional[str] = None, created: Optional[datetime] = None) -> None:
+        self._store = store
+        self._id = id_
+        self._created = created
+        self._file = tempfile.SpooledTemporaryFile(max_size=1024 * 1024)
+        self._size = 0
+
+    def write(self, chunk: bytes) -> None:
+        self._file.write(chunk)
+        self._size += len(chunk)
+
+    def commit(self) -> str:
         try:
-            if meta:
-                with open(mp, "w", encoding="utf-8") as mf:
-                    json.dump(meta, mf, ensure_ascii=False)
+            self._file.seek(0)
+            stored = self._size
+            codec = self._store.compression
+            if codec is not None or self._file.read(len(COMPRESSION_MAGIC)) == COMPRESSION_MAGIC:
+                self._file.seek(0)
+                packed = tempfile.SpooledTemporaryFile(max_size=1024 * 1024)
+                if pack_stream(self._file, packed, self._size, codec):
+                    self._file.close()
+                    self._file = packed
+                    stored = packed.tell()
+                else:
+                    packed.close()
+            # Also undoes the magic check above when the body stays raw
+            self._file.seek(0)
+            return self._store._insert(self._file, self._size, stored, self._id, self._created)
+        finally:
+            self._file.close()
+
+    def abort(self) -> None:
+        self._file.close()
+
+
+class SqliteStore:
+    """All documents and metadata in one SQLite database (WAL mode).
+
+    Unlike ``MemoryStore`` the data is shared by every worker process that
+    opens the same file, which makes it the simplest backend for
+    ``uvicorn --workers N``. Listing and metadata use the same schema and
+    queries as the filesystem index; bodies live in a ``bodies`` table,
+    compressed with ``compression`` when that saves space.
+    """
+
+    def __init__(self, path: str, compression: Optional[str] = None) -> None:
+        self.compression = compression_codec(compression)
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._index = MetaIndex(path)
+        self._conn = self._index._conn
+        self._conn.execute("CREATE TABLE IF NOT EXISTS bodies (id TEXT PRIMARY KEY, data BLOB NOT NULL)")
+        # The documents table is the source of truth here; there is nothing to scan
+        self._index.ensure_built(lambda: ())
+
+    def find_id(self, id_: str) -> Optional[bytes]:
+        with self._index._lock:
+            row = self._conn.execute("SELECT data FROM bodies WHERE id = ?", (id_,)).fetchone()
+        return unpack(bytes(row[0])) if row else None
+
+    def find_blob(self, id_: str) -> Optional[Blob]:
+        info = self._index.get(id_)
+        if info is None:
+            return None
+        data = self.find_id(id_)
+        if data is None:
+            return None
+        return Blob(size=len(data), data=data, mtime=_epoch(info.created_at) if info.created_at else None)
+
+    def exists(self, id_: str) -> bool:
+        return self._index.get(id_) is not None
+
+    def _insert(
+        self, f, size: int, stored: int, id_: Optional[str] = None, created: Optional[datetime] = None
+    ) -> str:
+        id_ = id_ or uuid.uuid4().hex
+        now = _epoch(created) if created else int(time.time())
+        with self._index.transaction() as index:
+            if hasattr(self._conn, "blobopen"):
+                # Python 3.11+: stream into a preallocated blob instead of materializing it
+                self._conn.execute("INSERT INTO bodies (id, data) VALUES (?, zeroblob(?))", (id_, stored))
+                with self._conn.blobopen("bodies", "data", self._conn.execute(
+                    "SELECT rowid FROM bodies WHERE id = ?", (id_,)
+                ).fetchone()[0]) as blob:
+                    for chunk in iter(lambda: f.read(256 * 1024), b""):
+                        blob.write(chunk)
             else:
-                if os.path.isfile(mp):
-                    os.remove(mp)
-            return True
-        except Exception:
-            return False
+                self._conn.execute("INSERT INTO bodies (id, data) VALUES (?, ?)", (id_, f.read()))
+            index.put(DocumentInfo(id=id_, size=size, created_at=datetime.utcfromtimestamp(now)))
+        return id_
+
+    def create(self, data: bytes) -> str:
+        upload = self.begin_upload()
+        upload.write(data)
+        return upload.commit()
+
+    def begin_upload(self, id_: Optional[str] = None, created: Optional[datetime] = None) -> _SqliteUpload:
+        return _SqliteUpload(self, id_, created)
+
+    def list(self, **opts) -> List[DocumentInfo]:
+        return self._index.query(**opts)
+
+    def usage(self) -> Tuple[int, int]:
+        return self._index.usage()
+
+    def delete(self, id_: str) -> bool:
+        return self.delete_many([id_])[id_]
+
+    def delete_many(self, ids: List[str]) -> Dict[str, bool]:
+        results: Dict[str, bool] = {}
+        with self._index.transaction() as index:
+            for id_ in ids:
+                results[id_] = index.get(id_) is not None
+                if results[id_]:
+                    self._conn.execute("DELETE FROM bodies WHERE id = ?", (id_,))
+                    index.remove(id_)
+        return results
+
+    def update_meta(self, id_: str, **fields: Optional[str]) -> bool:
+        return self.update_meta_many({id_: fields})[id_]
+
+    def update_meta_many(self, updates: Dict[str, Dict[str, Optional[str]]]) -> Dict[str, bool]:
+        checked = {id_: _meta_updates(fields) for id_, fields in updates.items()}
+        results: Dict[str, bool] = {}
+        with self._index.transaction() as index:
+            for id_, fields in checked.items():
+                results[id_] = index.get(id_) is not None
+                if results[id_]:
+                    index.set_fields(id_, fields)
+        return results
+
+    def set_name(self, id_: str, name: Optional[str]) -> bool:
+        return self.update_meta(id_, name=name)
+
+    def get_name(self, id_: str) -> Optional[str]:
+        info = self._index.get(id_)
+        return info.name if info else None
+
+    def set_key(self, id_: str, key: Optional[str]) -> bool:
+        return self.update_meta(id_, key=key)
 
     def get_key(self, id_: str) -> Optional[str]:
-        mp = self._meta_path(id_)
-        if os.path.isfile(mp):
-            try:
-                with open(mp, "r", encoding="utf-8") as mf:
-                    meta = json.load(mf)
-                    k = meta.get("key")
-                    if isinstance(k, str) and k:
-                        return k
-            except Exception:
+        info = self._index.get(id_)
+        return info.key if info else None
+
+
+class StoreWrapper:
+    """Base for layers around a ``DocumentStore``; unknown attributes fall through to ``inner``."""
+
+    def __init__(self, inner: DocumentStore) -> None:
+        self.inner = inner
+
+    def __getattr__(self, name: str):
+        return getattr(self.inner, name)
+
+
+class CachedStore(StoreWrapper):
+    """Read-through LRU cache of document bodies with a total byte budget.
+
+    Documents never change after ``create``, so entries only need dropping on
+    ``delete``. Bodies larger than ``max_item_bytes`` bypass the cache so one
+    huge drawing can't flush everything else.
+    """
+
+    def __init__(self, inner: DocumentStore, max_bytes: int, max_item_bytes: Optional[int] = None) -> None:
+        super().__init__(inner)
+        self.max_bytes = max_bytes
+        self.max_item_bytes = max_item_bytes or max(1, max_bytes // 8)
+        self._entries: "OrderedDict[str, Blob]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        # Delete generation, misses in flight per id, and ids deleted while a miss was in flight
+        self._generation = 0
+        self._loading: Dict[str, int] = {}
+        self._deleted: Dict[str, int] = {}
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def peek_blob(self, id_: str) -> Optional[Blob]:
+        """Cache-only lookup; never touches the backing store."""
+        with self._lock:
+            blob = self._entries.get(id_)
+            if blob is None:
                 return None
-        return None
+            self._entries.move_to_end(id_)
+            self.hits += 1
+            return blob
+
+    def _put(self, id_: str, blob: Optional[Blob], started: int) -> None:
+        """End a miss that began at delete generation ``started``; caches ``blob`` unless it was deleted meanwhile."""
+        with self._lock:
+            n = self._loading.pop(id_) - 1
+            if n:
+                self._loading[id_] = n
+            deleted = self._deleted.pop(id_, -1) if not n else self._deleted.get(id_, -1)
+            if blob is None or deleted > started or id_ in self._entries:
+                return
+            self._entries[id_] = blob
+            self._bytes += blob.size
+            while self._bytes > self.max_bytes and self._entries:
+                _, old = self._entries.popitem(last=False)
+                self._bytes -= old.size
+                self.evictions += 1
+
+    def find_blob(self, id_: str) -> Optional[Blob]:
+        blob = self.peek_blob(id_)
+        if blob is not None:
+            return blob
+        with self._lock:
+            self.misses += 1
+            self._loading[id_] = self._loading.get(id_, 0) + 1
+            started = self._generation
+        cacheable = None
+        try:
+            blob = self.inner.find_blob(id_)
+            if blob is None or blob.size > self.max_item_bytes:
+                return blob
+            if blob.data is None:
+                try:
+                    with open(blob.path, "rb") as f:
+                        data = f.read()
+                except FileNotFoundError:
+                    return None
+                blob = Blob(size=len(data), data=data, mtime=blob.mtime)
+            cacheable = blob
+            return blob
+        finally:
+            self._put(id_, cacheable, started)
+
+    def find_id(self, id_: str) -> Optional[bytes]:
+        blob = self.find_blob(id_)
+        if blob is None:
+            return None
+        if blob.data is not None:
+            return blob.data
+        return self.inner.find_id(id_)
+
+    def _forget(self, ids: Iterable[str]) -> None:
+        with self._lock:
+            self._generation += 1
+            for id_ in ids:
+                blob = self._entries.pop(id_, None)
+                if blob is not None:
+                    self._bytes -= blob.size
+                if id_ in self._loading:
+                    # A miss in flight may have read the body before it was deleted
+                    self._deleted[id_] = self._generation
+
+    def delete(self, id_: str) -> bool:
+        # Forgotten after the inner delete: a miss in between would otherwise cache the body again
+        try:
+            return self.inner.delete(id_)
+        finally:
+            self._forget((id_,))
+
+    def delete_many(self, ids: List[str]) -> Dict[str, bool]:
+        try:
+            return self.inner.delete_many(ids)
+        finally:
+            self._forget(ids)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+            }
+
+
+class Offloaded:
+    """Base for async facades over synchronous backends.
+
+    With an executor, every call is handed to that (dedicated) thread pool, so
+    slow disk I/O neither stalls the loop nor competes with Starlette's shared
+    threadpool. Without one, calls run inline, which is right for backends
+    that never block (in-memory ones).
+    """
+
+    def __init__(self, backend, executor: Optional[ThreadPoolExecutor] = None) -> None:
+        self.backend = backend
+        self._executor = executor
+
+    async def _call(self, fn, *args, **kwargs):
+        if self._executor is None:
+            return fn(*args, **kwargs)
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, functools.partial(fn, *args, **kwargs))
+
+
+class AsyncStore(Offloaded):
+    """Runs a synchronous ``DocumentStore`` without blocking the event loop."""
+
+    WRITE_BUFFER = 256 * 1024
+
+    def __init__(self, backend: DocumentStore, executor: Optional[ThreadPoolExecutor] = None) -> None:
+        super().__init__(backend, executor)
+
+    async def find_id(self, id_: str) -> Optional[bytes]:
+        return await self._call(self.backend.find_id, id_)
+
+    async def find_blob(self, id_: str) -> Optional[Blob]:
+        peek = getattr(self.backend, "peek_blob", None)
+        if peek is not None:
+            # Cache hits are served without an executor hop
+            blob = peek(id_)
+            if blob is not None:
+                return blob
+        return await self._call(self.backend.find_blob, id_)
+
+    async def exists(self, id_: str) -> bool:
+        return await self._call(self.backend.exists, id_)
+
+    async def create(self, data: bytes) -> str:
+        return await self._call(self.backend.create, data)
+
+    async def create_stream(
+        self,
+        chunks: AsyncIterable[bytes],
+        max_bytes: Optional[int] = None,
+        id_: Optional[str] = None,
+        created: Optional[datetime] = None,
+    ) -> str:
+        """Create a document from an async byte stream without buffering it whole.
+
+        Chunks are coalesced into ``WRITE_BUFFER``-sized writes to keep executor
+        hops down. Raises ``UploadTooLarge`` as soon as ``max_bytes`` is exceeded.
+        ``id_`` and ``created`` are passed to ``begin_upload`` (imports).
+        """
+        upload = await self._call(self.backend.begin_upload, id_, created)
+        buf = bytearray()
+        total = 0
+        try:
+            async for chunk in chunks:
+                total += len(chunk)
+                if max_bytes is not None and total > max_bytes:
+                    raise UploadTooLarge(max_bytes)
+                buf += chunk
+                if len(buf) >= self.WRITE_BUFFER:
+                    await self._call(upload.write, bytes(buf))
+                    buf.clear()
+            if buf:
+                await self._call(upload.write, bytes(buf))
+            return await self._call(upload.commit)
+        except BaseException:
+            await self._call(upload.abort)
+            raise
+
+    async def list(self, **opts) -> List[DocumentInfo]:
+        return await self._call(self.backend.list, **opts)
+
+    async def delete(self, id_: str) -> bool:
+        return await self._call(self.backend.delete, id_)
+
+    async def usage(self) -> Tuple[int, int]:
+        return await self._call(self.backend.usage)
+
+    async def set_name(self, id_: str, name: Optional[str]) -> bool:
+        return await self._call(self.backend.set_name, id_, name)
+
+    async def get_name(self, id_: str) -> Optional[str]:
+        return await self._call(self.backend.get_name, id_)
+
+    async def set_key(self, id_: str, key: Optional[str]) -> bool:
+        return await self._call(self.backend.set_key, id_, key)
+
+    async def update_meta(self, id_: str, **fields: Optional[str]) -> bool:
+        return await self._call(self.backend.update_meta, id_, **fields)
+
+    async def delete_many(self, ids: List[str]) -> Dict[str, bool]:
+        return await self._call(self.backend.delete_many, ids)
+
+    async def update_meta_many(self, updates: Dict[str, Dict[str, Optional[str]]]) -> Dict[str, bool]:
+        return await self._call(self.backend.update_meta_many, updates)
+
+    async def get_key(self, id_: str) -> Optional[str]:
+        return await self._call(self.backend.get_key, id_)
+
+
+def get_store(
+    storage_type: str,
+    local_path: str,
+    cache_bytes: int = 0,
+    cache_item_bytes: int = 0,
+    dedup: bool = False,
+    shard_depth: int = 2,
+    compression: Optional[str] = None,
+    s3_options: Optional[Dict[str, object]] = None,
+    wal_options: Optional[Dict[str, object]] = None,
+    memory_max_bytes: int = 0,
+) -> DocumentStore:
+    if storage_type == "sqlite":
+        path = local_path if local_path.endswith((".sqlite3", ".db")) else os.path.join(local_path, "documents.sqlite3")
+        store: DocumentStore = SqliteStore(path, compression=compression)
+    elif storage_type == "filesystem":
+        cls = ContentAddressedStore if dedup else FilesystemStore
+        store = cls(local_path, shard_depth=shard_depth, compression=compression)
+    elif storage_type == "s3":
+        from .s3_store import S3Store  # boto3 is only needed for this backend
+
+        store = S3Store(**(s3_options or {}))
+    elif storage_type == "memory-wal":
+        from .wal_store import WalMemoryStore
+
+        return WalMemoryStore(
+            os.path.join(local_path, "memory-wal"), max_bytes=memory_max_bytes, **(wal_options or {})
+        )
+    else:
+        return MemoryStore(memory_max_bytes)
+    if cache_bytes > 0:
+        store = CachedStore(store, cache_bytes, cache_item_bytes or None)
+    return store
+
 
+def get_async_store(
+    storage_type: str, local_path: str, threads: int = 16, instrument: bool = False, **store_opts
+) -> AsyncStore:
+    backend = get_store(storage_type, local_path, **store_opts)
+    executor = None
+    # Exactly MemoryStore: subclasses such as WalMemoryStore write to disk and need the pool
+    if type(backend) is not MemoryStore:
+        executor = ThreadPoolExecutor(max_workers=threads, thread_name_prefix="store")
+    if instrument:
+        from .metrics import InstrumentedStore
 
-def get_store(storage_type: str, local_path: str) -> DocumentStore:
-    if storage_type == "filesystem":
-        return FilesystemStore(local_path)
-    return MemoryStore()
+        backend = InstrumentedStore(backend)
+    return AsyncStore(backend, executor)
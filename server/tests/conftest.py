@@ -0,0 +1,25 @@
+"""Shared fixtures: stores on temporary paths and an app wired to one of them."""
+from __future__ import annotations
+
+import pytest
+from fastapi.testclient import TestClient
+
+from server.app import create_app
+from server.routes import documents
+from server.storage import get_async_store, get_store
+
+# Backends that run without external services
+STORE_TYPES = ("memory", "filesystem", "sqlite")
+
+
+@pytest.fixture(params=STORE_TYPES)
+def store(request, tmp_path):
+    """A synchronous ``DocumentStore`` of each local type."""
+    return get_store(request.param, str(tmp_path))
+
+
+@pytest.fixture(params=STORE_TYPES)
+def client(request, tmp_path, monkeypatch):
+    """A client for the app, with the document routes backed by a fresh store of each local type."""
+    monkeypatch.setattr(documents, "store", get_async_store(request.param, str(tmp_path), threads=2))
+    return TestClient(create_app())
@@ -0,0 +1,82 @@
+"""``POST /api/v2/admin/documents/batch-delete`` and ``batch-meta``."""
+from __future__ import annotations
+
+import pytest
+
+from server.config import settings
+
+
+def _upload(client, n: int) -> list:
+    return [client.post("/api/v2/post/", content=b"body %d" % i).json()["id"] for i in range(n)]
+
+
+def _listed(client) -> dict:
+    """Names of the keyed documents the admin listing shows, by id."""
+    items = client.get("/api/v2/admin/documents", params={"limit": 100}).json()["items"]
+    return {it["id"]: it["name"] for it in items}
+
+
+def test_batch_delete(client):
+    a, b, c = _upload(client, 3)
+    r = client.post("/api/v2/admin/documents/batch-delete", json={"ids": [a, "missing", a, b]})
+    assert r.status_code == 200
+    # Duplicates are answered once, in request order
+    assert r.json()["results"] == [
+        {"id": a, "ok": True},
+        {"id": "missing", "ok": False, "error": "not found"},
+        {"id": b, "ok": True},
+    ]
+    assert client.get(f"/api/v2/{a}").status_code == 404
+    assert client.get(f"/api/v2/{b}").status_code == 404
+    assert client.get(f"/api/v2/{c}").status_code == 200
+
+
+def test_batch_delete_nothing(client):
+    r = client.post("/api/v2/admin/documents/batch-delete", json={"ids": []})
+    assert r.status_code == 200 and r.json() == {"results": []}
+
+
+def test_batch_meta(client):
+    a, b = _upload(client, 2)
+    items = [
+        {"id": a, "name": "first", "key": "ka"},
+        {"id": b, "key": "kb"},
+        {"id": "missing", "name": "x"},
+        {"id": b, "name": "second"},  # merged with the earlier entry for b
+        {"id": "bare"},
+    ]
+    r = client.post("/api/v2/admin/documents/batch-meta", json={"items": items})
+    assert r.status_code == 200
+    assert r.json()["results"] == [
+        {"id": a, "ok": True},
+        {"id": b, "ok": True},
+        {"id": "missing", "ok": False, "error": "not found"},
+        {"id": "bare", "ok": False, "error": "name or key required"},
+    ]
+    assert _listed(client) == {a: "first", b: "second"}
+
+
+def test_batch_meta_empty_name_clears_it(client):
+    (a,) = _upload(client, 1)
+    client.post("/api/v2/admin/documents/batch-meta", json={"items": [{"id": a, "name": "old", "key": "k"}]})
+    r = client.post("/api/v2/admin/documents/batch-meta", json={"items": [{"id": a, "name": ""}]})
+    assert r.json()["results"] == [{"id": a, "ok": True}]
+    assert _listed(client) == {a: None}
+
+
+@pytest.mark.parametrize(
+    "path, body",
+    [
+        ("batch-delete", lambda ids: {"ids": ids}),
+        ("batch-meta", lambda ids: {"items": [{"id": i, "name": "n"} for i in ids]}),
+    ],
+)
+def test_batch_size_limit(client, monkeypatch, path, body):
+    monkeypatch.setattr(settings, "ADMIN_BATCH_MAX", 2)
+    ids = _upload(client, 3)
+    url = f"/api/v2/admin/documents/{path}"
+    assert client.post(url, json=body(ids)).status_code == 413
+    assert client.post(url, json=body(ids[:2])).status_code == 200
+    # batch-delete counts distinct ids
+    if path == "batch-delete":
+        assert client.post(url, json=body([ids[2]] * 3)).status_code == 200
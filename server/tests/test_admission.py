@@ -0,0 +1,138 @@
+"""``ADMISSION_*``: per-client token buckets (429) and concurrency limits (503)."""
+from __future__ import annotations
+
+import asyncio
+
+import pytest
+from fastapi.testclient import TestClient
+
+from server.admission import Admission, AdmissionMiddleware, Limit, TokenBuckets, route_class
+from server.app import create_app
+from server.config import settings
+from server.routes import documents
+from server.storage import get_async_store
+
+
+@pytest.mark.parametrize(
+    "method, path, cls",
+    [
+        ("POST", "/api/v2/post", "upload"),
+        ("POST", "/api/v2/post/", "upload"),
+        ("GET", "/api/v2/abc123", "read"),
+        ("HEAD", "/api/v2/abc123", "read"),
+        ("POST", "/v1/projects/p/databases/(default)/documents:commit", "upload"),
+        ("POST", "/v1/projects/p/databases/(default)/documents:batchGet", "read"),
+        ("GET", "/api/v2/admin", None),
+        ("GET", "/api/v2/admin/documents", None),
+        ("DELETE", "/api/v2/abc123", None),
+        ("GET", "/assets/app.js", None),
+    ],
+)
+def test_route_class(method, path, cls):
+    assert route_class(method, path) == cls
+
+
+class _Clock:
+    def __init__(self) -> None:
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_token_bucket_refills_at_the_rate():
+    clock = _Clock()
+    buckets = TokenBuckets(rate=2, burst=3, max_clients=10, clock=clock)
+    assert [buckets.take("a") for _ in range(3)] == [0, 0, 0]
+    assert buckets.take("a") == pytest.approx(0.5)
+    assert buckets.take("b") == 0  # each client has its own bucket
+    clock.now = 0.5
+    assert buckets.take("a") == 0 and buckets.take("a") == pytest.approx(0.5)
+    clock.now = 100
+    assert [buckets.take("a") for _ in range(3)] == [0, 0, 0]  # refilled to the burst, not past it
+    assert buckets.take("a") > 0
+
+
+def test_token_buckets_forget_the_least_recently_seen():
+    buckets = TokenBuckets(rate=1, burst=1, max_clients=2, clock=_Clock())
+    for client in ("a", "b", "a", "c"):
+        buckets.take(client)
+    assert len(buckets) == 2
+    assert buckets.take("a") > 0  # still remembered, and empty
+    assert buckets.take("b") == 0  # pushed out by c, so it starts over with a full bucket
+
+
+async def _request(app, method: str, path: str, client=("10.0.0.1", 1234)):
+    """Drive ``app`` with one request; returns ``(status, headers)``. The body is never read."""
+    async def receive():
+        raise AssertionError("the request body was read")
+
+    out = {}
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            out["status"] = message["status"]
+            out["headers"] = dict(message["headers"])
+
+    scope = {"type": "http", "method": method, "path": path, "headers": [], "client": client}
+    await app(scope, receive, send)
+    return out["status"], out["headers"]
+
+
+def test_concurrency_limit_answers_503_while_slots_are_busy():
+    async def scenario():
+        gate = asyncio.Event()
+
+        async def app(scope, receive, send):
+            await gate.wait()
+            await send({"type": "http.response.start", "status": 200, "headers": []})
+            await send({"type": "http.response.body", "body": b""})
+
+        admission = Admission({"read": Limit(concurrency=1)})
+        mw = AdmissionMiddleware(app, admission)
+        first = asyncio.ensure_future(_request(mw, "GET", "/api/v2/abc"))
+        await asyncio.sleep(0)
+        assert admission.active == {"read": 1}
+        status, headers = await _request(mw, "GET", "/api/v2/abc", client=("10.0.0.2", 1))
+        assert status == 503 and headers[b"retry-after"] == b"1"
+        gate.set()
+        assert (await first)[0] == 200
+        assert admission.active == {"read": 0}
+        assert (await _request(mw, "GET", "/api/v2/abc"))[0] == 200
+        assert admission.rejected == {("read", "busy"): 1}
+
+    asyncio.run(scenario())
+
+
+def test_slot_is_released_when_the_app_fails():
+    async def scenario():
+        async def app(scope, receive, send):
+            raise RuntimeError("boom")
+
+        admission = Admission({"upload": Limit(concurrency=1)})
+        with pytest.raises(RuntimeError):
+            await _request(AdmissionMiddleware(app, admission), "POST", "/api/v2/post")
+        assert admission.active == {"upload": 0}
+
+    asyncio.run(scenario())
+
+
+@pytest.fixture
+def limited_client(tmp_path, monkeypatch):
+    monkeypatch.setattr(documents, "store", get_async_store("memory", str(tmp_path)))
+    monkeypatch.setattr(settings, "ADMISSION_UPLOAD_RATE", 0.25)
+    monkeypatch.setattr(settings, "ADMISSION_UPLOAD_BURST", 2)
+    app = create_app()
+    return TestClient(app), app.state.admission
+
+
+def test_empty_bucket_answers_429_with_retry_after(limited_client):
+    client, admission = limited_client
+    assert [client.post("/api/v2/post", content=b"{}").status_code for _ in range(2)] == [200, 200]
+    r = client.post("/api/v2/post", content=b"{}", headers={"Origin": "https://example.com"})
+    assert r.status_code == 429 and r.json() == {"detail": "too many requests"}
+    assert 1 <= int(r.headers["retry-after"]) <= 4  # one token every four seconds
+    assert r.headers["access-control-allow-origin"]  # readable by the browser
+    # Reads have no limit configured and are not held back
+    assert client.get("/api/v2/missing").status_code == 404
+    assert admission.rejected == {("upload", "rate"): 1}
@@ -0,0 +1,135 @@
+"""``GET /api/v2/admin/export`` and ``POST /api/v2/admin/import``: tar round trips."""
+from __future__ import annotations
+
+import asyncio
+import io
+import tarfile
+
+import pytest
+
+from server.archive import PAX_KEY, PAX_NAME, export_tar
+from server.routes import documents
+from server.storage import get_async_store
+
+BODIES = [b"", b"small", bytes(range(256)) * 2000]  # the last spans several export chunks
+
+
+@pytest.fixture
+def filled(client):
+    ids = [client.post("/api/v2/post/", content=body).json()["id"] for body in BODIES]
+    client.post(f"/api/v2/admin/documents/{ids[0]}/meta", json={"name": "Ünïcode name", "key": "k0"})
+    client.post(f"/api/v2/admin/documents/{ids[2]}/meta", json={"key": "k2"})
+    return ids
+
+
+def _listing(client) -> list:
+    return client.get("/api/v2/admin/documents", params={"limit": 100, "order": "asc"}).json()["items"]
+
+
+def test_export_is_a_plain_tar(client, filled):
+    r = client.get("/api/v2/admin/export")
+    assert r.status_code == 200
+    assert r.headers["content-type"] == "application/x-tar"
+    with tarfile.open(fileobj=io.BytesIO(r.content)) as tar:
+        members = {m.name: m for m in tar}
+        assert sorted(members) == sorted(filled)
+        for id_, body in zip(filled, BODIES):
+            assert tar.extractfile(members[id_]).read() == body
+        assert members[filled[0]].pax_headers[PAX_NAME] == "Ünïcode name"
+        assert members[filled[0]].pax_headers[PAX_KEY] == "k0"
+        assert PAX_NAME not in members[filled[1]].pax_headers
+
+
+def test_export_import_round_trip(client, filled, tmp_path, monkeypatch):
+    archive = client.get("/api/v2/admin/export").content
+    listed = _listing(client)
+    kind = type(documents.store.backend).__name__
+
+    target = get_async_store("filesystem" if kind == "MemoryStore" else "memory", str(tmp_path / "target"))
+    monkeypatch.setattr(documents, "store", target)
+    r = client.post("/api/v2/admin/import", content=archive)
+    assert r.status_code == 200
+    assert r.json() == {"imported": 3, "skipped": 0, "invalid": 0, "bytes": sum(map(len, BODIES))}
+    for id_, body in zip(filled, BODIES):
+        assert client.get(f"/api/v2/{id_}").content == body
+    # Ids, names, keys and creation times all survive (to the second: filesystem storage keeps no more)
+    def summary(items):
+        return {it["id"]: (it["name"], it["shareLink"], it["createdAt"][:19]) for it in items}
+
+    assert summary(_listing(client)) == summary(listed)
+
+    # A rerun finds every id already present
+    again = client.post("/api/v2/admin/import", content=archive).json()
+    assert again == {"imported": 0, "skipped": 3, "invalid": 0, "bytes": 0}
+
+
+def test_import_skips_unusable_members(client):
+    buf = io.BytesIO()
+    with tarfile.open(fileobj=buf, mode="w", format=tarfile.PAX_FORMAT) as tar:
+        folder = tarfile.TarInfo("folder")
+        folder.type = tarfile.DIRTYPE
+        tar.addfile(folder)
+        for name, body in (("../escape", b"x"), ("./good-id", b"ok")):
+            ti = tarfile.TarInfo(name)
+            ti.size = len(body)
+            tar.addfile(ti, io.BytesIO(body))
+    r = client.post("/api/v2/admin/import", content=buf.getvalue())
+    assert r.json() == {"imported": 1, "skipped": 0, "invalid": 1, "bytes": 2}
+    assert client.get("/api/v2/good-id").content == b"ok"
+
+
+@pytest.mark.parametrize("body", [b"definitely not a tar archive" * 40, b"\x01" * 512])
+def test_import_rejects_garbage(client, body):
+    assert client.post("/api/v2/admin/import", content=body).status_code == 400
+
+
+def test_documents_deleted_during_an_export_are_skipped(client, filled):
+    store = documents.store
+    real_list = store.list
+
+    async def listing(**opts):
+        page = await real_list(**opts)
+        if opts.get("after") is None:
+            await store.delete(filled[1])  # gone after it was listed, before it is read
+        return page
+
+    store.list = listing
+
+    async def export() -> bytes:
+        return b"".join([chunk async for chunk in export_tar(store, batch=10)])
+
+    with tarfile.open(fileobj=io.BytesIO(asyncio.run(export()))) as tar:
+        assert sorted(m.name for m in tar) == sorted([filled[0], filled[2]])
+        assert tar.extractfile(filled[2]).read() == BODIES[2]
+
+
+@pytest.mark.parametrize(
+    "name", ["blobs", "ab", f"{'a' * 32}.meta.json", "upload.tmp", "meta-1.lock", "documents.sqlite3", ".hidden"]
+)
+def test_import_rejects_names_the_filesystem_store_uses(client, name):
+    buf = io.BytesIO()
+    with tarfile.open(fileobj=buf, mode="w", format=tarfile.PAX_FORMAT) as tar:
+        ti = tarfile.TarInfo(name)
+        ti.size = 1
+        tar.addfile(ti, io.BytesIO(b"x"))
+    r = client.post("/api/v2/admin/import", content=buf.getvalue())
+    assert r.json() == {"imported": 0, "skipped": 0, "invalid": 1, "bytes": 0}
+
+
+def test_reimport_checks_existence_without_reading_bodies(client, filled, monkeypatch):
+    archive = client.get("/api/v2/admin/export").content
+
+    async def no_reads(id_):
+        raise AssertionError("import read a body to check whether it exists")
+
+    monkeypatch.setattr(documents.store, "find_blob", no_reads)
+    again = client.post("/api/v2/admin/import", content=archive).json()
+    assert again == {"imported": 0, "skipped": 3, "invalid": 0, "bytes": 0}
+
+
+def test_exists(store):
+    id_ = store.create(b"body")
+    assert store.exists(id_)
+    assert not store.exists("missing") and not store.exists(".index.sqlite3")
+    store.delete(id_)
+    assert not store.exists(id_)
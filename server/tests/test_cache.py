@@ -0,0 +1,77 @@
+"""``CachedStore`` (``CACHE_MAX_BYTES``): the read-through LRU in front of a store."""
+from __future__ import annotations
+
+import threading
+
+import pytest
+
+from server.storage import CachedStore, MemoryStore, StoreWrapper, get_store
+
+
+@pytest.mark.parametrize("kind", ["filesystem", "sqlite"])
+def test_get_store_wraps_disk_backends(tmp_path, kind):
+    store = get_store(kind, str(tmp_path), cache_bytes=1024)
+    assert isinstance(store, CachedStore)
+    id_ = store.create(b"body")
+    assert store.find_id(id_) == b"body" and store.find_id(id_) == b"body"
+    assert store.stats()["hits"] == 1
+    assert not isinstance(get_store(kind, str(tmp_path / "plain")), CachedStore)
+
+
+def test_hits_misses_and_evictions():
+    store = CachedStore(MemoryStore(), max_bytes=8, max_item_bytes=8)
+    a, b, c = (store.create(b"%d" % i * 4) for i in range(3))
+    assert store.find_id(a) == b"0000" and store.find_id(a) == b"0000"
+    store.find_id(b)
+    assert store.find_blob("missing") is None
+    assert store.stats() == {"hits": 1, "misses": 3, "evictions": 0, "entries": 2, "bytes": 8, "max_bytes": 8}
+    store.find_id(a)  # a is now the most recent, so c pushes out b
+    store.find_id(c)
+    assert store.stats()["evictions"] == 1
+    assert store.peek_blob(b) is None and store.peek_blob(a) and store.peek_blob(c)
+
+
+def test_large_bodies_bypass_the_cache():
+    store = CachedStore(MemoryStore(), max_bytes=100, max_item_bytes=4)
+    id_ = store.create(b"too large")
+    assert store.find_id(id_) == b"too large"
+    assert store.peek_blob(id_) is None and store.stats()["bytes"] == 0
+
+
+def test_delete_removes_the_entry():
+    store = CachedStore(MemoryStore(), max_bytes=100)
+    id_ = store.create(b"body")
+    store.find_id(id_)
+    assert store.delete(id_)
+    assert store.find_id(id_) is None and store.stats()["entries"] == 0
+
+
+class _SlowReads(StoreWrapper):
+    """Pauses ``find_blob`` after it has read the body, until the test lets it go."""
+
+    def __init__(self, inner) -> None:
+        super().__init__(inner)
+        self.read = threading.Event()
+        self.resume = threading.Event()
+
+    def find_blob(self, id_):
+        blob = self.inner.find_blob(id_)
+        self.read.set()
+        self.resume.wait(10)
+        return blob
+
+
+@pytest.mark.parametrize("many", [False, True])
+def test_delete_during_a_miss_is_not_cached(many):
+    inner = _SlowReads(MemoryStore())
+    store = CachedStore(inner, max_bytes=100)
+    id_ = store.create(b"body")
+    reader = threading.Thread(target=store.find_id, args=(id_,))
+    reader.start()
+    assert inner.read.wait(10)
+    # Deleted after the miss read the body, before it could fill the cache
+    assert (store.delete_many([id_]) == {id_: True}) if many else store.delete(id_)
+    inner.resume.set()
+    reader.join(10)
+    assert store.peek_blob(id_) is None
+    assert store.find_id(id_) is None
@@ -0,0 +1,141 @@
+"""At-rest compression (``STORAGE_COMPRESSION``): the packed format and the stores that use it."""
+from __future__ import annotations
+
+import io
+import json
+import os
+
+import pytest
+
+from server.storage import (
+    COMPRESSION_MAGIC,
+    compression_codec,
+    compression_report,
+    get_store,
+    is_packed,
+    pack,
+    pack_stream,
+    packed_info,
+    unpack,
+)
+
+
+def _available(codec: str) -> bool:
+    try:
+        return compression_codec(codec) is not None
+    except ValueError:
+        return False
+
+
+# zstd needs the optional 'zstandard' package
+CODECS = [c for c in ("zlib", "lzma", "zstd") if _available(c)]
+
+SCENE = json.dumps({"type": "excalidraw", "elements": [{"id": i, "x": i, "y": i} for i in range(3000)]}).encode()
+NOISE = os.urandom(200 * 1024)
+BODIES = {
+    "empty": b"",
+    "scene": SCENE,
+    "noise": NOISE,
+    "magic": COMPRESSION_MAGIC + b"\x00" * 4000,
+    "short-magic": COMPRESSION_MAGIC,
+}
+
+
+@pytest.mark.parametrize("codec", CODECS + [None])
+@pytest.mark.parametrize("name", BODIES)
+def test_pack_round_trip(codec, name):
+    body = BODIES[name]
+    assert unpack(pack(body, codec)) == body
+
+
+@pytest.mark.parametrize("codec", CODECS)
+def test_pack_only_keeps_smaller_output(codec):
+    assert packed_info(pack(SCENE, codec)) == (codec, len(SCENE))
+    assert pack(NOISE, codec) == NOISE
+    assert pack(b"tiny", codec) == b"tiny"
+
+
+def test_bodies_starting_with_the_magic_are_wrapped():
+    body = BODIES["magic"]
+    packed = pack(body, None)
+    assert packed_info(packed) == ("stored", len(body))
+    assert is_packed(pack(COMPRESSION_MAGIC, None))
+
+
+@pytest.mark.parametrize("codec", CODECS + [None])
+@pytest.mark.parametrize("name", BODIES)
+def test_pack_stream_round_trip(codec, name):
+    body = BODIES[name]
+    dst = io.BytesIO()
+    kept = pack_stream(io.BytesIO(body), dst, len(body), codec)
+    if kept:
+        assert unpack(dst.getvalue()) == body
+    if name == "noise":
+        assert not kept  # the sample didn't compress, so the body stays raw
+    if name.endswith("magic"):
+        assert kept
+
+
+@pytest.mark.parametrize("bad", ["gzip", "stored"])
+def test_unknown_codecs_are_rejected(bad):
+    with pytest.raises(ValueError):
+        compression_codec(bad)
+
+
+@pytest.mark.parametrize("disabled", [None, "", "none"])
+def test_compression_can_be_disabled(disabled):
+    assert compression_codec(disabled) is None
+
+
+def _read(store, id_) -> bytes:
+    blob = store.find_blob(id_)
+    if blob.path is not None:
+        with open(blob.path, "rb") as f:
+            data = f.read()
+    else:
+        data = blob.data
+    assert blob.size == len(data)
+    return data
+
+
+@pytest.mark.parametrize("codec", CODECS + [None])
+@pytest.mark.parametrize("kind", ["filesystem", "sqlite"])
+def test_store_round_trip(tmp_path, kind, codec):
+    store = get_store(kind, str(tmp_path), compression=codec)
+    ids = {}
+    for name, body in BODIES.items():
+        up = store.begin_upload()
+        for i in range(0, len(body), 7000):  # several writes, as an upload arrives
+            up.write(body[i:i + 7000])
+        ids[name] = up.commit()
+    ids["created"] = store.create(SCENE)
+
+    for name, id_ in ids.items():
+        body = BODIES.get(name, SCENE)
+        assert store.find_id(id_) == body, name
+        assert _read(store, id_) == body, name
+    # Listings and usage report logical sizes
+    sizes = {d.id: d.size for d in store.list()}
+    assert sizes == {id_: len(BODIES.get(name, SCENE)) for name, id_ in ids.items()}
+    assert store.usage() == (len(ids), sum(sizes.values()))
+
+
+@pytest.mark.parametrize("codec", CODECS)
+def test_filesystem_stores_compressed_files(tmp_path, codec):
+    store = get_store("filesystem", str(tmp_path), compression=codec)
+    store.create(SCENE)
+    store.create(NOISE)
+    report = compression_report(str(tmp_path))
+    assert report[codec]["files"] == 1 and report[codec]["logical"] == len(SCENE)
+    assert report[codec]["stored"] < len(SCENE)
+    assert report["none"] == {"files": 1, "stored": len(NOISE), "logical": len(NOISE)}
+
+
+def test_raw_files_stay_readable_after_enabling_compression(tmp_path):
+    raw = get_store("filesystem", str(tmp_path))
+    id_ = raw.create(SCENE)
+    packed = get_store("filesystem", str(tmp_path), compression=CODECS[0])
+    assert packed.find_id(id_) == SCENE
+    new = packed.create(SCENE)
+    # ...and compressed ones after turning it off again
+    assert get_store("filesystem", str(tmp_path)).find_id(new) == SCENE
@@ -0,0 +1,76 @@
+"""Reference counting of shared bodies in ``ContentAddressedStore`` (``STORAGE_DEDUP``)."""
+from __future__ import annotations
+
+import os
+
+import pytest
+
+from server.storage import ContentAddressedStore
+
+
+@pytest.fixture
+def cas(tmp_path):
+    return ContentAddressedStore(str(tmp_path))
+
+
+def _blobs(store) -> list:
+    root = os.path.join(store.base_path, "blobs")
+    return sorted(f for _, _, files in os.walk(root) for f in files)
+
+
+def _dirs(store) -> list:
+    root = os.path.join(store.base_path, "blobs")
+    return sorted(os.path.relpath(d, root) for d, _, _ in os.walk(root) if d != root)
+
+
+def test_identical_bodies_share_one_blob(cas):
+    a, b = cas.create(b"same"), cas.create(b"same")
+    c = cas.create(b"other")
+    assert len({a, b, c}) == 3
+    assert len(_blobs(cas)) == 2
+    assert cas.find_id(a) == cas.find_id(b) == b"same"
+    assert cas.find_blob(a).size == 4
+    assert cas.usage() == (3, 13)  # logical bytes, counted per document
+
+
+def test_blob_lives_until_the_last_reference_goes(cas):
+    a, b, c = (cas.create(b"same") for _ in range(3))
+    assert cas.delete(a)
+    assert not cas.delete(a)
+    assert cas.find_id(b) == b"same" and len(_blobs(cas)) == 1
+    assert cas.delete_many([b, "missing"]) == {b: True, "missing": False}
+    assert cas.find_id(c) == b"same" and len(_blobs(cas)) == 1
+    assert cas.delete(c)
+    assert cas.find_id(c) is None
+    assert _blobs(cas) == []
+
+
+def test_empty_shard_directories_are_pruned(cas):
+    a, b = cas.create(b"one"), cas.create(b"two")
+    assert len(_dirs(cas)) >= 3  # ab, ab/cd per blob (first levels may coincide)
+    cas.delete_many([a, b])
+    assert _dirs(cas) == []
+    # A later upload recreates what it needs
+    c = cas.create(b"one")
+    assert cas.find_id(c) == b"one"
+
+
+def test_reupload_after_delete(cas):
+    a = cas.create(b"same")
+    cas.delete(a)
+    b = cas.create(b"same")
+    assert cas.find_id(b) == b"same" and len(_blobs(cas)) == 1
+
+
+def test_references_survive_a_restart_and_reindex(tmp_path):
+    cas = ContentAddressedStore(str(tmp_path))
+    a, b = cas.create(b"same"), cas.create(b"same")
+    cas.update_meta(a, name="kept")
+
+    reopened = ContentAddressedStore(str(tmp_path))
+    reopened.reindex()
+    assert reopened.get_name(a) == "kept"
+    assert reopened.delete(a)
+    assert reopened.find_id(b) == b"same"
+    assert reopened.delete(b)
+    assert _blobs(reopened) == []
@@ -0,0 +1,100 @@
+"""``GET /api/v2/{id}``: ranges and conditional requests."""
+from __future__ import annotations
+
+import pytest
+
+BODY = bytes(range(256)) * 400  # 100 KiB, more than one read chunk
+
+
+@pytest.fixture
+def doc(client):
+    return client.post("/api/v2/post/", content=BODY).json()["id"]
+
+
+def test_full_body_advertises_ranges(client, doc):
+    r = client.get(f"/api/v2/{doc}")
+    assert r.status_code == 200
+    assert r.content == BODY
+    assert r.headers["accept-ranges"] == "bytes"
+
+
+@pytest.mark.parametrize(
+    "header, start, end",
+    [
+        ("bytes=0-0", 0, 0),
+        ("bytes=100-70000", 100, 70000),
+        ("bytes=102000-", 102000, len(BODY) - 1),
+        ("bytes=-10", len(BODY) - 10, len(BODY) - 1),
+        ("bytes=5-999999999", 5, len(BODY) - 1),  # clamped to the body
+        ("bytes=-999999999", 0, len(BODY) - 1),
+    ],
+)
+def test_range(client, doc, header, start, end):
+    r = client.get(f"/api/v2/{doc}", headers={"Range": header})
+    assert r.status_code == 206
+    assert r.content == BODY[start:end + 1]
+    assert r.headers["content-range"] == f"bytes {start}-{end}/{len(BODY)}"
+    assert r.headers["content-length"] == str(end - start + 1)
+
+
+@pytest.mark.parametrize("header", [f"bytes={len(BODY)}-", f"bytes={len(BODY) + 5}-{len(BODY) + 10}"])
+def test_unsatisfiable_range(client, doc, header):
+    r = client.get(f"/api/v2/{doc}", headers={"Range": header})
+    assert r.status_code == 416
+    assert r.headers["content-range"] == f"bytes */{len(BODY)}"
+
+
+@pytest.mark.parametrize("header", ["bytes=0-1,5-6", "items=0-1", "bytes=abc", "bytes=9-3", "bytes=-0"])
+def test_unsupported_range_falls_back_to_full_body(client, doc, header):
+    r = client.get(f"/api/v2/{doc}", headers={"Range": header})
+    assert r.status_code == 200
+    assert r.content == BODY
+
+
+def test_range_on_empty_body_is_ignored(client):
+    id_ = client.post("/api/v2/post/", content=b"").json()["id"]
+    r = client.get(f"/api/v2/{id_}", headers={"Range": "bytes=0-"})
+    assert r.status_code == 200 and r.content == b""
+
+
+def test_missing_document(client):
+    assert client.get("/api/v2/nope", headers={"Range": "bytes=0-1"}).status_code == 404
+
+
+def test_validators_and_caching_headers(client, doc):
+    r = client.get(f"/api/v2/{doc}")
+    assert r.headers["etag"] == f'"{doc}"'
+    assert "immutable" in r.headers["cache-control"]
+    assert "last-modified" in r.headers
+
+
+@pytest.mark.parametrize("inm", ['"{id}"', 'W/"{id}"', '"other", "{id}"', "*"])
+def test_if_none_match_gives_304(client, doc, inm):
+    r = client.get(f"/api/v2/{doc}", headers={"If-None-Match": inm.format(id=doc)})
+    assert r.status_code == 304
+    assert r.content == b""
+    assert r.headers["etag"] == f'"{doc}"'
+
+
+def test_if_none_match_mismatch_sends_body(client, doc):
+    r = client.get(f"/api/v2/{doc}", headers={"If-None-Match": '"other"'})
+    assert r.status_code == 200 and r.content == BODY
+
+
+def test_if_modified_since(client, doc):
+    last_modified = client.get(f"/api/v2/{doc}").headers["last-modified"]
+    assert client.get(f"/api/v2/{doc}", headers={"If-Modified-Since": last_modified}).status_code == 304
+    old = "Mon, 01 Jan 2001 00:00:00 GMT"
+    assert client.get(f"/api/v2/{doc}", headers={"If-Modified-Since": old}).status_code == 200
+    assert client.get(f"/api/v2/{doc}", headers={"If-Modified-Since": "garbage"}).status_code == 200
+
+
+def test_if_none_match_takes_precedence(client, doc):
+    last_modified = client.get(f"/api/v2/{doc}").headers["last-modified"]
+    r = client.get(f"/api/v2/{doc}", headers={"If-None-Match": '"other"', "If-Modified-Since": last_modified})
+    assert r.status_code == 200
+
+
+def test_304_wins_over_range(client, doc):
+    r = client.get(f"/api/v2/{doc}", headers={"If-None-Match": f'"{doc}"', "Range": "bytes=0-9"})
+    assert r.status_code == 304
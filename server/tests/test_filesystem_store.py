@@ -0,0 +1,85 @@
+"""``FilesystemStore`` specifics: sidecar metadata shared by worker processes."""
+from __future__ import annotations
+
+import json
+import multiprocessing
+import threading
+import time
+
+import pytest
+
+from server.storage import FilesystemStore, fcntl, read_file
+
+pytestmark = pytest.mark.skipif(fcntl is None, reason="cross-process locks need fcntl")
+
+ROUNDS = 150
+
+
+def _sidecar(store, id_) -> dict:
+    return json.loads(read_file(store._meta_path(id_)))
+
+
+def _hold_lock(path, id_, ready, release):
+    store = FilesystemStore(path)
+    with store._meta_locks_for([id_]):
+        ready.set()
+        release.wait(10)
+
+
+def _write_field(path, id_, field, start):
+    store = FilesystemStore(path)
+    start.wait(10)
+    for i in range(ROUNDS):
+        assert store.update_meta(id_, **{field: f"{field}{i}"})
+
+
+def _processes():
+    return multiprocessing.get_context("fork")
+
+
+def test_meta_lock_holds_off_another_process(tmp_path):
+    store = FilesystemStore(str(tmp_path))
+    id_ = store.create(b"x")
+    mp = _processes()
+    ready, release = mp.Event(), mp.Event()
+    holder = mp.Process(target=_hold_lock, args=(str(tmp_path), id_, ready, release))
+    holder.start()
+    try:
+        assert ready.wait(10)
+        threading.Timer(0.3, release.set).start()
+        t0 = time.monotonic()
+        assert store.update_meta(id_, name="after")
+        assert time.monotonic() - t0 >= 0.25
+    finally:
+        release.set()
+        holder.join(10)
+    assert _sidecar(store, id_) == {"name": "after"}
+
+
+def test_concurrent_workers_keep_sidecar_and_index_in_step(tmp_path):
+    store = FilesystemStore(str(tmp_path))
+    id_ = store.create(b"x")
+    mp = _processes()
+    start = mp.Event()
+    workers = [mp.Process(target=_write_field, args=(str(tmp_path), id_, f, start)) for f in ("name", "key")]
+    for w in workers:
+        w.start()
+    start.set()
+    for w in workers:
+        w.join(60)
+        assert w.exitcode == 0
+    # Neither worker's last write was lost in the sidecar, and the index agrees with it
+    last = {"name": f"name{ROUNDS - 1}", "key": f"key{ROUNDS - 1}"}
+    assert _sidecar(store, id_) == last
+    assert (store.get_name(id_), store.get_key(id_)) == (last["name"], last["key"])
+    store.reindex()
+    assert (store.get_name(id_), store.get_key(id_)) == (last["name"], last["key"])
+
+
+def test_update_after_delete_writes_no_sidecar(tmp_path):
+    store = FilesystemStore(str(tmp_path))
+    id_ = store.create(b"x")
+    store.update_meta(id_, name="n")
+    assert store.delete(id_)
+    assert not store.update_meta(id_, name="again")
+    assert not any(n.endswith(".meta.json") for n, _ in store._walk())
@@ -0,0 +1,126 @@
+"""The Firestore emulation endpoints and their backends (``FIREBASE_STORAGE_TYPE``)."""
+from __future__ import annotations
+
+import multiprocessing
+import os
+
+import pytest
+from fastapi.testclient import TestClient
+
+from server.app import create_app
+from server.firebase_store import (
+    FilesystemFirebaseStore,
+    FirebaseWrite,
+    MemoryFirebaseStore,
+    fcntl,
+    get_async_firebase_store,
+    get_firebase_store,
+)
+from server.routes import firebase
+
+ROOT = "projects/p/databases/(default)/documents"
+COMMIT = "/v1/projects/p/databases/(default)/documents:commit"
+BATCH_GET = "/v1/projects/p/databases/(default)/documents:batchGet"
+ROUNDS = 100
+STORE_TYPES = ("memory", "filesystem", "sqlite")
+
+
+def _path(tmp_path, kind: str) -> str:
+    return str(tmp_path / ("firebase.sqlite3" if kind == "sqlite" else "firebase"))
+
+
+@pytest.fixture(params=STORE_TYPES)
+def fb(request, tmp_path):
+    return get_firebase_store(request.param, _path(tmp_path, request.param))
+
+
+@pytest.fixture(params=STORE_TYPES)
+def fb_client(request, tmp_path, monkeypatch):
+    store = get_async_firebase_store(request.param, _path(tmp_path, request.param), threads=2)
+    monkeypatch.setattr(firebase, "store", store)
+    return TestClient(create_app())
+
+
+def _s(v: str) -> dict:
+    return {"stringValue": v}
+
+
+def test_commit_applies_every_write_in_order(fb):
+    a, b, c = (f"{ROOT}/scenes/{n}" for n in "abc")
+    t0 = fb.commit([FirebaseWrite(a, {"x": _s("1"), "y": _s("1")}), FirebaseWrite(b, {"x": _s("b")})])
+    t1 = fb.commit(
+        [
+            FirebaseWrite(a, {"x": _s("2"), "z": _s("2")}, mask=["x", "y"]),  # replace x, drop y, ignore z
+            FirebaseWrite(b),  # delete
+            FirebaseWrite(c, {"x": _s("c")}),
+            FirebaseWrite(c, {"y": _s("c")}, mask=["y"]),  # sees the write before it
+        ]
+    )
+    docs = fb.get_many([a, b, c, f"{ROOT}/scenes/missing"])
+    assert set(docs) == {a, c}
+    assert docs[a].fields == {"x": _s("2")}
+    assert docs[a].create_time == t0 and docs[a].update_time == t1
+    assert docs[c].fields == {"x": _s("c"), "y": _s("c")}
+
+
+def test_get_many_spans_sqlite_parameter_batches(fb):
+    names = [f"{ROOT}/scenes/{i}" for i in range(1200)]
+    fb.commit([FirebaseWrite(n, {"i": {"integerValue": str(i)}}) for i, n in enumerate(names)])
+    docs = fb.get_many(names + ["missing"])
+    assert len(docs) == 1200 and docs[names[1100]].fields == {"i": {"integerValue": "1100"}}
+
+
+def test_memory_budget_evicts_least_recently_used():
+    store = MemoryFirebaseStore(max_bytes=300)  # room for two of these documents
+    names = [f"{ROOT}/scenes/{i}" for i in range(3)]
+    store.commit([FirebaseWrite(names[0], {"x": _s("0" * 40)}), FirebaseWrite(names[1], {"x": _s("1" * 40)})])
+    store.get_many([names[0]])  # names[1] is now the oldest
+    store.commit([FirebaseWrite(names[2], {"x": _s("2" * 40)})])
+    assert set(store.get_many(names)) == {names[0], names[2]} and store.evictions == 1
+
+
+def test_commit_and_batch_get_endpoints(fb_client):
+    a, b = f"{ROOT}/scenes/a", f"{ROOT}/scenes/b"
+    r = fb_client.post(
+        COMMIT,
+        json={"writes": [{"update": {"name": a, "fields": {"x": _s("a")}}}, {"update": {"name": b, "fields": {}}}]},
+    )
+    assert r.status_code == 200 and len(r.json()["writeResults"]) == 2
+    r = fb_client.post(COMMIT, json={"writes": [{"delete": b}]})
+    assert r.status_code == 200
+    r = fb_client.post(BATCH_GET, json={"documents": [b, a]})
+    missing, found = r.json()
+    assert missing["missing"] == b
+    assert found["found"]["name"] == a and found["found"]["fields"] == {"x": _s("a")}
+    assert found["found"]["createTime"] == found["found"]["updateTime"]
+
+
+def test_endpoints_reject_empty_requests(fb_client):
+    assert fb_client.post(COMMIT, json={"writes": []}).status_code == 400
+    assert fb_client.post(COMMIT, json={"writes": [{"update": {"fields": {}}}]}).status_code == 400
+    assert fb_client.post(BATCH_GET, json={"documents": []}).status_code == 400
+
+
+def _merge_field(path, name, field, start):
+    store = FilesystemFirebaseStore(path)
+    start.wait(10)
+    for i in range(ROUNDS):
+        store.commit([FirebaseWrite(name, {field: _s(str(i))}, mask=[field])])
+
+
+@pytest.mark.skipif(fcntl is None, reason="cross-process locks need fcntl")
+def test_filesystem_commits_from_two_workers_keep_both_fields(tmp_path):
+    path, name = str(tmp_path / "firebase"), f"{ROOT}/scenes/shared"
+    FilesystemFirebaseStore(path).commit([FirebaseWrite(name, {})])
+    mp = multiprocessing.get_context("fork")
+    start = mp.Event()
+    workers = [mp.Process(target=_merge_field, args=(path, name, f, start)) for f in ("a", "b")]
+    for w in workers:
+        w.start()
+    start.set()
+    for w in workers:
+        w.join(60)
+        assert w.exitcode == 0
+    last = _s(str(ROUNDS - 1))
+    assert FilesystemFirebaseStore(path).get_many([name])[name].fields == {"a": last, "b": last}
+    assert not [n for _, _, files in os.walk(path) for n in files if n.endswith(".tmp")]
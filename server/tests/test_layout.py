@@ -0,0 +1,71 @@
+"""``FilesystemStore`` sharding: reading the legacy flat layout and ``migrate_layout``."""
+from __future__ import annotations
+
+import os
+
+import pytest
+
+from server.storage import META_SUFFIX, FilesystemStore
+
+
+def _files(root) -> set:
+    """Paths of the data files under ``root``, leaving out the index and lock files."""
+    out = set()
+    for d, dirs, names in os.walk(root):
+        dirs[:] = [n for n in dirs if not n.startswith(".")]
+        out.update(os.path.relpath(os.path.join(d, n), root) for n in names if not n.startswith("."))
+    return out
+
+
+@pytest.fixture
+def legacy(tmp_path):
+    """A data directory written before sharding: two documents, one with a sidecar."""
+    flat = FilesystemStore(str(tmp_path), shard_depth=0)
+    a, b = flat.create(b"first"), flat.create(b"second")
+    flat.update_meta(a, name="drawing", key="k")
+    assert _files(tmp_path) == {a, a + META_SUFFIX, b}
+    return tmp_path, a, b
+
+
+def _shard(id_: str) -> str:
+    return os.path.join(id_[:2], id_[2:4], id_)
+
+
+def test_flat_files_are_read_after_sharding(legacy):
+    path, a, b = legacy
+    store = FilesystemStore(str(path))
+    assert store.find_id(a) == b"first" and store.find_blob(b).size == 6
+    assert store.exists(a) and (store.get_name(a), store.get_key(a)) == ("drawing", "k")
+    store.reindex()  # a rebuild from disk sees the flat files and their sidecars too
+    assert {d.id: d.name for d in store.list()} == {a: "drawing", b: None}
+    # Metadata of a legacy document stays beside it; new documents are sharded
+    assert store.update_meta(b, name="renamed")
+    c = store.create(b"third")
+    assert _files(path) == {a, a + META_SUFFIX, b, b + META_SUFFIX, _shard(c)}
+    assert store.delete(a)
+    assert _files(path) == {b, b + META_SUFFIX, _shard(c)}
+
+
+def test_migrate_layout(legacy):
+    path, a, b = legacy
+    store = FilesystemStore(str(path))
+    before = _files(path)
+    assert store.migrate_layout(dry_run=True) == 3
+    assert _files(path) == before
+    assert store.migrate_layout() == 3
+    assert _files(path) == {_shard(a), _shard(a) + META_SUFFIX, _shard(b)}
+    assert store.find_id(a) == b"first" and store.find_id(b) == b"second"
+    assert store.get_name(a) == "drawing"
+    store.reindex()
+    assert {d.id: d.name for d in store.list()} == {a: "drawing", b: None}
+    assert store.migrate_layout() == 0
+    assert store.delete(a) and _files(path) == {_shard(b)}
+
+
+def test_short_ids_stay_flat(tmp_path):
+    store = FilesystemStore(str(tmp_path))
+    up = store.begin_upload("abcd")
+    up.write(b"short")
+    assert up.commit() == "abcd"
+    assert _files(tmp_path) == {"abcd"}
+    assert store.migrate_layout() == 0 and store.find_id("abcd") == b"short"
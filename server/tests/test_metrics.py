@@ -0,0 +1,50 @@
+"""``METRICS_ENABLED``: request latency labels and the ``/metrics`` page."""
+from __future__ import annotations
+
+import pytest
+from fastapi.testclient import TestClient
+
+from server.app import create_app
+from server.config import settings
+from server.metrics import REQUEST_LATENCY
+
+
+@pytest.fixture
+def app_client(tmp_path, monkeypatch):
+    (tmp_path / "assets").mkdir()
+    (tmp_path / "index.html").write_text("<html><head></head><body></body></html>")
+    (tmp_path / "assets" / "app.js").write_text("console.log(1)")
+    monkeypatch.setattr(settings, "METRICS_ENABLED", True)
+    monkeypatch.setattr(settings, "FRONTEND_DIR", str(tmp_path))
+    monkeypatch.setattr(settings, "STATIC_PRECOMPRESS", False)
+    monkeypatch.setattr(REQUEST_LATENCY, "_series", {})
+    return TestClient(create_app())
+
+
+def _labels() -> set:
+    return set(REQUEST_LATENCY._series)
+
+
+def test_static_spa_and_routes_are_labelled_apart(app_client):
+    assert app_client.get("/assets/app.js").status_code == 200
+    assert app_client.get("/assets/missing.js").status_code == 200  # not a file: the SPA answers
+    assert app_client.get("/some/client/route").status_code == 200
+    assert app_client.get("/api/v2/nope").status_code == 404
+    assert app_client.get("/ping").status_code == 200
+    assert _labels() == {
+        ("GET", "static", "200"),
+        ("GET", "spa", "200"),
+        ("GET", "/api/v2/{id}", "404"),
+        ("GET", "/ping", "200"),
+    }
+
+
+def test_missing_api_paths_are_not_spa_traffic(app_client):
+    assert app_client.get("/api/nothing").status_code == 404
+    assert _labels() == {("GET", "static", "404")}
+
+
+def test_metrics_page(app_client):
+    app_client.get("/assets/app.js")
+    body = app_client.get("/metrics").text
+    assert 'excalidraw_http_request_duration_seconds_count{method="GET",route="static",status="200"} 1' in body
@@ -0,0 +1,178 @@
+"""``STORAGE_TYPE=s3`` against an in-process S3 (moto)."""
+from __future__ import annotations
+
+import io
+import os
+
+import pytest
+
+boto3 = pytest.importorskip("boto3")
+moto = pytest.importorskip("moto")
+
+from server.s3_store import DiskCache, S3Store  # noqa: E402
+from server.storage import SORT_FIELDS, cursor_of  # noqa: E402
+
+BUCKET = "drawings"
+PART = 5 * 1024 * 1024  # the smallest part S3 accepts
+
+
+@pytest.fixture
+def client(monkeypatch):
+    for var in ("AWS_ACCESS_KEY_ID", "AWS_SECRET_ACCESS_KEY", "AWS_SESSION_TOKEN"):
+        monkeypatch.setenv(var, "testing")
+    monkeypatch.setenv("AWS_DEFAULT_REGION", "us-east-1")
+    with moto.mock_aws():
+        s3 = boto3.client("s3", region_name="us-east-1")
+        s3.create_bucket(Bucket=BUCKET)
+        yield s3
+
+
+@pytest.fixture
+def make_store(client, tmp_path):
+    def make(**opts) -> S3Store:
+        opts.setdefault("list_ttl", 0)
+        opts.setdefault("multipart_threshold", PART)
+        return S3Store(BUCKET, "app/", client=opts.pop("client", client), **opts)
+
+    return make
+
+
+def test_create_and_find(make_store, client):
+    store = make_store()
+    id_ = store.create(b"hello")
+    assert store.find_id(id_) == b"hello"
+    blob = store.find_blob(id_)
+    assert blob.data == b"hello" and blob.size == 5 and blob.mtime
+    assert client.get_object(Bucket=BUCKET, Key=f"app/docs/{id_}")["Body"].read() == b"hello"
+    assert store.find_blob("missing") is None
+    assert store.find_blob("../escape") is None
+
+
+def test_large_bodies_use_multipart(make_store, client):
+    store = make_store()
+    body = os.urandom(PART) + b"tail"
+    up = store.begin_upload()
+    for i in range(0, len(body), 1024 * 1024):
+        up.write(body[i:i + 1024 * 1024])
+    id_ = up.commit()
+    head = client.head_object(Bucket=BUCKET, Key=f"app/docs/{id_}")
+    assert head["ETag"].strip('"').endswith("-2")  # two parts
+    assert store.find_id(id_) == body
+
+
+def test_update_meta(make_store):
+    store = make_store()
+    id_ = store.create(b"x")
+    assert store.update_meta(id_, name="drawing", key="k")
+    assert (store.get_name(id_), store.get_key(id_)) == ("drawing", "k")
+    assert store.update_meta(id_, key="")
+    assert (store.get_name(id_), store.get_key(id_)) == ("drawing", None)
+    assert store.update_meta_many({id_: {"name": None}, "missing": {"name": "n"}}) == {id_: True, "missing": False}
+    assert store.get_name(id_) is None
+    [info] = store.list()
+    assert (info.name, info.key) == (None, None)
+
+
+def _walk(store, sort, descending, limit):
+    out, after = [], None
+    while True:
+        page = store.list(limit=limit, after=after, sort=sort, descending=descending)
+        out += page
+        if len(page) < limit:
+            return out
+        after = cursor_of(page[-1], sort)
+
+
+@pytest.mark.parametrize("descending", [True, False])
+@pytest.mark.parametrize("sort", SORT_FIELDS)
+def test_list_pages_and_sorts(make_store, sort, descending):
+    store = make_store()
+    for i in range(7):
+        id_ = store.create(b"x" * (1 + i % 3))
+        store.update_meta(id_, name=("b", "A", "c")[i % 3])
+    pages = _walk(store, sort, descending, 2)
+    assert len({d.id for d in pages}) == 7
+    positions = [cursor_of(d, sort) for d in pages]
+    assert positions == sorted(positions, reverse=descending)
+    assert store.usage() == (7, sum(1 + i % 3 for i in range(7)))
+
+
+def test_list_is_reused_until_the_ttl_or_a_write(make_store, client):
+    store = make_store(list_ttl=3600)
+    a = store.create(b"a")
+    assert [d.id for d in store.list()] == [a]
+    # Written behind the store's back: not seen until the cached listing expires
+    client.put_object(Bucket=BUCKET, Key="app/docs/outside", Body=b"o")
+    assert [d.id for d in store.list()] == [a]
+    b = store.create(b"b")  # a write through the store drops it
+    assert {d.id for d in store.list()} == {a, b, "outside"}
+
+
+class _RefusingDeletes:
+    """A client whose DeleteObjects refuses some keys, as a bucket policy or object lock would."""
+
+    def __init__(self, inner, refused):
+        self._inner = inner
+        self._refused = refused
+
+    def __getattr__(self, name):
+        return getattr(self._inner, name)
+
+    def delete_objects(self, Bucket, Delete):
+        keep = [o for o in Delete["Objects"] if o["Key"] in self._refused]
+        rest = [o for o in Delete["Objects"] if o["Key"] not in self._refused]
+        resp = self._inner.delete_objects(Bucket=Bucket, Delete={**Delete, "Objects": rest})
+        errors = [{"Key": o["Key"], "Code": "AccessDenied", "Message": "Access Denied"} for o in keep]
+        return {**resp, "Errors": errors}
+
+
+def test_delete_many_reports_refused_deletes(make_store, client, caplog):
+    plain = make_store()
+    a, b, c = (plain.create(b"%d" % i) for i in range(3))
+    plain.update_meta(c, name="n")
+    store = make_store(client=_RefusingDeletes(client, {f"app/docs/{b}", f"app/meta/{c}.json"}))
+
+    assert store.delete_many([a, b, c, "missing", a]) == {a: True, b: False, c: True, "missing": False}
+    assert store.find_id(a) is None
+    assert store.find_id(b) == b"1"  # still there, and not reported as deleted
+    assert store.find_id(c) is None  # the body went; only its metadata object was refused
+    assert "could not delete" in caplog.text
+
+
+def test_disk_cache_serves_and_forgets_deleted_bodies(make_store, client, tmp_path):
+    cache_dir = str(tmp_path / "cache")
+    store = make_store(cache_dir=cache_dir, cache_max_bytes=1024)
+    id_ = store.create(b"cached body")
+    blob = store.find_blob(id_)
+    assert blob.path == os.path.join(cache_dir, id_) and blob.size == 11
+    # Served from the cache without asking the bucket
+    client.delete_object(Bucket=BUCKET, Key=f"app/docs/{id_}")
+    assert store.find_id(id_) == b"cached body"
+    client.put_object(Bucket=BUCKET, Key=f"app/docs/{id_}", Body=b"cached body")
+    assert store.delete(id_)
+    assert not os.path.exists(blob.path)
+    assert store.find_blob(id_) is None
+
+
+def test_disk_cache_evicts_least_recently_used(tmp_path):
+    cache = DiskCache(str(tmp_path), max_bytes=10)
+    for name in ("a", "b"):
+        cache.put(name, io.BytesIO(b"1234"))
+    assert cache.get("a")  # a is now the most recent
+    cache.put("c", io.BytesIO(b"1234"))
+    assert cache.get("b") is None and not os.path.exists(tmp_path / "b")
+    assert cache.get("a") and cache.get("c")
+    # On restart the budget is rebuilt from the directory, oldest access evicted first
+    os.utime(tmp_path / "a", (1, 1))
+    os.utime(tmp_path / "c", (2, 2))
+    again = DiskCache(str(tmp_path), max_bytes=4)
+    assert os.listdir(tmp_path) == ["c"] and again.get("c")
+
+
+def test_bodies_larger_than_the_cache_are_not_cached(make_store, tmp_path):
+    cache_dir = str(tmp_path / "cache")
+    store = make_store(cache_dir=cache_dir, cache_max_bytes=4)
+    id_ = store.create(b"too large")
+    blob = store.find_blob(id_)
+    assert blob.data == b"too large" and blob.path is None
+    assert os.listdir(cache_dir) == []
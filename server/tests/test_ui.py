@@ -0,0 +1,58 @@
+"""The built frontend: static files and the SPA fallback to ``index.html``."""
+from __future__ import annotations
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from server.routes.ui import mount_static
+
+
+@pytest.fixture
+def build(tmp_path):
+    (tmp_path / "assets").mkdir()
+    (tmp_path / "index.html").write_text("<html><head></head><body>v1</body></html>")
+    (tmp_path / "assets" / "index-1a2B3c4D.js").write_text("console.log(1)")
+    return tmp_path
+
+
+@pytest.fixture
+def ui(build):
+    app = FastAPI()
+    mount_static(app, str(build))
+    app.state.spa_index.check_interval = 0  # re-stat the build on every request
+    return TestClient(app), app.state.spa_index
+
+
+def test_static_file_and_spa_fallback(ui):
+    client, _ = ui
+    r = client.get("/assets/index-1a2B3c4D.js")
+    assert r.status_code == 200 and r.text == "console.log(1)"
+    r = client.get("/some/client/route")
+    assert r.status_code == 200 and "v1" in r.text and r.headers["content-type"].startswith("text/html")
+
+
+def test_new_assets_are_served_after_a_redeploy(ui, build):
+    client, index = ui
+    assert "v1" in client.get("/assets/index-9Z8y7X6w.js").text  # not there yet: the SPA answers
+    builds = index.builds
+    # A deploy that only touches assets/, not index.html or the build root
+    (build / "assets" / "index-9Z8y7X6w.js").write_text("console.log(2)")
+    r = client.get("/assets/index-9Z8y7X6w.js")
+    assert r.status_code == 200 and r.text == "console.log(2)"
+    assert index.builds == builds + 1
+
+
+def test_new_subdirectories_are_picked_up(ui, build):
+    client, _ = ui
+    (build / "assets" / "fonts").mkdir()
+    (build / "assets" / "fonts" / "Virgil.woff2").write_bytes(b"font")
+    assert client.get("/assets/fonts/Virgil.woff2").content == b"font"
+
+
+def test_index_changes_are_picked_up(ui, build):
+    client, _ = ui
+    etag = client.get("/").headers["etag"]
+    (build / "index.html").write_text("<html><head></head><body>v2 longer</body></html>")
+    r = client.get("/")
+    assert "v2" in r.text and r.headers["etag"] != etag
@@ -0,0 +1,143 @@
+"""``STORAGE_TYPE=memory-wal``: replay after a restart, torn or corrupt log tails, snapshots."""
+from __future__ import annotations
+
+import os
+
+import pytest
+
+from server.storage import MemoryStore, get_async_store
+from server.wal_store import WalMemoryStore
+
+
+@pytest.fixture
+def reopen(tmp_path):
+    """Open the store at one path; a previous instance is closed first, as after a process exit."""
+    path = str(tmp_path / "memory-wal")
+    opened = []
+
+    def _open(**opts) -> WalMemoryStore:
+        if opened:
+            opened[-1].close()
+        opened.append(WalMemoryStore(path, sync="none", snapshot_interval=0, **opts))
+        return opened[-1]
+
+    yield _open
+    opened[-1].close()
+
+
+def _files(store) -> list:
+    return sorted(n for n in os.listdir(store.path) if n != "LOCK")
+
+
+def _wal(store) -> str:
+    return os.path.join(store.path, f"wal.{store._gen}")
+
+
+def test_restart_replays_every_change(reopen):
+    s = reopen()
+    a, b, c = s.create(b"a" * 10), s.create(b"b" * 20), s.create(b"c")
+    s.update_meta(a, name="first", key="k")
+    s.delete(b)
+    before = {d.id: d for d in s.list()}
+
+    s = reopen()
+    assert s.find_id(a) == b"a" * 10 and s.find_id(c) == b"c"
+    assert s.find_id(b) is None
+    assert s.get_name(a) == "first" and s.get_key(a) == "k"
+    # created_at survives at full precision, so the order is unchanged
+    assert {d.id: d for d in s.list()} == before
+    assert s.usage() == (2, 11)
+
+
+@pytest.mark.parametrize("keep", [1, 5, 12])
+def test_torn_tail_is_ignored(reopen, keep):
+    s = reopen()
+    a = s.create(b"kept")
+    wal = _wal(s)
+    intact = os.path.getsize(wal)
+    b = s.create(b"lost" * 100)
+    s.close()
+    # A crash mid-append: only the first bytes of the second record reached the disk
+    os.truncate(wal, intact + keep)
+
+    s = reopen()
+    assert s.find_id(a) == b"kept"
+    assert s.find_id(b) is None
+    # New writes go to the next log, so the torn one never has records after the tear
+    c = s.create(b"after")
+    s = reopen()
+    assert [s.find_id(i) for i in (a, b, c)] == [b"kept", None, b"after"]
+
+
+def test_trailing_garbage_is_ignored(reopen):
+    s = reopen()
+    a = s.create(b"kept")
+    wal = _wal(s)
+    s.close()
+    with open(wal, "ab") as f:
+        f.write(b"\x00\x00\x00\x00\xff\xff\xff\xff\x01")  # a header that claims 4 GiB
+    s = reopen()
+    assert s.find_id(a) == b"kept" and s.usage() == (1, 4)
+
+
+def test_corrupt_record_ends_replay(reopen):
+    s = reopen()
+    a = s.create(b"first")
+    wal = _wal(s)
+    at = os.path.getsize(wal)
+    b, c = s.create(b"second"), s.create(b"third")
+    s.close()
+    # Flip a byte in the second record's payload; its length is still plausible
+    with open(wal, "r+b") as f:
+        f.seek(at + 12)
+        byte = f.read(1)
+        f.seek(at + 12)
+        f.write(bytes((byte[0] ^ 0xFF,)))
+
+    s = reopen()
+    assert s.find_id(a) == b"first"
+    assert s.find_id(b) is None and s.find_id(c) is None
+
+
+def test_snapshot_then_restart(reopen):
+    s = reopen()
+    a, b = s.create(b"a"), s.create(b"b")
+    s.update_meta(a, name="named")
+    s.delete(b)
+    s.snapshot()
+    gen = s._gen
+    assert _files(s) == [f"snapshot.{gen}", f"wal.{gen}"]
+    c = s.create(b"c")
+
+    s = reopen()
+    assert s.find_id(a) == b"a" and s.get_name(a) == "named"
+    assert s.find_id(b) is None and s.find_id(c) == b"c"
+    assert s.usage() == (2, 2)
+
+
+def test_interrupted_snapshot_is_discarded(reopen):
+    s = reopen()
+    a = s.create(b"a")
+    s.close()
+    with open(os.path.join(s.path, "snapshot.99.tmp"), "wb") as f:
+        f.write(b"partial")
+    s = reopen()
+    assert s.find_id(a) == b"a"
+    assert not any(n.endswith(".tmp") for n in _files(s))
+
+
+def test_second_process_is_refused(reopen):
+    s = reopen()
+    with pytest.raises(RuntimeError):
+        WalMemoryStore(s.path, sync="none")
+
+
+def test_async_store_uses_the_thread_pool(tmp_path):
+    wal = get_async_store("memory-wal", str(tmp_path), threads=1)
+    try:
+        assert isinstance(wal.backend, WalMemoryStore) and wal._executor is not None
+    finally:
+        wal.backend.close()
+        wal._executor.shutdown()
+    mem = get_async_store("memory", str(tmp_path))
+    assert type(mem.backend) is MemoryStore and mem._executor is None
@@ -0,0 +1,360 @@
+"""``MemoryStore`` made durable with a write-ahead log and compacted snapshots.
+
+Documents are served from RAM exactly as with ``STORAGE_TYPE=memory``; every
+mutation is also appended to ``wal.<gen>`` before the call returns. When the
+log grows past ``snapshot_bytes`` (or ``snapshot_interval`` has passed) the
+store rotates to a new log generation and writes ``snapshot.<gen>`` from a
+point-in-time copy in a background thread, then removes older files.
+
+Startup maps the newest snapshot and the logs after it with ``mmap`` and
+parses records in place, so the only per-document work is one copy of the
+body into memory. A record cut short by a crash ends replay of that log.
+
+Record layout (big endian), shared by logs and snapshots:
+
+    crc32(payload):u32  len(payload):u32  op:u8  payload
+
+``create``: id, created (µs since epoch, i64), body; ``delete``: id;
+``meta``: id, JSON object of changed fields. Ids that are 32 hex digits are
+stored as 16 raw bytes.
+"""
+from __future__ import annotations
+
+import atexit
+import json
+import logging
+import mmap
+import os
+import re
+import struct
+import threading
+import time
+import zlib
+from typing import Dict, List, Optional, Tuple
+
+try:
+    import fcntl  # type: ignore
+except ImportError:  # pragma: no cover
+    fcntl = None
+
+from .storage import Blob, DocumentInfo, MemoryStore, StoreFull
+
+logger = logging.getLogger(__name__)
+
+_REC = struct.Struct(">IIB")
+_TS = struct.Struct(">q")
+OP_CREATE, OP_DELETE, OP_META = 1, 2, 3
+SYNC_MODES = ("always", "interval", "none")
+_FILE = re.compile(r"^(wal|snapshot)\.(\d+)$")
+_HEX = re.compile(r"^[0-9a-f]{32}$")
+
+
+def _pack_id(id_: str) -> bytes:
+    # 0 marks a 16-byte binary uuid; otherwise the byte is the length of a UTF-8 id
+    if _HEX.match(id_):
+        return b"\x00" + bytes.fromhex(id_)
+    raw = id_.encode()
+    if not 0 < len(raw) < 256:
+        raise ValueError("document id too long for the write-ahead log")
+    return bytes((len(raw),)) + raw
+
+
+def _unpack_id(buf, pos: int) -> Tuple[str, int]:
+    n = buf[pos]
+    if n == 0:
+        return bytes(buf[pos + 1:pos + 17]).hex(), pos + 17
+    return bytes(buf[pos + 1:pos + 1 + n]).decode(), pos + 1 + n
+
+
+class WalMemoryStore(MemoryStore):
+    def __init__(
+        self,
+        path: str,
+        *,
+        max_bytes: int = 0,
+        sync: str = "interval",
+        sync_interval: float = 1.0,
+        snapshot_bytes: int = 256 * 1024 * 1024,
+        snapshot_interval: float = 3600.0,
+    ) -> None:
+        if sync not in SYNC_MODES:
+            raise ValueError(f"MEMORY_WAL_SYNC must be one of {', '.join(SYNC_MODES)}")
+        super().__init__(max_bytes)
+        self.path = path
+        self.sync = sync
+        self.sync_interval = sync_interval
+        self.snapshot_bytes = snapshot_bytes
+        self.snapshot_interval = snapshot_interval
+        self._lock = threading.RLock()
+        self._wal = None
+        self._gen = 0
+        self._wal_bytes = 0
+        self._dirty = False
+        self._compacting = False
+        self._closed = False
+        self._last_snapshot = time.monotonic()
+        self.load_seconds = 0.0
+        self.last_snapshot_seconds = 0.0
+        self.snapshots = 0
+        os.makedirs(path, exist_ok=True)
+        self._lockfile = open(os.path.join(path, "LOCK"), "a")
+        if fcntl is not None:
+            try:
+                fcntl.flock(self._lockfile, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                self._lockfile.close()
+                raise RuntimeError(f"{path} is in use by another process (memory-wal storage is single-process)")
+        replayed = self._load()
+        if max_bytes and self._bytes > max_bytes:
+            # The budget shrank since the last run; evictions are logged like any delete
+            try:
+                self._make_room(0)
+            except StoreFull:
+                logger.warning("memory-wal: share-keyed documents alone exceed MEMORY_MAX_BYTES")
+        if sync == "interval":
+            threading.Thread(target=self._sync_loop, name="wal-sync", daemon=True).start()
+        atexit.register(self.close)
+        if replayed >= snapshot_bytes:
+            # Keep the next restart fast: fold the replayed logs into a snapshot now
+            self._compact()
+
+    # -- files ----------------------------------------------------------------
+
+    def _file(self, kind: str, gen: int) -> str:
+        return os.path.join(self.path, f"{kind}.{gen}")
+
+    def _generations(self) -> Dict[str, List[int]]:
+        found: Dict[str, List[int]] = {"wal": [], "snapshot": []}
+        for name in os.listdir(self.path):
+            m = _FILE.match(name)
+            if m:
+                found[m.group(1)].append(int(m.group(2)))
+            elif name.endswith(".tmp"):
+                os.unlink(os.path.join(self.path, name))  # an interrupted snapshot
+        return {k: sorted(v) for k, v in found.items()}
+
+    def _load(self) -> int:
+        t0 = time.perf_counter()
+        gens = self._generations()
+        base = gens["snapshot"][-1] if gens["snapshot"] else None
+        if base is not None:
+            self._replay(self._file("snapshot", base), verify=False)
+        replayed = 0
+        for g in gens["wal"]:
+            if base is None or g >= base:
+                replayed += self._replay(self._file("wal", g), verify=True)
+        self._open_wal(max(gens["wal"] + gens["snapshot"], default=0) + 1)
+        self.load_seconds = time.perf_counter() - t0
+        if self._docs:
+            logger.info("memory-wal: loaded %d document(s) in %.2fs", len(self._docs), self.load_seconds)
+        return replayed
+
+    def _replay(self, path: str, verify: bool) -> int:
+        """Apply the records in ``path``; returns the bytes of intact records."""
+        with open(path, "rb") as f:
+            size = os.fstat(f.fileno()).st_size
+            if size == 0:
+                return 0
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                with memoryview(mm) as buf:
+                    pos = self._apply_all(buf, size, verify)
+        if pos < size:
+            logger.warning("memory-wal: %s: ignoring %d byte(s) after the last intact record", path, size - pos)
+        return pos
+
+    def _apply_all(self, buf: memoryview, size: int, verify: bool) -> int:
+        pos = 0
+        while pos + _REC.size <= size:
+            crc, n, op = _REC.unpack_from(buf, pos)
+            start = pos + _REC.size
+            end = start + n
+            if end > size or (verify and zlib.crc32(buf[start:end]) != crc):
+                break
+            id_, p = _unpack_id(buf, start)
+            if op == OP_CREATE:
+                (us,) = _TS.unpack_from(buf, p)
+                MemoryStore._put(self, id_, bytes(buf[p + _TS.size:end]), us)
+            elif op == OP_DELETE:
+                MemoryStore._remove(self, id_)
+            elif op == OP_META:
+                MemoryStore._set_meta(self, id_, json.loads(bytes(buf[p:end])))
+            pos = end
+        return pos
+
+    def _open_wal(self, gen: int) -> None:
+        if self._wal is not None:
+            self._wal.flush()
+            os.fsync(self._wal.fileno())
+            self._wal.close()
+        self._gen = gen
+        self._wal = open(self._file("wal", gen), "ab")
+        self._wal_bytes = 0
+        self._fsync_dir()
+
+    def _fsync_dir(self) -> None:
+        fd = os.open(self.path, os.O_RDONLY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+    # -- reads ----------------------------------------------------------------
+
+    def peek_blob(self, id_: str) -> Optional[Blob]:
+        """Body lookup that never blocks, so ``AsyncStore`` serves it without an executor hop."""
+        return MemoryStore.find_blob(self, id_)
+
+    def list(self, **opts) -> List[DocumentInfo]:
+        # Writers run on other storage threads; walking the index needs them held off
+        with self._lock:
+            return super().list(**opts)
+
+    # -- logging --------------------------------------------------------------
+
+    @staticmethod
+    def _write_record(f, op: int, *parts: bytes) -> int:
+        crc = 0
+        n = 0
+        for part in parts:
+            crc = zlib.crc32(part, crc)
+            n += len(part)
+        f.write(_REC.pack(crc, n, op))
+        for part in parts:
+            f.write(part)
+        return _REC.size + n
+
+    def _append(self, op: int, *parts: bytes) -> None:
+        if self._closed:
+            raise RuntimeError("store is closed")
+        self._wal_bytes += self._write_record(self._wal, op, *parts)
+        # Flushed per call: a crashed process loses nothing that was acknowledged
+        self._wal.flush()
+        if self.sync == "always":
+            os.fsync(self._wal.fileno())
+        else:
+            self._dirty = True
+
+    def _insert(self, id_: str, data: bytes, created: int) -> None:
+        with self._lock:
+            # Evictions are logged as deletes ahead of the create that needed the room
+            self._make_room(len(data))
+            self._append(OP_CREATE, _pack_id(id_), _TS.pack(created), data)
+            self._put(id_, data, created)
+        self._maybe_compact()
+
+    def _remove(self, id_: str) -> bool:
+        with self._lock:
+            existed = super()._remove(id_)
+            if existed:
+                self._append(OP_DELETE, _pack_id(id_))
+        if existed:
+            self._maybe_compact()
+        return existed
+
+    def _set_meta(self, id_: str, fields: Dict[str, Optional[str]]) -> bool:
+        with self._lock:
+            ok = super()._set_meta(id_, fields)
+            if ok:
+                self._append(OP_META, _pack_id(id_), json.dumps(fields, separators=(",", ":")).encode())
+        if ok:
+            self._maybe_compact()
+        return ok
+
+    def _sync_loop(self) -> None:
+        while not self._closed:
+            time.sleep(self.sync_interval)
+            with self._lock:
+                wal, dirty = self._wal, self._dirty
+                self._dirty = False
+            if not dirty:
+                continue
+            # Outside the lock so writers never wait on the disk; a rotation fsyncs the old log itself
+            try:
+                os.fsync(wal.fileno())
+            except (ValueError, OSError):
+                pass
+
+    # -- snapshots ------------------------------------------------------------
+
+    def _maybe_compact(self) -> None:
+        if self._compacting:
+            return
+        due = self._wal_bytes >= self.snapshot_bytes or (
+            self.snapshot_interval > 0
+            and self._wal_bytes > 0
+            and time.monotonic() - self._last_snapshot >= self.snapshot_interval
+        )
+        if due:
+            self._compact()
+
+    def _compact(self, wait: bool = False) -> None:
+        with self._lock:
+            if self._compacting or self._closed:
+                return
+            self._compacting = True
+            gen = self._gen + 1
+            # New writes go to wal.<gen>; the snapshot captures everything before it
+            self._open_wal(gen)
+            records = self._records()
+        t = threading.Thread(target=self._write_snapshot, args=(gen, records), name="wal-snapshot", daemon=True)
+        t.start()
+        if wait:
+            t.join()
+
+    def snapshot(self) -> None:
+        """Write a snapshot now and wait for it."""
+        self._compact(wait=True)
+
+    def _write_snapshot(self, gen: int, records) -> None:
+        t0 = time.perf_counter()
+        final = self._file("snapshot", gen)
+        tmp = final + ".tmp"
+        try:
+            with open(tmp, "wb", buffering=1024 * 1024) as f:
+                for id_, data, created, name, key in records:
+                    pid = _pack_id(id_)
+                    self._write_record(f, OP_CREATE, pid, _TS.pack(created), data)
+                    meta = {k: v for k, v in (("name", name), ("key", key)) if v is not None}
+                    if meta:
+                        self._write_record(f, OP_META, pid, json.dumps(meta, separators=(",", ":")).encode())
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp, final)
+            self._fsync_dir()
+            for kind, gs in self._generations().items():
+                for g in gs:
+                    if g < gen:
+                        os.unlink(self._file(kind, g))
+            self.snapshots += 1
+            self.last_snapshot_seconds = time.perf_counter() - t0
+            logger.info(
+                "memory-wal: snapshot of %d document(s) in %.2fs", len(records), self.last_snapshot_seconds
+            )
+        except Exception:
+            logger.exception("memory-wal: snapshot failed; the logs still hold every change")
+            try:
+                os.unlink(tmp)
+            except OSError:
+                pass
+        finally:
+            self._last_snapshot = time.monotonic()
+            self._compacting = False
+
+    def wal_stats(self) -> Dict[str, float]:
+        return {
+            "wal_bytes": self._wal_bytes,
+            "generation": self._gen,
+            "snapshots": self.snapshots,
+            "last_snapshot_seconds": self.last_snapshot_seconds,
+            "load_seconds": self.load_seconds,
+        }
+
+    def close(self) -> None:
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            self._wal.flush()
+            os.fsync(self._wal.fileno())
+            self._wal.close()
+            self._lockfile.close()